@@ -1,11 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
 from django.urls import reverse
 from django.db.models import Sum, Q, F
 from .models import (
     FiscalYear, AccountingPeriod, ChartOfAccounts,
-    Journal, JournalEntry, EntryLine
+    Journal, JournalEntry, EntryLine, JournalImport
 )
 
 class EntryLineInline(admin.TabularInline):
@@ -48,16 +48,17 @@ class EntryLineInline(admin.TabularInline):
 class JournalEntryAdmin(admin.ModelAdmin):
     list_display = ('entry_number', 'date', 'journal', 'reference', 'total_debit', 'total_credit', 'is_balanced', 'posted', 'created_by')
     list_filter = ('journal', 'posted', 'date', 'created_by')
+    list_select_related = ('journal', 'created_by')
     search_fields = ('entry_number', 'reference', 'description')
     date_hierarchy = 'date'
     inlines = [EntryLineInline]
-    readonly_fields = ('created_by', 'created_at', 'updated_at', 'is_balanced')
+    readonly_fields = ('created_by', 'created_at', 'updated_at', 'total_debit', 'total_credit', 'line_count', 'is_balanced')
     fieldsets = (
         (None, {
             'fields': ('organization', 'period', 'journal', 'entry_number', 'date')
         }),
         (_('Details'), {
-            'fields': ('reference', 'description', 'posted')
+            'fields': ('reference', 'description', 'posted', ('total_debit', 'total_credit', 'line_count'))
         }),
         (_('Metadata'), {
             'fields': ('created_by', 'created_at', 'updated_at'),
@@ -65,11 +66,22 @@ class JournalEntryAdmin(admin.ModelAdmin):
         }),
     )
     
+    actions = ['post_selected']
+
     def save_model(self, request, obj, form, change):
         if not obj.pk:
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+    @admin.action(description=_('Post selected entries'), permissions=['change'])
+    def post_selected(self, request, queryset):
+        from .posting import post_entries
+        posted, rejected = post_entries(queryset, user=request.user)
+        if posted:
+            self.message_user(request, _('%(count)d entries posted.') % {'count': len(posted)}, messages.SUCCESS)
+        for entry, reason in rejected:
+            self.message_user(request, f'{entry.entry_number}: {reason}', messages.ERROR)
+
 @admin.register(FiscalYear)
 class FiscalYearAdmin(admin.ModelAdmin):
     list_display = ('name', 'organization', 'start_date', 'end_date', 'status', 'periods_count')
@@ -92,6 +104,12 @@ class AccountingPeriodAdmin(admin.ModelAdmin):
         return obj.journal_entries.count()
     entries_count.short_description = _('Entries')
 
+@admin.register(JournalImport)
+class JournalImportAdmin(admin.ModelAdmin):
+    list_display = ('file', 'organization', 'status', 'entry_count', 'line_count', 'error_count', 'created_by', 'created_at')
+    list_filter = ('status', 'format', 'organization')
+    readonly_fields = ('status', 'row_count', 'entry_count', 'line_count', 'error_count', 'errors', 'error_message', 'completed_at')
+
 # Enable the following if you need to customize EntryLine in the admin
 # @admin.register(EntryLine)
 # class EntryLineAdmin(admin.ModelAdmin):
@@ -0,0 +1,148 @@
+"""
+Fiscal year closing.
+
+Closing a fiscal year closes its accounting periods, which freezes their
+balances (see ``AccountBalanceSnapshot``), and carries the year's result
+forward: the balances of the result accounts (SYSCOHADA classes 6 and 7) are
+reversed into the retained earnings account by the next fiscal year's
+opening entry ("à-nouveaux"), dated on its first day in the OPENING journal.
+
+Balance sheet accounts need no opening lines: the ledger is cumulative, so
+their closing balances already are the next year's opening balances, and
+restating them would count them twice. Income statements leave the opening
+entry out (see ``ledger.carry_forward_movements``) since it moves a result
+rather than earning or spending anything.
+
+The result balances come from one aggregate query and the entry's lines are
+written with one ``bulk_create``, all in a single transaction. Closing again
+a year that is already closed does nothing; closing a year that was reopened
+replaces its previous opening entry.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.translation import gettext as _
+
+from . import ledger
+from .models import AccountingPeriod, ChartOfAccounts, EntryLine, FiscalYear, Journal, JournalEntry
+
+# SYSCOHADA classes of the charges (6) and products (7) accounts
+RESULT_CLASSES = ('6', '7')
+
+# "Report à nouveau"
+RETAINED_EARNINGS_CODE = '12'
+
+# Journal created for organizations that have no OPENING journal yet
+OPENING_JOURNAL_CODE = 'AN'
+
+CARRY_FORWARD_REFERENCE = "AN-{fiscal_year}"
+
+
+def opening_journal(organization):
+    """The organization's OPENING journal, created if it has none."""
+    journal = Journal.objects.filter(organization=organization, type='OPENING', is_active=True).order_by('pk').first()
+    if journal is None:
+        journal, _created = Journal.objects.get_or_create(
+            organization=organization, code=OPENING_JOURNAL_CODE,
+            defaults={'name': "À-nouveaux", 'type': 'OPENING'},
+        )
+    return journal
+
+
+def carry_forward_lines(organization, end_date, retained_earnings):
+    """
+    Unsaved ``EntryLine`` objects closing every result account of
+    ``organization`` as of ``end_date`` into ``retained_earnings``, from one
+    grouped query. Empty when the result accounts are all settled.
+    """
+    result_accounts = Q()
+    for prefix in RESULT_CLASSES:
+        result_accounts |= Q(code__startswith=prefix)
+    balances = ledger.account_movements(organization, None, end_date).filter(result_accounts).values_list(
+        'pk', 'period_debit', 'period_credit'
+    )
+
+    lines = []
+    net_result = ledger.ZERO
+    for account_id, debit, credit in balances.iterator():
+        balance = debit - credit
+        if not balance:
+            continue
+        net_result += balance
+        if balance > 0:
+            lines.append(EntryLine(account_id=account_id, credit_amount=balance, description=_("Clôture du compte")))
+        else:
+            lines.append(EntryLine(account_id=account_id, debit_amount=-balance, description=_("Clôture du compte")))
+    if net_result > 0:
+        lines.append(EntryLine(account=retained_earnings, debit_amount=net_result, description=_("Perte de l'exercice")))
+    elif net_result < 0:
+        lines.append(EntryLine(account=retained_earnings, credit_amount=-net_result, description=_("Bénéfice de l'exercice")))
+    return lines
+
+
+def close_fiscal_year(fiscal_year, retained_earnings_code=RETAINED_EARNINGS_CODE, user=None):
+    """
+    Close ``fiscal_year`` and write the next year's opening entry.
+
+    Returns the posted opening entry, or None when there was no result to
+    carry forward. Raises ``ValidationError`` when the year cannot be closed:
+    unposted entries, no following fiscal year or open period to hold the
+    opening entry, or no retained earnings account.
+    """
+    with transaction.atomic():
+        fiscal_year = FiscalYear.objects.select_for_update().select_related('organization').get(pk=fiscal_year.pk)
+        organization = fiscal_year.organization
+        reference = CARRY_FORWARD_REFERENCE.format(fiscal_year=fiscal_year.name)
+        previous = JournalEntry.objects.filter(
+            organization=organization, journal__type='OPENING', reference=reference,
+        ).first()
+        if fiscal_year.is_closed and previous is not None:
+            return previous
+
+        next_year = FiscalYear.objects.filter(
+            organization=organization, start_date__gt=fiscal_year.end_date
+        ).order_by('start_date').first()
+        if next_year is None:
+            raise ValidationError(_("Create the next fiscal year before closing %(year)s.") % {'year': fiscal_year.name})
+        opening_period = AccountingPeriod.objects.filter(
+            fiscal_year=next_year, start_date__lte=next_year.start_date, end_date__gte=next_year.start_date,
+        ).first()
+        if opening_period is None or opening_period.is_closed:
+            raise ValidationError(_("The first period of %(year)s must exist and be open.") % {'year': next_year.name})
+        retained_earnings = ChartOfAccounts.objects.filter(organization=organization, code=retained_earnings_code).first()
+        if retained_earnings is None:
+            raise ValidationError(_("Retained earnings account %(code)s does not exist.") % {'code': retained_earnings_code})
+
+        unposted = JournalEntry.objects.filter(period__fiscal_year=fiscal_year, posted=False).count()
+        if unposted:
+            raise ValidationError(_("Cannot close %(year)s: %(count)d unposted entries.") % {
+                'year': fiscal_year.name, 'count': unposted,
+            })
+
+        # Closing the periods freezes their balances, which the aggregate below then reads
+        for period in fiscal_year.periods.exclude(status="CLOSED").order_by('start_date'):
+            period.status = "CLOSED"
+            period.save()
+        if previous is not None:
+            previous.delete()
+
+        entry = None
+        lines = carry_forward_lines(organization, fiscal_year.end_date, retained_earnings)
+        if lines:
+            entry = JournalEntry(
+                organization=organization, period=opening_period, journal=opening_journal(organization),
+                date=next_year.start_date, reference=reference, created_by=user,
+                description=_("À-nouveaux : résultat de l'exercice %(year)s") % {'year': fiscal_year.name},
+            )
+            entry.save()
+            for line in lines:
+                line.journal_entry = entry
+            EntryLine.objects.bulk_create(lines, batch_size=1000)
+            JournalEntry.refresh_totals([entry.pk])
+            entry.posted = True
+            entry.posted_by = user
+            entry.save()
+
+        fiscal_year.status = "CLOSED"
+        fiscal_year.save(update_fields=['status'])
+        return entry
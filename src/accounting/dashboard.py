@@ -0,0 +1,209 @@
+"""
+Dashboard KPIs.
+
+The treasury balance (class 5 accounts), the month-to-date revenue and
+expenses and their trend over the last ``TREND_MONTHS`` months come from
+posted entries through ``LedgerService``, one grouped query per widget; the
+current month of the trend gives the month-to-date figures. Opening entries
+are left out of revenue and expenses, as in the income statement.
+
+The KPIs are cached per organization under its ledger version and the day,
+so posting invalidates them. Creating or deleting an unposted entry leaves
+the ledger alone but changes the pending count, so it drops them too
+(``invalidate``).
+
+The charts are fed by ``time_series``: monthly or daily revenue, expenses,
+cash position and volume per journal, one query per series, cached under
+the ledger version so the page can load them after its first paint.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, DateField, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth
+from django.utils import timezone
+
+from . import ledger
+from .models import EntryLine, JournalEntry
+
+TREND_MONTHS = 12
+
+SERIES_INTERVALS = {'month': TruncMonth, 'day': TruncDay}
+
+# Default and longest spans of the chart series, in buckets
+SERIES_DEFAULT_BUCKETS = {'month': 12, 'day': 30}
+SERIES_MAX_BUCKETS = {'month': 120, 'day': 366}
+
+
+def _cache_key(organization_id):
+    return f"dashboard:{organization_id}"
+
+
+def invalidate(organization_id):
+    """Drop the cached KPIs of an organization once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(_cache_key(organization_id)))
+
+
+def month_starts(today, count=TREND_MONTHS):
+    """First days of the ``count`` months up to the one of ``today``, oldest first."""
+    year, month = today.year, today.month
+    starts = []
+    for _index in range(count):
+        starts.append(today.replace(year=year, month=month, day=1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return starts[::-1]
+
+
+def monthly_trend(service, today, months=TREND_MONTHS):
+    """
+    Revenue, expenses and net result per month, oldest first, from one query
+    grouped by month, account type and journal type.
+    """
+    starts = month_starts(today, months)
+    trend = {start: {'month': start, 'revenue': ledger.ZERO, 'expenses': ledger.ZERO} for start in starts}
+    rows = service.balances(
+        start_date=starts[0], end_date=today, group_by=('month', 'account_type', 'journal_type'),
+    )
+    for row in rows:
+        if row['journal_type'] == 'OPENING' or row['month'] not in trend:
+            continue
+        if row['account_type'] == 'REVENUE':
+            trend[row['month']]['revenue'] += row['credit'] - row['debit']
+        elif row['account_type'] == 'EXPENSE':
+            trend[row['month']]['expenses'] += row['debit'] - row['credit']
+    for month in trend.values():
+        month['net'] = month['revenue'] - month['expenses']
+    return [trend[start] for start in starts]
+
+
+def kpis(organization, today, service=None):
+    """Compute the dashboard KPIs of ``organization`` as of ``today``."""
+    if service is None:
+        service = ledger.LedgerService(organization)
+    trend = monthly_trend(service, today)
+    return {
+        'cash_balance': service.balance(prefixes=[ledger.CASH_ACCOUNT_PREFIX], end_date=today),
+        'monthly_revenue': trend[-1]['revenue'],
+        'monthly_expenses': trend[-1]['expenses'],
+        'trend': trend,
+        'pending_entries': JournalEntry.objects.filter(organization=organization, posted=False).count(),
+    }
+
+
+def cached_kpis(organization, service=None):
+    """``kpis`` as of today, reused until the organization posts or its pending entries change."""
+    today = timezone.now().date()
+    stamp = (ledger.ledger_version(organization.pk), today.isoformat())
+    cached = cache.get(_cache_key(organization.pk))
+    if cached is not None and cached['stamp'] == stamp:
+        return cached['kpis']
+    result = kpis(organization, today, service)
+    cache.set(_cache_key(organization.pk), {'stamp': stamp, 'kpis': result}, settings.REPORT_CACHE_TIMEOUT)
+    return result
+
+
+def buckets(interval, start_date, end_date):
+    """First days of the ``interval`` buckets from the one of ``start_date`` to the one of ``end_date``."""
+    if interval == 'day':
+        return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    current, starts = start_date.replace(day=1), []
+    while current <= end_date:
+        starts.append(current)
+        current = (current + timedelta(days=32)).replace(day=1)
+    return starts
+
+
+def series_range(interval, today, start_date=None, end_date=None):
+    """
+    Resolve the dates of a series: by default the last
+    ``SERIES_DEFAULT_BUCKETS`` buckets up to ``today``. Raises ValueError
+    for an unknown interval or a span over ``SERIES_MAX_BUCKETS``.
+    """
+    if interval not in SERIES_INTERVALS:
+        raise ValueError(f"Unknown interval {interval!r}")
+    end_date = end_date or today
+    if start_date is None:
+        if interval == 'day':
+            start_date = end_date - timedelta(days=SERIES_DEFAULT_BUCKETS['day'] - 1)
+        else:
+            start_date = month_starts(end_date, SERIES_DEFAULT_BUCKETS['month'])[0]
+    if start_date > end_date:
+        raise ValueError("The start date is after the end date")
+    if len(buckets(interval, start_date, end_date)) > SERIES_MAX_BUCKETS[interval]:
+        raise ValueError(f"At most {SERIES_MAX_BUCKETS[interval]} {interval}s per series")
+    return start_date, end_date
+
+
+def cash_positions(organization, interval, start_date, end_date):
+    """
+    Treasury (class 5) balance at the end of each bucket, from one query:
+    the lines before ``start_date`` fall into a single opening group.
+    """
+    bucket = Case(
+        When(journal_entry__date__lt=start_date, then=Value(None)),
+        default=SERIES_INTERVALS[interval]('journal_entry__date'),
+        output_field=DateField(),
+    )
+    rows = EntryLine.objects.filter(
+        journal_entry__organization=organization, journal_entry__posted=True,
+        journal_entry__date__lte=end_date, account__code__startswith=ledger.CASH_ACCOUNT_PREFIX,
+    ).values(bucket=bucket).annotate(
+        debit=Coalesce(Sum('debit_amount'), Value(ledger.ZERO), output_field=ledger.AMOUNT_FIELD),
+        credit=Coalesce(Sum('credit_amount'), Value(ledger.ZERO), output_field=ledger.AMOUNT_FIELD),
+    ).order_by()
+    movements = {row['bucket']: row['debit'] - row['credit'] for row in rows}
+    balance = movements.pop(None, ledger.ZERO)
+    positions = []
+    for start in buckets(interval, start_date, end_date):
+        balance += movements.get(start, ledger.ZERO)
+        positions.append(balance)
+    return positions
+
+
+def time_series(organization, interval, start_date, end_date, service=None):
+    """
+    Chart series of ``organization`` per ``interval`` bucket between the
+    dates: ``labels`` (ISO dates of the buckets), ``revenue``, ``expenses``,
+    ``cash`` and ``journals`` (posted debit volume per journal code), as
+    JSON-ready lists of floats.
+    """
+    if service is None:
+        service = ledger.LedgerService(organization)
+    labels = buckets(interval, start_date, end_date)
+    index = {start: position for position, start in enumerate(labels)}
+    revenue, expenses = [ledger.ZERO] * len(labels), [ledger.ZERO] * len(labels)
+    for row in service.balances(start_date=start_date, end_date=end_date, group_by=(interval, 'account_type', 'journal_type')):
+        if row['journal_type'] == 'OPENING' or row[interval] not in index:
+            continue
+        if row['account_type'] == 'REVENUE':
+            revenue[index[row[interval]]] += row['credit'] - row['debit']
+        elif row['account_type'] == 'EXPENSE':
+            expenses[index[row[interval]]] += row['debit'] - row['credit']
+    journals = {}
+    for row in service.balances(start_date=start_date, end_date=end_date, group_by=(interval, 'journal_code')):
+        if row[interval] in index:
+            volume = journals.setdefault(row['journal_code'], [ledger.ZERO] * len(labels))
+            volume[index[row[interval]]] += row['debit']
+    return {
+        'interval': interval,
+        'labels': [start.isoformat() for start in labels],
+        'revenue': [float(amount) for amount in revenue],
+        'expenses': [float(amount) for amount in expenses],
+        'cash': [float(amount) for amount in cash_positions(organization, interval, start_date, end_date)],
+        'journals': {code: [float(amount) for amount in volume] for code, volume in sorted(journals.items())},
+    }
+
+
+def cached_time_series(organization, interval, start_date, end_date, service=None):
+    """``time_series`` reused until the organization's ledger changes."""
+    version = ledger.ledger_version(organization.pk)
+    digest = hashlib.md5(repr((interval, start_date, end_date)).encode('utf-8')).hexdigest()
+    key = f"dashboard-series:{organization.pk}:{version}:{digest}"
+    result = cache.get(key)
+    if result is None:
+        result = time_series(organization, interval, start_date, end_date, service)
+        cache.set(key, result, settings.REPORT_CACHE_TIMEOUT)
+    return result
@@ -1,6 +1,6 @@
 from django import forms
-from django.forms import inlineformset_factory
-from .models import ChartOfAccounts, Journal, JournalEntry, EntryLine, FiscalYear, AccountingPeriod
+from django.forms import BaseInlineFormSet, inlineformset_factory
+from .models import ChartOfAccounts, Journal, JournalEntry, EntryLine, FiscalYear, AccountingPeriod, JournalImport
 
 class ChartOfAccountsForm(forms.ModelForm):
     class Meta:
@@ -27,9 +27,87 @@ class AccountingPeriodForm(forms.ModelForm):
         model = AccountingPeriod
         exclude = ['fiscal_year']
 
+class JournalImportForm(forms.ModelForm):
+    class Meta:
+        model = JournalImport
+        fields = ['file']
+
+    def clean_file(self):
+        from django.utils.translation import gettext as _
+        upload = self.cleaned_data['file']
+        extension = upload.name.rsplit('.', 1)[-1].lower()
+        if extension not in dict(JournalImport.FORMAT_CHOICES):
+            raise forms.ValidationError(_("Upload a .csv or .xlsx file."))
+        self.instance.format = extension
+        return upload
+
+class PreloadedModelChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField resolving its value from ``preloaded`` (pk string -> object) when it is there."""
+    preloaded = None
+
+    def to_python(self, value):
+        if self.preloaded and str(value) in self.preloaded:
+            return self.preloaded[str(value)]
+        return super().to_python(value)
+
+
+class BaseEntryLineFormSet(BaseInlineFormSet):
+    """
+    The lines of one entry, checked against the entry the formset is given:
+    every line shares that instance, so the entry and its period are loaded
+    once. The accounts and projects of all the lines are fetched with one
+    query each, and saving writes the lines set-wise (one INSERT, one UPDATE,
+    one DELETE) before recomputing the entry totals once.
+    """
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # Resolve the line of each form from the formset's queryset (see full_clean)
+        name = self._pk_field.name
+        field = form.fields[name]
+        form.fields[name] = PreloadedModelChoiceField(field.queryset, initial=field.initial, required=False, widget=field.widget)
+
+    def full_clean(self):
+        if self.is_bound:
+            existing = {str(line.pk): line for line in self.get_queryset()}
+            for form in self.forms:
+                form.fields[self._pk_field.name].preloaded = existing
+        for name in ('account', 'project'):
+            fields = [form.fields[name] for form in self.forms]
+            values = {form[name].data for form in self.forms} - {None, ''}
+            if fields and values:
+                preloaded = fields[0].queryset.in_bulk([value for value in values if str(value).isdigit()])
+                for field in fields:
+                    field.preloaded = {str(pk): obj for pk, obj in preloaded.items()}
+        super().full_clean()
+
+    def save(self, commit=True):
+        from django.db import transaction
+        if not commit:
+            return super().save(commit=False)
+        with transaction.atomic():
+            lines = super().save(commit=False)
+            if self.deleted_objects:
+                EntryLine.objects.filter(pk__in=[line.pk for line in self.deleted_objects]).delete()
+            changed = [line for line, _fields in self.changed_objects]
+            if changed:
+                EntryLine.objects.bulk_update(changed, [name for name in self.form._meta.fields if name != self.fk.name])
+            if self.new_objects:
+                EntryLine.objects.bulk_create(self.new_objects)
+            JournalEntry.refresh_totals([self.instance.pk])
+            stored = JournalEntry.objects.filter(pk=self.instance.pk).values('total_debit', 'total_credit', 'line_count').get()
+        for name, value in stored.items():
+            setattr(self.instance, name, value)
+        for line in lines:
+            line._counted = line.counted_amounts()
+        return lines
+
+
 EntryLineFormSet = inlineformset_factory(
     JournalEntry, EntryLine,
+    formset=BaseEntryLineFormSet,
     fields=['account', 'project', 'debit_amount', 'credit_amount', 'description'],
+    field_classes={'account': PreloadedModelChoiceField, 'project': PreloadedModelChoiceField},
     extra=2,
     can_delete=True
 )
@@ -0,0 +1,320 @@
+"""
+Bulk import of journal entries from CSV or XLSX files.
+
+Each row of the file is one entry line, and consecutive rows sharing the same
+``entry`` value make up one entry whose journal, date, reference and
+description are read from its first row. The header row names the columns, in
+any order: ``entry``, ``journal`` (code), ``date`` (YYYY-MM-DD), ``account``
+(code), ``debit`` and ``credit``, and optionally ``reference``,
+``description`` (defaults to the ``entry`` value), ``label`` (the line
+description) and ``project`` (code). CSV files are UTF-8, separated by commas
+or semicolons.
+
+The file is read as a stream and handled in batches of about ``BATCH_LINES``
+lines. Rather than going through ``JournalEntry.save`` and ``EntryLine.save``
+and their per-row ``full_clean``, each batch is checked set-wise: journals and
+periods are loaded once per import, accounts and projects with one query per
+batch for the codes not seen yet, and balance, period and closed-period rules
+are checked in memory. The entries that pass are numbered per journal and
+year and written with two ``bulk_create`` in one transaction per batch.
+
+An entry with a bad row is rejected as a whole, with the reason reported
+against the row; the rest of the file goes on. Imported entries are drafts:
+posting them, which updates the account/period projection, the budget
+counters and the ledger version, stays the usual, reviewed step.
+"""
+import csv
+import io
+import itertools
+from bisect import bisect_right
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext as _
+
+from . import dashboard
+from .ledger import ZERO
+from .models import AccountingPeriod, ChartOfAccounts, EntryLine, Journal, JournalEntry, Project
+
+IMPORT_COLUMNS = ('entry', 'journal', 'date', 'reference', 'description', 'account', 'debit', 'credit', 'label', 'project')
+REQUIRED_COLUMNS = ('entry', 'journal', 'date', 'account', 'debit', 'credit')
+
+# Lines validated and written together, in one transaction
+BATCH_LINES = 5000
+
+# Row errors kept on the result; the count goes on beyond it
+MAX_REPORTED_ERRORS = 1000
+
+TEXT_MAX_LENGTH = 255
+
+CENT = Decimal('0.01')
+
+
+def cell_text(value):
+    """A cell as stripped text; whole numbers typed in a spreadsheet (account codes) lose their ``.0``."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def parse_day(value):
+    """A date cell: a spreadsheet date or ``YYYY-MM-DD`` text. Raises ValueError."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(cell_text(value))
+    except ValueError:
+        raise ValueError(_("Invalid date %(value)r, expected YYYY-MM-DD.") % {'value': cell_text(value)})
+
+
+def parse_amount(value):
+    """A debit or credit cell: None when empty, else a positive amount in cents. Raises ValueError."""
+    text = cell_text(value)
+    if not text:
+        return None
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite() or amount < 0 or amount != amount.quantize(CENT):
+        raise ValueError(_("Invalid amount %(value)r.") % {'value': text})
+    return amount.quantize(CENT)
+
+
+def _csv_rows(handle):
+    text = io.TextIOWrapper(handle, encoding='utf-8-sig', newline='')
+    header = text.readline()
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    return csv.reader(itertools.chain([header], text), delimiter=delimiter)
+
+
+def read_rows(handle, file_format):
+    """
+    Yield ``(row_number, values)`` for every non-blank data row of the binary
+    stream ``handle``, ``values`` mapping the ``IMPORT_COLUMNS`` found in the
+    header to the raw cells. Raises ValueError for an unknown format or
+    missing columns.
+    """
+    workbook = None
+    if file_format == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(handle, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    elif file_format == 'csv':
+        rows = _csv_rows(handle)
+    else:
+        raise ValueError(_("Unknown import format %(format)r.") % {'format': file_format})
+    try:
+        columns = [cell_text(name).lower() for name in next(rows, ())]
+        missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise ValueError(_("Missing columns: %(columns)s.") % {'columns': ', '.join(missing)})
+        positions = [(column, index) for index, column in enumerate(columns) if column in IMPORT_COLUMNS]
+        for number, row in enumerate(rows, start=2):
+            values = {column: row[index] if index < len(row) else None for column, index in positions}
+            if any(cell_text(value) for value in values.values()):
+                yield number, values
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def group_entries(rows):
+    """Group consecutive ``read_rows`` rows of the same ``entry`` into ``(entry, rows)``."""
+    for key, group in itertools.groupby(rows, key=lambda row: cell_text(row[1].get('entry'))):
+        yield key, list(group)
+
+
+class EntryImporter:
+    """
+    Validates and writes batches of grouped rows for one organization,
+    keeping the lookups and the running result between batches.
+    """
+
+    def __init__(self, organization, user=None):
+        self.organization = organization
+        self.user = user
+        self.journals = {journal.code: journal for journal in Journal.objects.filter(organization=organization)}
+        self.periods = list(
+            AccountingPeriod.objects.filter(fiscal_year__organization=organization).order_by('start_date')
+        )
+        self.period_starts = [period.start_date for period in self.periods]
+        # code -> (pk, is_active), or None when the code does not exist
+        self.accounts = {}
+        self.projects = {}
+        self.seen_entries = set()
+        self.result = {'rows': 0, 'entries': 0, 'lines': 0, 'error_count': 0, 'errors': []}
+
+    def period_for(self, day):
+        index = bisect_right(self.period_starts, day) - 1
+        if index >= 0 and self.periods[index].end_date >= day:
+            return self.periods[index]
+        return None
+
+    def _load(self, cache, model, codes):
+        """Look up the ``codes`` not cached yet with one query."""
+        missing = codes - cache.keys()
+        if not missing:
+            return
+        found = {
+            code: (pk, is_active)
+            for code, pk, is_active in model.objects.filter(
+                organization=self.organization, code__in=missing
+            ).values_list('code', 'pk', 'is_active')
+        }
+        for code in missing:
+            cache[code] = found.get(code)
+
+    def reject(self, key, rows, problems):
+        """Count the ``rows`` of entry ``key`` as rejected and report its ``(row, message)`` problems."""
+        self.result['error_count'] += len(rows)
+        for number, message in problems:
+            if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+                self.result['errors'].append({'row': number, 'entry': key, 'message': message})
+
+    def build_entry(self, key, rows):
+        """The unsaved entry and lines of ``rows``, or None once their problems are reported."""
+        problems = []
+        first_number, first = rows[0]
+        if not key:
+            problems.append((first_number, _("The entry column is empty.")))
+        elif key in self.seen_entries:
+            problems.append((first_number, _("The rows of entry %(entry)s must follow each other.") % {'entry': key}))
+        self.seen_entries.add(key)
+
+        journal = self.journals.get(cell_text(first.get('journal')))
+        if journal is None or not journal.is_active:
+            problems.append((first_number, _("Unknown or inactive journal %(journal)r.") % {'journal': cell_text(first.get('journal'))}))
+        day = period = None
+        try:
+            day = parse_day(first.get('date'))
+        except ValueError as exc:
+            problems.append((first_number, str(exc)))
+        if day is not None:
+            period = self.period_for(day)
+            if period is None:
+                problems.append((first_number, _("No accounting period covers %(date)s.") % {'date': day}))
+            elif period.status == 'CLOSED':
+                problems.append((first_number, _("Cannot create or modify entries in a closed accounting period.")))
+        reference = cell_text(first.get('reference'))
+        if len(reference) > TEXT_MAX_LENGTH:
+            problems.append((first_number, _("The reference is longer than %(max)s characters.") % {'max': TEXT_MAX_LENGTH}))
+
+        lines = []
+        total_debit = total_credit = ZERO
+        for number, values in rows:
+            code = cell_text(values.get('account'))
+            account = self.accounts.get(code)
+            if account is None or not account[1]:
+                problems.append((number, _("Unknown or inactive account %(account)r.") % {'account': code}))
+            project_code = cell_text(values.get('project'))
+            project = self.projects.get(project_code) if project_code else None
+            if project_code and project is None:
+                problems.append((number, _("Unknown project %(project)r.") % {'project': project_code}))
+            label = cell_text(values.get('label'))
+            if len(label) > TEXT_MAX_LENGTH:
+                problems.append((number, _("The label is longer than %(max)s characters.") % {'max': TEXT_MAX_LENGTH}))
+            try:
+                debit, credit = parse_amount(values.get('debit')), parse_amount(values.get('credit'))
+            except ValueError as exc:
+                problems.append((number, str(exc)))
+                continue
+            if not debit and not credit:
+                problems.append((number, _("Each line must have either a debit or a credit amount.")))
+            elif debit and credit:
+                problems.append((number, _("A single line cannot have both a debit and a credit amount.")))
+            total_debit += debit or ZERO
+            total_credit += credit or ZERO
+            lines.append(EntryLine(
+                account_id=account[0] if account else None, debit_amount=debit, credit_amount=credit,
+                description=label or None, project_id=project[0] if project else None,
+            ))
+
+        if not problems:
+            if len(lines) < 2:
+                problems.append((first_number, _("An entry needs at least two lines.")))
+            elif total_debit != total_credit:
+                problems.append((first_number, _("Unbalanced entry: %(debit)s debit, %(credit)s credit.") % {
+                    'debit': total_debit, 'credit': total_credit,
+                }))
+        if problems:
+            self.reject(key, rows, problems)
+            return None
+        entry = JournalEntry(
+            organization=self.organization, period=period, journal=journal, date=day,
+            reference=reference or None, description=cell_text(first.get('description')) or key,
+            created_by=self.user, total_debit=total_debit, total_credit=total_credit, line_count=len(lines),
+        )
+        return entry, lines
+
+    def write(self, accepted):
+        """Number and insert the ``(key, rows, entry, lines)`` of a batch in one transaction."""
+        sequences = {}
+        for _key, _rows, entry, _lines in accepted:
+            sequences.setdefault((entry.journal, entry.date.year), []).append(entry)
+        lines = []
+        try:
+            with transaction.atomic():
+                # Same locking order in every worker
+                for (journal, year), entries in sorted(sequences.items(), key=lambda item: (item[0][0].pk, item[0][1])):
+                    numbers = JournalEntry.reserve_entry_numbers(journal, year, len(entries))
+                    for entry, number in zip(entries, numbers):
+                        entry.entry_number = number
+                JournalEntry.objects.bulk_create([entry for _key, _rows, entry, _lines in accepted], batch_size=1000)
+                for _key, _rows, entry, entry_lines in accepted:
+                    for line in entry_lines:
+                        line.journal_entry_id = entry.pk
+                        lines.append(line)
+                EntryLine.objects.bulk_create(lines, batch_size=1000)
+        except IntegrityError as exc:
+            # e.g. an entry number already typed in by hand: the batch can be imported again
+            for key, rows, _entry, _lines in accepted:
+                self.reject(key, rows, [(rows[0][0], _("Could not be written: %(error)s") % {'error': exc})])
+            return
+        self.result['entries'] += len(accepted)
+        self.result['lines'] += len(lines)
+
+    def import_batch(self, groups):
+        """Validate the ``(key, rows)`` groups of a batch and write the valid entries."""
+        rows = [values for _key, group in groups for _number, values in group]
+        self._load(self.accounts, ChartOfAccounts, {cell_text(values.get('account')) for values in rows})
+        self._load(self.projects, Project, {cell_text(values.get('project')) for values in rows} - {''})
+        accepted = []
+        for key, group in groups:
+            built = self.build_entry(key, group)
+            if built is not None:
+                accepted.append((key, group) + built)
+        if accepted:
+            self.write(accepted)
+
+
+def import_entries(organization, handle, file_format, user=None, batch_lines=BATCH_LINES):
+    """
+    Import the journal entries of the CSV or XLSX binary stream ``handle``
+    into ``organization`` as drafts created by ``user``.
+
+    Returns ``{'rows', 'entries', 'lines', 'error_count', 'errors'}``: the data
+    rows read, the entries and lines written, the rows rejected and up to
+    ``MAX_REPORTED_ERRORS`` ``{'row', 'entry', 'message'}`` reasons. Raises
+    ValueError when the file cannot be read at all.
+    """
+    importer = EntryImporter(organization, user)
+    batch, size = [], 0
+    for key, rows in group_entries(read_rows(handle, file_format)):
+        importer.result['rows'] += len(rows)
+        batch.append((key, rows))
+        size += len(rows)
+        if size >= batch_lines:
+            importer.import_batch(batch)
+            batch, size = [], 0
+    if batch:
+        importer.import_batch(batch)
+    if importer.result['entries']:
+        # More pending entries on the dashboard
+        dashboard.invalidate(organization.pk)
+    return importer.result
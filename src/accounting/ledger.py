@@ -0,0 +1,822 @@
+"""
+Ledger aggregation engine.
+
+Computes account balances from posted entry lines (or their pre-aggregated
+``AccountPeriodBalance`` projection) with grouped, conditional aggregation so
+that a report costs a constant number of queries regardless of the size of
+the chart of accounts or the length of the history.
+
+Each organization also has a *ledger version*, a counter kept in the cache
+and bumped whenever posted figures can change (an entry is posted, unposted
+or deleted, a period changes status). Anything derived from the ledger can
+be cached under the current version and is invalidated by the next bump.
+"""
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth
+
+from .models import AccountBalanceSnapshot, AccountingPeriod, AccountPeriodBalance, ChartOfAccounts, EntryLine, JournalEntry
+
+ZERO = Decimal("0.00")
+
+AMOUNT_FIELD = DecimalField(max_digits=17, decimal_places=2)
+
+# Treasury accounts (class 5 in SYSCOHADA)
+CASH_ACCOUNT_PREFIX = '5'
+
+CASH_FLOW_CATEGORIES = ('operating', 'investing', 'financing')
+
+GENERAL_LEDGER_PAGE_SIZE = 100
+
+# Rows fetched per round trip by the server-side cursor of the grand livre
+GRAND_LIVRE_CHUNK_SIZE = 2000
+
+TRIAL_BALANCE_COLUMNS = (
+    'opening_debit', 'opening_credit',
+    'period_debit', 'period_credit',
+    'closing_debit', 'closing_credit',
+)
+MOVEMENT_COLUMNS = TRIAL_BALANCE_COLUMNS[:4]
+
+
+def _ledger_version_key(organization_id):
+    return f"ledger-version:{organization_id}"
+
+
+def ledger_version(organization_id):
+    """Return the current ledger version of an organization."""
+    key = _ledger_version_key(organization_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so that a version lost to eviction never
+        # repeats one that results may still be cached under
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_ledger_version(organization_id):
+    """
+    Invalidate everything cached against the organization's ledger. The bump
+    happens once the surrounding transaction commits, so readers never cache
+    figures under a version whose changes they cannot see yet.
+    """
+    def bump():
+        key = _ledger_version_key(organization_id)
+        ledger_version(organization_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between the read and the increment
+            ledger_version(organization_id)
+
+    transaction.on_commit(bump)
+
+
+def ledger_state(organization):
+    """
+    Summarize what the reports of ``organization`` depend on, cheaply enough to
+    be checked on every request: the latest entry posting and modification
+    times, the number of posted entries (which catches deletions), the closed
+    periods, the chart of accounts size and the ledger version, which every
+    account save bumps (renames, type and parent changes move no timestamp).
+    """
+    state = JournalEntry.objects.filter(organization=organization).aggregate(
+        last_posted_at=Max('posted_at'),
+        last_updated_at=Max('updated_at'),
+        posted_count=Count('pk', filter=Q(posted=True)),
+    )
+    state['closed_periods'] = list(
+        AccountingPeriod.objects.filter(
+            fiscal_year__organization=organization, status='CLOSED'
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+    state.update(ChartOfAccounts.objects.filter(organization=organization).aggregate(
+        account_count=Count('pk'), last_account_id=Max('pk'),
+    ))
+    state['ledger_version'] = ledger_version(organization.pk)
+    return state
+
+
+def _conditional_sum(field, condition):
+    """Sum a related amount ``field`` of ``ChartOfAccounts``, restricted to ``condition``."""
+    return Coalesce(Sum(field, filter=condition), Value(ZERO), output_field=AMOUNT_FIELD)
+
+
+def ledger_periods(organization):
+    """
+    The accounting periods of ``organization`` as ``(pk, start_date,
+    end_date, snapshot_at)`` tuples in date order, from which the
+    aggregations below decide how to read each range.
+    """
+    return list(AccountingPeriod.objects.filter(
+        fiscal_year__organization=organization
+    ).order_by('end_date').values_list('pk', 'start_date', 'end_date', 'snapshot_at'))
+
+
+def _aligned(periods, ranges):
+    for _pk, period_start, period_end, _snapshot_at in periods:
+        for start_date, end_date in ranges:
+            if period_start <= end_date < period_end:
+                return False
+            if start_date is not None and period_start < start_date <= period_end:
+                return False
+    return True
+
+
+def periods_aligned(organization, ranges):
+    """
+    True when no accounting period of ``organization`` straddles an end of
+    any ``(start_date, end_date)`` range, so that ``AccountPeriodBalance``
+    rows can answer them all exactly. ``start_date`` may be None.
+    """
+    return _aligned(ledger_periods(organization), ranges)
+
+
+def is_period_aligned(organization, start_date, end_date):
+    """``periods_aligned`` for a single range."""
+    return periods_aligned(organization, [(start_date, end_date)])
+
+
+def snapshot_base(periods, as_of):
+    """
+    Where to read the cumulative balances as of ``as_of`` from: the
+    ``(period_id, end_date)`` of the latest ``AccountBalanceSnapshot`` on or
+    before it, or ``(None, None)`` for the start of the ledger, provided the
+    dates after it up to ``as_of`` fall within at most one accounting period.
+    Returns None when more than one period would have to be re-aggregated.
+    """
+    base = (None, None)
+    for pk, _start, end_date, snapshot_at in periods:
+        if end_date > as_of:
+            break
+        if snapshot_at is not None:
+            base = (pk, end_date)
+    pending = [
+        pk for pk, start_date, end_date, _snapshot_at in periods
+        if start_date <= as_of and (base[1] is None or end_date > base[1])
+    ]
+    return base if len(pending) <= 1 else None
+
+
+def _subquery_total(queryset, account_path, field):
+    """Correlated sum of ``field`` over the rows of ``queryset`` belonging to the outer account."""
+    total = queryset.filter(**{account_path: OuterRef('pk')}).order_by().values(account_path).annotate(
+        total=Sum(field)
+    ).values('total')
+    return Coalesce(Subquery(total, output_field=AMOUNT_FIELD), Value(ZERO), output_field=AMOUNT_FIELD)
+
+
+def _cumulative_from_snapshot(account_path, base, as_of):
+    """
+    Debit and credit expressions of the posted totals up to ``as_of``: the
+    frozen closing balances of the ``snapshot_base`` period plus the lines
+    dated after it.
+    """
+    period_id, end_date = base
+    lines = EntryLine.objects.filter(journal_entry__posted=True, journal_entry__date__lte=as_of)
+    if end_date is not None:
+        lines = lines.filter(journal_entry__date__gt=end_date)
+    totals = []
+    for snapshot_field, line_field in (('debit', 'debit_amount'), ('credit', 'credit_amount')):
+        total = _subquery_total(lines, account_path, line_field) if end_date != as_of else Value(ZERO, output_field=AMOUNT_FIELD)
+        if period_id is not None:
+            total = _subquery_total(AccountBalanceSnapshot.objects.filter(period_id=period_id), account_path, snapshot_field) + total
+        totals.append(total)
+    return totals
+
+
+def _snapshot_plan(periods, ranges):
+    """
+    ``snapshot_base`` of every cut-off date of ``ranges`` (the end date and
+    the day before the start date), or None unless all of them can be read
+    from snapshots and at least one actually is.
+    """
+    plan = {}
+    for start_date, end_date in ranges:
+        cutoffs = [end_date] if start_date is None else [end_date, start_date - timedelta(days=1)]
+        for cutoff in cutoffs:
+            plan[cutoff] = snapshot_base(periods, cutoff)
+            if plan[cutoff] is None:
+                return None
+    if all(period_id is None for period_id, _end_date in plan.values()):
+        return None
+    return plan
+
+
+def _snapshot_range(account_path, plan, start_date, end_date):
+    """Debit and credit expressions of the posted amounts of ``start_date``..``end_date`` read through ``plan``."""
+    closing = _cumulative_from_snapshot(account_path, plan[end_date], end_date)
+    if start_date is None:
+        return closing
+    before = start_date - timedelta(days=1)
+    opening = _cumulative_from_snapshot(account_path, plan[before], before)
+    return [total - prior for total, prior in zip(closing, opening)]
+
+
+def _amount_fields(prefix, aligned):
+    """Paths from ``ChartOfAccounts`` to the debit and credit amounts to sum."""
+    if aligned:
+        return prefix + 'period_balances__debit', prefix + 'period_balances__credit'
+    return prefix + 'entry_lines__debit_amount', prefix + 'entry_lines__credit_amount'
+
+
+def _within(prefix, aligned, start_date, end_date):
+    """Condition selecting the posted amounts of ``start_date``..``end_date`` (open start when None)."""
+    def on(**lookups):
+        return Q(**{prefix + lookup: value for lookup, value in lookups.items()})
+
+    if aligned:
+        condition = on(period_balances__period__end_date__lte=end_date)
+        if start_date is not None:
+            condition &= on(period_balances__period__start_date__gte=start_date)
+    else:
+        condition = on(entry_lines__journal_entry__posted=True, entry_lines__journal_entry__date__lte=end_date)
+        if start_date is not None:
+            condition &= on(entry_lines__journal_entry__date__gte=start_date)
+    return condition
+
+
+def account_movements(organization, start_date, end_date, rollup=False):
+    """
+    Annotate every account of ``organization`` with its opening and period
+    debit/credit totals.
+
+    Opening covers posted amounts dated before ``start_date``; period covers
+    posted amounts between ``start_date`` and ``end_date`` inclusive. When
+    ``start_date`` is None the opening columns are zero and the period
+    columns cover everything up to ``end_date``.
+
+    With ``rollup`` each account's totals include those of all its
+    sub-accounts, joined through the ``AccountClosure`` hierarchy index, so
+    every level of the chart is subtotalled by the same single query.
+
+    Balances at closed period boundaries are read from the frozen
+    ``AccountBalanceSnapshot`` rows, plus the lines of at most one later
+    period. Otherwise ranges that fall on accounting period boundaries are
+    read from the pre-aggregated ``AccountPeriodBalance`` projection and
+    other ranges fall back to the entry lines. Either way the totals come
+    from one query.
+    """
+    accounts = ChartOfAccounts.objects.filter(organization=organization).order_by('code')
+    periods = ledger_periods(organization)
+    plan = _snapshot_plan(periods, [(start_date, end_date)])
+    if plan is not None:
+        account_path = 'account__ancestor_links__ancestor' if rollup else 'account'
+        period_debit, period_credit = _snapshot_range(account_path, plan, start_date, end_date)
+        if start_date is None:
+            opening_debit = opening_credit = Value(ZERO, output_field=AMOUNT_FIELD)
+        else:
+            opening_debit, opening_credit = _snapshot_range(account_path, plan, None, start_date - timedelta(days=1))
+        return accounts.annotate(
+            opening_debit=opening_debit, opening_credit=opening_credit,
+            period_debit=period_debit, period_credit=period_credit,
+        )
+
+    prefix = 'descendant_links__descendant__' if rollup else ''
+    aligned = _aligned(periods, [(start_date, end_date)])
+    debit, credit = _amount_fields(prefix, aligned)
+    within = _within(prefix, aligned, start_date, end_date)
+
+    if start_date is None:
+        no_opening = Value(ZERO, output_field=AMOUNT_FIELD)
+        opening = {'opening_debit': no_opening, 'opening_credit': no_opening}
+    else:
+        before = _within(prefix, aligned, None, start_date - timedelta(days=1))
+        opening = {
+            'opening_debit': _conditional_sum(debit, before),
+            'opening_credit': _conditional_sum(credit, before),
+        }
+    return accounts.annotate(
+        **opening,
+        period_debit=_conditional_sum(debit, within),
+        period_credit=_conditional_sum(credit, within),
+    )
+
+
+def comparative_movements(organization, ranges, rollup=True):
+    """
+    Pivot the debit/credit totals of every account over several ranges.
+
+    ``ranges`` is a list of ``(start_date, end_date)`` pairs (``start_date``
+    None for as-of balances); the accounts come back annotated with
+    ``debit_<i>`` and ``credit_<i>`` for each range index ``i``, all from one
+    query with one conditional sum (or, when every range ends on snapshotted
+    boundaries, one snapshot read) per cell.
+    """
+    periods = ledger_periods(organization)
+    plan = _snapshot_plan(periods, ranges)
+    columns = {}
+    if plan is not None:
+        account_path = 'account__ancestor_links__ancestor' if rollup else 'account'
+        for index, (start_date, end_date) in enumerate(ranges):
+            columns[f'debit_{index}'], columns[f'credit_{index}'] = _snapshot_range(account_path, plan, start_date, end_date)
+    else:
+        prefix = 'descendant_links__descendant__' if rollup else ''
+        aligned = _aligned(periods, ranges)
+        debit, credit = _amount_fields(prefix, aligned)
+        for index, (start_date, end_date) in enumerate(ranges):
+            within = _within(prefix, aligned, start_date, end_date)
+            columns[f'debit_{index}'] = _conditional_sum(debit, within)
+            columns[f'credit_{index}'] = _conditional_sum(credit, within)
+    return ChartOfAccounts.objects.filter(organization=organization).annotate(**columns).order_by('code')
+
+
+# Account types of the income statement
+RESULT_ACCOUNT_TYPES = ('REVENUE', 'EXPENSE')
+
+
+def carry_forward_movements(organization, ranges, rollup=True):
+    """
+    Posted OPENING journal amounts on revenue and expense accounts per range:
+    the lines of the opening entries that carry a closed year's result into
+    retained earnings (see ``accounting.closing``). Returns ``{account_id:
+    [(debit, credit) per range]}`` from one grouped query; with ``rollup``
+    every ancestor account gets its subtree's amounts.
+    """
+    account_path = 'account__ancestor_links__ancestor' if rollup else 'account'
+    columns = {}
+    for index, (start_date, end_date) in enumerate(ranges):
+        within = Q(journal_entry__date__lte=end_date)
+        if start_date is not None:
+            within &= Q(journal_entry__date__gte=start_date)
+        columns[f'debit_{index}'] = Coalesce(Sum('debit_amount', filter=within), Value(ZERO), output_field=AMOUNT_FIELD)
+        columns[f'credit_{index}'] = Coalesce(Sum('credit_amount', filter=within), Value(ZERO), output_field=AMOUNT_FIELD)
+    rows = EntryLine.objects.filter(
+        journal_entry__organization=organization,
+        journal_entry__posted=True,
+        journal_entry__journal__type='OPENING',
+        account__account_type__in=RESULT_ACCOUNT_TYPES,
+    ).values(account_path).annotate(**columns).order_by()
+    return {
+        row[account_path]: [(row[f'debit_{index}'], row[f'credit_{index}']) for index in range(len(ranges))]
+        for row in rows
+    }
+
+
+def without_carry_forward(organization, accounts, ranges, columns, rollup=True):
+    """
+    Take the carry-forward amounts out of annotated revenue and expense
+    ``accounts``, so an income statement only shows what was earned and
+    spent. ``columns`` names the ``(debit, credit)`` attributes holding each
+    range's totals. Returns ``accounts`` as a list.
+    """
+    accounts = list(accounts)
+    carried = carry_forward_movements(organization, ranges, rollup)
+    for account in accounts:
+        for (debit, credit), (debit_attr, credit_attr) in zip(carried.get(account.pk, ()), columns):
+            setattr(account, debit_attr, getattr(account, debit_attr) - debit)
+            setattr(account, credit_attr, getattr(account, credit_attr) - credit)
+    return accounts
+
+
+# What ``balances`` can group by, as paths from ``EntryLine`` (or expressions)
+BALANCE_DIMENSIONS = {
+    'account': 'account_id',
+    'account_type': 'account__account_type',
+    'period': 'journal_entry__period_id',
+    'fiscal_year': 'journal_entry__period__fiscal_year_id',
+    'project': 'project_id',
+    'journal': 'journal_entry__journal_id',
+    'journal_code': 'journal_entry__journal__code',
+    'journal_type': 'journal_entry__journal__type',
+    'cleared': 'is_cleared',
+    'month': TruncMonth('journal_entry__date'),
+    'day': TruncDay('journal_entry__date'),
+}
+
+# The dimensions ``AccountPeriodBalance`` keeps, as paths from it
+PROJECTED_DIMENSIONS = {
+    'account': 'account_id',
+    'account_type': 'account__account_type',
+    'period': 'period_id',
+    'fiscal_year': 'period__fiscal_year_id',
+}
+
+
+def balances(organization, accounts=None, prefixes=None, start_date=None, end_date=None,
+             group_by=('account',), periods=None):
+    """
+    Posted debit and credit totals of ``organization`` grouped by any of
+    ``BALANCE_DIMENSIONS``, from one query.
+
+    ``accounts`` (instances or ids) and ``prefixes`` (account code prefixes)
+    narrow the accounts; ``start_date`` and ``end_date`` bound the entry
+    dates, either may be None. Returns one dict per group holding the
+    ``group_by`` values (``month`` and ``day`` as the first date of their
+    bucket) and ``debit``/``credit``; with an empty ``group_by`` a single
+    dict with the overall totals.
+
+    Groupings the ``AccountPeriodBalance`` projection keeps, over a range
+    that falls on accounting period boundaries, are read from it instead of
+    the entry lines; ``periods`` saves looking the periods up again for that
+    (see ``ledger_periods``).
+    """
+    group_by = tuple(group_by)
+    unknown = set(group_by) - set(BALANCE_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Cannot group balances by {', '.join(sorted(unknown))}")
+    projectable = set(group_by) <= set(PROJECTED_DIMENSIONS)
+    if projectable and periods is None:
+        periods = ledger_periods(organization)
+
+    if projectable and _aligned(periods, [(start_date, end_date or date.max)]):
+        fields, debit, credit = PROJECTED_DIMENSIONS, 'debit', 'credit'
+        rows = AccountPeriodBalance.objects.filter(organization=organization)
+        if start_date is not None:
+            rows = rows.filter(period__start_date__gte=start_date)
+        if end_date is not None:
+            rows = rows.filter(period__end_date__lte=end_date)
+    else:
+        fields, debit, credit = BALANCE_DIMENSIONS, 'debit_amount', 'credit_amount'
+        rows = EntryLine.objects.filter(journal_entry__organization=organization, journal_entry__posted=True)
+        if start_date is not None:
+            rows = rows.filter(journal_entry__date__gte=start_date)
+        if end_date is not None:
+            rows = rows.filter(journal_entry__date__lte=end_date)
+
+    if accounts is not None:
+        rows = rows.filter(account__in=[getattr(account, 'pk', account) for account in accounts])
+    if prefixes:
+        codes = Q()
+        for prefix in prefixes:
+            codes |= Q(account__code__startswith=prefix)
+        rows = rows.filter(codes)
+
+    totals = {
+        'debit': Coalesce(Sum(debit), Value(ZERO), output_field=AMOUNT_FIELD),
+        'credit': Coalesce(Sum(credit), Value(ZERO), output_field=AMOUNT_FIELD),
+    }
+    if not group_by:
+        return [rows.aggregate(**totals)]
+    paths = [fields[dimension] for dimension in group_by if isinstance(fields[dimension], str)]
+    expressions = {dimension: fields[dimension] for dimension in group_by if not isinstance(fields[dimension], str)}
+    keys = [dimension if dimension in expressions else fields[dimension] for dimension in group_by]
+    return [
+        {
+            **{dimension: row[key] for dimension, key in zip(group_by, keys)},
+            'debit': row['debit'], 'credit': row['credit'],
+        }
+        for row in rows.order_by().values(*paths, **expressions).annotate(**totals)
+    ]
+
+
+class LedgerService:
+    """
+    The one place modules read posted balances through.
+
+    Wraps ``balances`` for an organization and memoizes its results for the
+    lifetime of the service, which ``for_request`` ties to a request: the
+    same figures asked for twice while rendering a page are queried once.
+    """
+
+    def __init__(self, organization):
+        self.organization = organization
+        self._periods = None
+        self._results = {}
+
+    @classmethod
+    def for_request(cls, request, organization):
+        """The service of ``organization`` shared by everything handling ``request``."""
+        services = request.__dict__.setdefault('_ledger_services', {})
+        if organization.pk not in services:
+            services[organization.pk] = cls(organization)
+        return services[organization.pk]
+
+    def periods(self):
+        if self._periods is None:
+            self._periods = ledger_periods(self.organization)
+        return self._periods
+
+    def balances(self, accounts=None, prefixes=None, start_date=None, end_date=None, group_by=('account',)):
+        """``ledger.balances`` of the service's organization, memoized."""
+        if accounts is not None:
+            accounts = tuple(sorted(getattr(account, 'pk', account) for account in accounts))
+        if prefixes is not None:
+            prefixes = tuple(prefixes)
+        key = (accounts, prefixes, start_date, end_date, tuple(group_by))
+        if key not in self._results:
+            projectable = set(group_by) <= set(PROJECTED_DIMENSIONS)
+            self._results[key] = balances(
+                self.organization, accounts, prefixes, start_date, end_date, group_by,
+                periods=self.periods() if projectable else None,
+            )
+        return self._results[key]
+
+    def totals(self, accounts=None, prefixes=None, start_date=None, end_date=None):
+        """Overall ``(debit, credit)`` of the selected accounts and dates."""
+        row = self.balances(accounts, prefixes, start_date, end_date, group_by=())[0]
+        return row['debit'], row['credit']
+
+    def balance(self, accounts=None, prefixes=None, start_date=None, end_date=None):
+        """Net debit minus credit of the selected accounts and dates."""
+        debit, credit = self.totals(accounts, prefixes, start_date, end_date)
+        return debit - credit
+
+    def clear(self):
+        """Forget the memoized results, after posting for instance."""
+        self._periods = None
+        self._results = {}
+
+
+def hierarchy_order(accounts):
+    """
+    Arrange ``accounts`` depth-first, children after their parent in code
+    order. Accounts whose parent is not among ``accounts`` start a new tree.
+
+    Returns ``(account, depth, path, has_children)`` tuples, where ``path``
+    is the ``/``-joined ids from the root down to the account, for
+    collapsing a subtree in the page.
+    """
+    accounts = sorted(accounts, key=lambda account: account.code)
+    by_id = {account.id: account for account in accounts}
+    children = {}
+    roots = []
+    for account in accounts:
+        if account.parent_account_id in by_id:
+            children.setdefault(account.parent_account_id, []).append(account)
+        else:
+            roots.append(account)
+
+    ordered = []
+    stack = [(account, 0, str(account.id)) for account in reversed(roots)]
+    while stack:
+        account, depth, path = stack.pop()
+        ordered.append((account, depth, path, account.id in children))
+        for child in reversed(children.get(account.id, ())):
+            stack.append((child, depth + 1, f"{path}/{child.id}"))
+    return ordered
+
+
+def closing_balance(total_debit, total_credit):
+    """Split a net balance into its (closing_debit, closing_credit) pair."""
+    net_balance = total_debit - total_credit
+    if net_balance > 0:
+        return net_balance, ZERO
+    if net_balance < 0:
+        return ZERO, -net_balance
+    return ZERO, ZERO
+
+
+def trial_balance(organization, start_date, end_date):
+    """
+    Build the trial balance of ``organization`` for ``start_date``..``end_date``.
+
+    Returns ``(report_data, grand_totals)`` where ``report_data`` is a list of
+    per-account dicts keyed by ``TRIAL_BALANCE_COLUMNS`` plus ``id``, ``code``,
+    ``name`` and the hierarchy keys ``depth``, ``path`` and ``is_subtotal``.
+    Accounts with sub-accounts are subtotal rows covering their whole
+    subtree. ``grand_totals`` counts every account once, its closing columns
+    adding up the closing balance of each account's own movements, so debit
+    and credit balances under one parent do not cancel out.
+    """
+    report_data = []
+    grand_totals = dict.fromkeys(TRIAL_BALANCE_COLUMNS, ZERO)
+    # Movements of each account without its sub-accounts: its row less its children's
+    own = {}
+
+    accounts = account_movements(organization, start_date, end_date, rollup=True)
+    for acc, depth, path, has_children in hierarchy_order(accounts):
+        closing_debit, closing_credit = closing_balance(
+            acc.opening_debit + acc.period_debit,
+            acc.opening_credit + acc.period_credit,
+        )
+        row = {
+            'id': acc.id,
+            'code': acc.code,
+            'name': acc.name,
+            'depth': depth,
+            'path': path,
+            'is_subtotal': has_children,
+            'opening_debit': acc.opening_debit,
+            'opening_credit': acc.opening_credit,
+            'period_debit': acc.period_debit,
+            'period_credit': acc.period_credit,
+            'closing_debit': closing_debit,
+            'closing_credit': closing_credit,
+        }
+        report_data.append(row)
+        own[acc.id] = [row[column] for column in MOVEMENT_COLUMNS]
+        if depth:
+            parent = own[int(path.rsplit('/', 2)[-2])]
+            for index, value in enumerate(own[acc.id]):
+                parent[index] -= value
+
+    for opening_debit, opening_credit, period_debit, period_credit in own.values():
+        grand_totals['opening_debit'] += opening_debit
+        grand_totals['opening_credit'] += opening_credit
+        grand_totals['period_debit'] += period_debit
+        grand_totals['period_credit'] += period_credit
+        closing_debit, closing_credit = closing_balance(opening_debit + period_debit, opening_credit + period_credit)
+        grand_totals['closing_debit'] += closing_debit
+        grand_totals['closing_credit'] += closing_credit
+
+    return report_data, grand_totals
+
+
+def classify_cash_flow(account_type):
+    """Map the account type of a cash movement's counterpart to a cash flow activity."""
+    if account_type is None or account_type in ('REVENUE', 'EXPENSE'):
+        return 'operating'
+    if account_type == 'ASSET':  # Fixed assets usually
+        return 'investing'
+    return 'financing'
+
+
+def cash_flow(organization, start_date, end_date):
+    """
+    Build the (direct method, simplified) cash flow statement of ``organization``.
+
+    Cash movements are netted per journal entry and classified by the type
+    of the entry's first non-cash line. Two queries in total: one grouped
+    pass over class-5 lines that yields the net movement of every entry in
+    the range together with the opening cash balance, and one that loads the
+    counterpart account types of all those entries.
+    """
+    report_data = {
+        category: {'in': ZERO, 'out': ZERO, 'net': ZERO} for category in CASH_FLOW_CATEGORIES
+    }
+    report_data['summary'] = {'beginning': ZERO, 'net_change': ZERO, 'ending': ZERO}
+
+    posted_lines = EntryLine.objects.filter(
+        journal_entry__organization=organization,
+        journal_entry__posted=True,
+    )
+    cash_lines = posted_lines.filter(
+        account__code__startswith=CASH_ACCOUNT_PREFIX,
+        journal_entry__date__lte=end_date,
+    )
+    # Lines before the range fall into a single NULL bucket: the opening balance
+    movements = cash_lines.values(
+        bucket=Case(When(journal_entry__date__gte=start_date, then=F('journal_entry_id')))
+    ).annotate(
+        net=Sum(Coalesce('debit_amount', Value(ZERO)) - Coalesce('credit_amount', Value(ZERO)))
+    ).order_by()
+
+    net_by_entry = {}
+    for row in movements.iterator():
+        if row['bucket'] is None:
+            report_data['summary']['beginning'] = row['net'] or ZERO
+        elif row['net']:
+            net_by_entry[row['bucket']] = row['net']
+
+    counterparts = {}
+    if net_by_entry:
+        period_entries = cash_lines.filter(journal_entry__date__gte=start_date).values('journal_entry_id')
+        other_lines = EntryLine.objects.filter(
+            journal_entry_id__in=period_entries,
+        ).exclude(
+            account__code__startswith=CASH_ACCOUNT_PREFIX,
+        ).values_list('journal_entry_id', 'account__account_type').order_by('journal_entry_id', 'id')
+        for entry_id, account_type in other_lines.iterator():
+            counterparts.setdefault(entry_id, account_type)
+
+    for entry_id, amount in net_by_entry.items():
+        section = report_data[classify_cash_flow(counterparts.get(entry_id))]
+        if amount > 0:
+            section['in'] += amount
+        else:
+            section['out'] += -amount
+
+    for category in CASH_FLOW_CATEGORIES:
+        report_data[category]['net'] = report_data[category]['in'] - report_data[category]['out']
+        report_data['summary']['net_change'] += report_data[category]['net']
+    report_data['summary']['ending'] = report_data['summary']['beginning'] + report_data['summary']['net_change']
+    return report_data
+
+
+def _signed_amount():
+    """Debit minus credit of an entry line, treating missing amounts as zero."""
+    return Coalesce('debit_amount', Value(ZERO)) - Coalesce('credit_amount', Value(ZERO))
+
+
+def format_ledger_cursor(cursor):
+    """Serialize a ``(date, line id)`` general ledger cursor for a query string."""
+    entry_date, line_id = cursor
+    return f"{entry_date.isoformat()}.{line_id}"
+
+
+def parse_ledger_cursor(value):
+    """Parse a cursor produced by ``format_ledger_cursor``; None when absent or invalid."""
+    try:
+        entry_date, line_id = value.split('.')
+        return date.fromisoformat(entry_date), int(line_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def general_ledger_page(account, start_date=None, end_date=None, after=None, page_size=GENERAL_LEDGER_PAGE_SIZE):
+    """
+    Return one page of the general ledger of ``account`` with running balances.
+
+    Lines are ordered by (entry date, line id) and ``after`` is the keyset
+    cursor of the last line of the previous page, so the database seeks
+    straight to the page instead of skipping an offset. The balance carried
+    into the page (everything posted before the range, plus earlier pages)
+    is a single aggregate, and the running balance within the page is a
+    window sum, so every page costs two queries whatever its position.
+
+    Returns a dict with ``lines`` (each carrying ``running_balance``),
+    ``carried_balance``, ``closing_balance`` and ``next_cursor`` (None on the
+    last page).
+    """
+    lines = EntryLine.objects.filter(account=account, journal_entry__posted=True)
+    in_range = lines
+    if start_date is not None:
+        in_range = in_range.filter(journal_entry__date__gte=start_date)
+    if end_date is not None:
+        in_range = in_range.filter(journal_entry__date__lte=end_date)
+
+    if after is not None:
+        cursor_date, cursor_id = after
+        in_range = in_range.filter(
+            Q(journal_entry__date__gt=cursor_date) | Q(journal_entry__date=cursor_date, id__gt=cursor_id)
+        )
+        carried = Q(journal_entry__date__lt=cursor_date) | Q(journal_entry__date=cursor_date, id__lte=cursor_id)
+    elif start_date is not None:
+        carried = Q(journal_entry__date__lt=start_date)
+    else:
+        carried = None
+
+    carried_balance = ZERO
+    if carried is not None:
+        carried_balance = lines.filter(carried).aggregate(
+            balance=Coalesce(Sum(_signed_amount()), Value(ZERO), output_field=DecimalField(max_digits=17, decimal_places=2))
+        )['balance']
+
+    ordering = (F('journal_entry__date').asc(), F('id').asc())
+    page = list(
+        in_range.select_related('journal_entry__journal').annotate(
+            cumulative=Window(
+                expression=Sum(_signed_amount()),
+                order_by=ordering,
+                output_field=DecimalField(max_digits=17, decimal_places=2),
+            )
+        ).order_by(*ordering)[:page_size + 1]
+    )
+    has_next = len(page) > page_size
+    page = page[:page_size]
+    for line in page:
+        line.running_balance = carried_balance + line.cumulative
+
+    return {
+        'lines': page,
+        'carried_balance': carried_balance,
+        'closing_balance': page[-1].running_balance if page else carried_balance,
+        'next_cursor': (page[-1].journal_entry.date, page[-1].id) if has_next else None,
+    }
+
+
+def grand_livre(organization, start_date, end_date):
+    """
+    Walk the whole general ledger of ``organization`` for ``start_date``..``end_date``.
+
+    Yields, account by account in code order::
+
+        ('account', code, name, opening_balance)
+        ('line', date, entry_number, journal_code, reference, description, debit, credit, balance)
+        ...
+        ('total', code, total_debit, total_credit, closing_balance)
+
+    Accounts without an opening balance or movements are skipped. Opening
+    balances come from one grouped query and every line of every account
+    from a single ordered query read through a server-side cursor, so
+    memory stays flat however large the ledger is.
+    """
+    accounts = [
+        account for account in account_movements(organization, start_date, end_date)
+        if account.opening_debit != account.opening_credit or account.period_debit or account.period_credit
+    ]
+    lines = EntryLine.objects.filter(
+        journal_entry__organization=organization,
+        journal_entry__posted=True,
+        journal_entry__date__gte=start_date,
+        journal_entry__date__lte=end_date,
+    ).order_by('account__code', 'journal_entry__date', 'id').values_list(
+        'account_id', 'journal_entry__date', 'journal_entry__entry_number', 'journal_entry__journal__code',
+        'journal_entry__reference', 'description', 'debit_amount', 'credit_amount',
+    ).iterator(chunk_size=GRAND_LIVRE_CHUNK_SIZE)
+
+    listed = {account.id for account in accounts}
+    line = next(lines, None)
+    for account in accounts:
+        # Lines of skipped accounts (only 0.00 movements) sort before this one's
+        while line is not None and line[0] not in listed:
+            line = next(lines, None)
+        balance = account.opening_debit - account.opening_credit
+        total_debit = total_credit = ZERO
+        yield ('account', account.code, account.name, balance)
+        while line is not None and line[0] == account.id:
+            _account_id, entry_date, entry_number, journal_code, reference, description, debit, credit = line
+            debit, credit = debit or ZERO, credit or ZERO
+            balance += debit - credit
+            total_debit += debit
+            total_credit += credit
+            yield ('line', entry_date, entry_number, journal_code, reference, description, debit, credit, balance)
+            line = next(lines, None)
+        yield ('total', account.code, total_debit, total_credit, balance)
@@ -0,0 +1,74 @@
+"""
+Management command to close fiscal years and carry their result forward into
+the next year's opening entry (see accounting.closing).
+
+Usage:
+    python manage.py close_fiscal_year --fiscal-year ID
+    python manage.py close_fiscal_year --end-date 2025-12-31 [--organization ID]
+
+Options:
+    --fiscal-year ID         Close this fiscal year
+    --end-date YYYY-MM-DD    Close the fiscal year ending on this date in every
+                             organization (or only --organization)
+    --organization ID        Limit --end-date to one organization
+    --retained-earnings CODE Account receiving the result (default: 12)
+
+Closing a year that is already closed is a no-op, so the command can be
+re-run after fixing the organizations that failed.
+"""
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.closing import RETAINED_EARNINGS_CODE, close_fiscal_year
+from accounting.models import FiscalYear
+
+
+class Command(BaseCommand):
+    help = "Close fiscal years: close their periods and carry result accounts into retained earnings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fiscal-year', type=int, help='Fiscal year ID to close')
+        parser.add_argument('--end-date', help='Close the fiscal years ending on this date (YYYY-MM-DD)')
+        parser.add_argument('--organization', type=int, help='Organization ID (with --end-date; default: all)')
+        parser.add_argument(
+            '--retained-earnings', default=RETAINED_EARNINGS_CODE,
+            help=f'Code of the retained earnings account (default: {RETAINED_EARNINGS_CODE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['fiscal_year']:
+            fiscal_years = FiscalYear.objects.filter(pk=options['fiscal_year'])
+        elif options['end_date']:
+            try:
+                end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--end-date must be YYYY-MM-DD.")
+            fiscal_years = FiscalYear.objects.filter(end_date=end_date)
+            if options['organization']:
+                fiscal_years = fiscal_years.filter(organization_id=options['organization'])
+        else:
+            raise CommandError("Give --fiscal-year or --end-date.")
+
+        fiscal_years = list(fiscal_years.select_related('organization').order_by('organization__name'))
+        if not fiscal_years:
+            raise CommandError("No matching fiscal year.")
+
+        failures = 0
+        for fiscal_year in fiscal_years:
+            label = f"{fiscal_year.organization.name} / {fiscal_year.name}"
+            try:
+                entry = close_fiscal_year(fiscal_year, options['retained_earnings'])
+            except ValidationError as exc:
+                failures += 1
+                self.stderr.write(f"{label}: {' '.join(exc.messages)}")
+                continue
+            if entry is None:
+                self.stdout.write(f"{label}: closed, no result to carry forward.")
+            else:
+                self.stdout.write(f"{label}: closed, opening entry {entry.entry_number}.")
+
+        if failures:
+            raise CommandError(f"{failures} of {len(fiscal_years)} fiscal years could not be closed.")
+        self.stdout.write(self.style.SUCCESS(f"Closed {len(fiscal_years)} fiscal years."))
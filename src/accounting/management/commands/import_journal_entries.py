@@ -0,0 +1,57 @@
+"""
+Management command to import journal entries from a CSV or XLSX file (see
+accounting.importing for the columns).
+
+Usage:
+    python manage.py import_journal_entries FILE --organization ID [--user USERNAME]
+
+Options:
+    --organization ID   Organization receiving the entries
+    --format FORMAT     csv or xlsx (default: from the file extension)
+    --user USERNAME     Recorded as the creator of the entries
+
+Entries are imported as drafts. Rejected rows are listed with their reason and
+do not stop the rest of the file; fix them and import those rows again.
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.importing import import_entries
+from organization.models import Organization
+
+
+class Command(BaseCommand):
+    help = "Import journal entries (as drafts) from a CSV or XLSX file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV or XLSX file of entry lines')
+        parser.add_argument('--organization', type=int, required=True, help='Organization ID')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], help='File format (default: from the extension)')
+        parser.add_argument('--user', help='Username recorded as the creator of the entries')
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.filter(pk=options['organization']).first()
+        if organization is None:
+            raise CommandError(f"Organization {options['organization']} does not exist.")
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist.")
+        file_format = options['format'] or options['file'].rsplit('.', 1)[-1].lower()
+
+        try:
+            with open(options['file'], 'rb') as handle:
+                result = import_entries(organization, handle, file_format, user=user)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']} (entry {error['entry']}): {error['message']}")
+        if result['error_count'] > len(result['errors']):
+            self.stderr.write(f"... {result['error_count'] - len(result['errors'])} more rejected rows.")
+        summary = (
+            f"Imported {result['entries']} entries ({result['lines']} lines) from {result['rows']} rows; "
+            f"{result['error_count']} rows rejected."
+        )
+        self.stdout.write(self.style.SUCCESS(summary) if not result['error_count'] else self.style.WARNING(summary))
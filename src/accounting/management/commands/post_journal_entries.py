@@ -0,0 +1,64 @@
+"""
+Management command to post the draft journal entries of an organization in
+one batch (month-end posting).
+
+Usage:
+    python manage.py post_journal_entries --organization ID [--period ID | --until DATE] [--journal CODE] [--user USERNAME]
+
+Options:
+    --organization ID   Organization whose drafts are posted
+    --period ID         Only the drafts of this accounting period
+    --until DATE        Only the drafts dated on or before DATE (YYYY-MM-DD)
+    --journal CODE      Only the drafts of this journal
+    --user USERNAME     Recorded as the user who posted the entries
+
+Entries that cannot be posted (no lines, unbalanced, closed period, over an
+approved budget) stay drafts and are listed with their reason.
+"""
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.models import JournalEntry
+from accounting.posting import post_entries
+from organization.models import Organization
+
+
+class Command(BaseCommand):
+    help = "Post the draft journal entries of an organization in one batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, required=True, help='Organization ID')
+        scope = parser.add_mutually_exclusive_group()
+        scope.add_argument('--period', type=int, help='Accounting period ID')
+        scope.add_argument('--until', help='Last entry date to post (YYYY-MM-DD)')
+        parser.add_argument('--journal', help='Journal code')
+        parser.add_argument('--user', help='Username recorded as the poster')
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.filter(pk=options['organization']).first()
+        if organization is None:
+            raise CommandError(f"Organization {options['organization']} does not exist.")
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist.")
+
+        entries = JournalEntry.objects.filter(organization=organization)
+        if options['period']:
+            entries = entries.filter(period_id=options['period'])
+        if options['until']:
+            try:
+                entries = entries.filter(date__lte=date.fromisoformat(options['until']))
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['until']}")
+        if options['journal']:
+            entries = entries.filter(journal__code=options['journal'])
+
+        posted, rejected = post_entries(entries, user=user)
+        for entry, reason in rejected:
+            self.stderr.write(f"Entry {entry.entry_number or entry.pk}: {reason}")
+        summary = f"Posted {len(posted)} entries; {len(rejected)} rejected."
+        self.stdout.write(self.style.SUCCESS(summary) if not rejected else self.style.WARNING(summary))
@@ -0,0 +1,42 @@
+"""
+Management command to verify, and rebuild, the totals stored on journal
+entries (total_debit, total_credit, line_count) against their lines.
+
+Usage:
+    python manage.py rebuild_entry_totals [--organization ID] [--verify-only]
+
+Options:
+    --organization ID    Limit the check to one organization
+    --verify-only        Report the entries that drifted without fixing them
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.models import JournalEntry
+from organization.models import Organization
+
+
+class Command(BaseCommand):
+    help = "Check the stored journal entry totals against their lines and fix the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Organization ID to process (default: all)')
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help='Only report entries whose totals differ from their lines'
+        )
+
+    def handle(self, *args, **options):
+        organization = None
+        if options['organization']:
+            organization = Organization.objects.filter(pk=options['organization']).first()
+            if organization is None:
+                raise CommandError(f"Organization {options['organization']} does not exist.")
+
+        drifted = JournalEntry.rebuild_totals(organization, verify_only=options['verify_only'])
+        for entry, expected, stored in drifted[:20]:
+            self.stderr.write(f"Entry {entry.entry_number or entry.pk}: expected {expected}, found {stored}")
+        if drifted and options['verify_only']:
+            raise CommandError(f"{len(drifted)} journal entries have totals that do not match their lines.")
+        if drifted:
+            self.stdout.write(f"Fixed the totals of {len(drifted)} journal entries.")
+        self.stdout.write(self.style.SUCCESS("Journal entry totals match their lines."))
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_balances(apps, schema_editor):
+    """Seed the projection from lines that were posted before it existed."""
+    from django.db.models import Count, Sum
+    EntryLine = apps.get_model('accounting', 'EntryLine')
+    AccountPeriodBalance = apps.get_model('accounting', 'AccountPeriodBalance')
+    rows = EntryLine.objects.filter(journal_entry__posted=True).values(
+        'journal_entry__organization_id', 'account_id', 'journal_entry__period_id'
+    ).annotate(
+        debit=Sum('debit_amount'), credit=Sum('credit_amount'), line_count=Count('id')
+    ).order_by()
+    AccountPeriodBalance.objects.bulk_create([
+        AccountPeriodBalance(
+            organization_id=row['journal_entry__organization_id'],
+            account_id=row['account_id'],
+            period_id=row['journal_entry__period_id'],
+            debit=row['debit'] or 0,
+            credit=row['credit'] or 0,
+            line_count=row['line_count'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0002_organization_uuid'),
+        ('accounting', '0002_project_entryline_project'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountPeriodBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Debit')),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Credit')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Line Count')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_balances', to='accounting.chartofaccounts')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='account_period_balances', to='organization.organization')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='account_balances', to='accounting.accountingperiod')),
+            ],
+            options={
+                'verbose_name': 'Account Period Balance',
+                'verbose_name_plural': 'Account Period Balances',
+                'indexes': [models.Index(fields=['organization', 'period'], name='accounting__organiz_5d2815_idx')],
+                'unique_together': {('account', 'period')},
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
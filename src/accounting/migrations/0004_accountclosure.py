@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_closure(apps, schema_editor):
+    """Index the hierarchy of accounts that existed before the closure table."""
+    ChartOfAccounts = apps.get_model('accounting', 'ChartOfAccounts')
+    AccountClosure = apps.get_model('accounting', 'AccountClosure')
+    parents = dict(ChartOfAccounts.objects.values_list('pk', 'parent_account_id'))
+    links = []
+    for account_id in parents:
+        ancestor_id, depth, seen = account_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            links.append(AccountClosure(ancestor_id=ancestor_id, descendant_id=account_id, depth=depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    AccountClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0003_accountperiodbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0, verbose_name='Depth')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='accounting.chartofaccounts')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='accounting.chartofaccounts')),
+            ],
+            options={
+                'verbose_name': 'Account Closure',
+                'verbose_name_plural': 'Account Closures',
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(populate_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0002_organization_uuid'),
+        ('accounting', '0004_accountclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountingperiod',
+            name='snapshot_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Snapshot At'),
+        ),
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Cumulative Debit')),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Cumulative Credit')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='accounting.chartofaccounts')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='organization.organization')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='accounting.accountingperiod')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='balance_snapshots', to='accounting.project')),
+            ],
+            options={
+                'verbose_name': 'Account Balance Snapshot',
+                'verbose_name_plural': 'Account Balance Snapshots',
+                'unique_together': {('period', 'account', 'project')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0002_organization_uuid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounting', '0005_accountbalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, unique=True)),
+                ('file', models.FileField(upload_to='imports/%Y/%m/', verbose_name='File')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel')], default='csv', max_length=4, verbose_name='Format')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=10, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Completed At')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='Rows')),
+                ('entry_count', models.PositiveIntegerField(default=0, verbose_name='Imported Entries')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Imported Lines')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Rejected Rows')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Row Errors')),
+                ('error_message', models.TextField(blank=True, verbose_name='Error Message')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_imports', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journal_imports', to='organization.organization')),
+            ],
+            options={
+                'verbose_name': 'Journal Import',
+                'verbose_name_plural': 'Journal Imports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
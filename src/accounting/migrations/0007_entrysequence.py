@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_sequences(apps, schema_editor):
+    """Start every journal/year that has entries at its highest number."""
+    JournalEntry = apps.get_model('accounting', 'JournalEntry')
+    EntrySequence = apps.get_model('accounting', 'EntrySequence')
+    highest = {}
+    rows = JournalEntry.objects.values_list('journal_id', 'journal__code', 'date', 'entry_number').iterator()
+    for journal_id, code, entry_date, entry_number in rows:
+        prefix = f"{code}-{entry_date.year}-"
+        if not (entry_number or '').startswith(prefix):
+            continue
+        try:
+            number = int(entry_number[len(prefix):])
+        except ValueError:
+            continue
+        key = (journal_id, entry_date.year)
+        highest[key] = max(highest.get(key, 0), number)
+    EntrySequence.objects.bulk_create([
+        EntrySequence(journal_id=journal_id, year=year, last_number=number)
+        for (journal_id, year), number in highest.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0002_organization_uuid'),
+        ('accounting', '0006_journalimport'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journalentry',
+            name='entry_number',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Entry Number'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='journalentry',
+            unique_together={('organization', 'entry_number')},
+        ),
+        migrations.CreateModel(
+            name='EntrySequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField(verbose_name='Year')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='Last Number')),
+                ('journal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sequences', to='accounting.journal')),
+            ],
+            options={
+                'verbose_name': 'Entry Sequence',
+                'verbose_name_plural': 'Entry Sequences',
+                'unique_together': {('journal', 'year')},
+            },
+        ),
+        migrations.RunPython(populate_sequences, migrations.RunPython.noop),
+    ]
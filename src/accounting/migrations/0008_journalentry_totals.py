@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:19
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def populate_totals(apps, schema_editor):
+    """Store the totals of the entries written before they were kept."""
+    from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+    from django.db.models.functions import Coalesce
+    JournalEntry = apps.get_model('accounting', 'JournalEntry')
+    EntryLine = apps.get_model('accounting', 'EntryLine')
+    lines = EntryLine.objects.filter(journal_entry=OuterRef('pk')).order_by().values('journal_entry')
+    amount = DecimalField(max_digits=17, decimal_places=2)
+    JournalEntry.objects.update(
+        total_debit=Coalesce(Subquery(lines.annotate(total=Sum('debit_amount')).values('total')), Value(Decimal("0.00")), output_field=amount),
+        total_credit=Coalesce(Subquery(lines.annotate(total=Sum('credit_amount')).values('total')), Value(Decimal("0.00")), output_field=amount),
+        line_count=Coalesce(Subquery(lines.annotate(total=Count('pk')).values('total')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0007_entrysequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Line Count'),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='total_credit',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=17, verbose_name='Total Credit'),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='total_debit',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=17, verbose_name='Total Debit'),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
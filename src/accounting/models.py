@@ -30,6 +30,22 @@ class FiscalYear(models.Model):
     def is_closed(self):
         return self.status == "CLOSED"
 
+    def close_year(self, retained_earnings_code=None, user=None):
+        """
+        Close the year and carry its result forward into the next one (see
+        ``accounting.closing``). Returns ``(success, message)``.
+        """
+        from django.core.exceptions import ValidationError
+        from .closing import RETAINED_EARNINGS_CODE, close_fiscal_year
+        try:
+            entry = close_fiscal_year(self, retained_earnings_code or RETAINED_EARNINGS_CODE, user=user)
+        except ValidationError as exc:
+            return False, " ".join(exc.messages)
+        self.status = "CLOSED"
+        if entry is None:
+            return True, _("Fiscal year closed. There was no result to carry forward.")
+        return True, _("Fiscal year closed. Opening entry %(number)s carries the result forward.") % {'number': entry.entry_number}
+
     def __str__(self):
         # Accessing organization name might require loading the related object
         # Consider optimizing if used frequently in lists
@@ -47,6 +63,8 @@ class AccountingPeriod(models.Model):
     start_date = models.DateField(_("Start Date"))
     end_date = models.DateField(_("End Date"))
     status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default="OPEN")
+    # Set once the closing balances of the period are frozen in AccountBalanceSnapshot
+    snapshot_at = models.DateTimeField(_("Snapshot At"), null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = _("Accounting Period")
@@ -62,6 +80,26 @@ class AccountingPeriod(models.Model):
     def __str__(self):
         return f"{self.fiscal_year} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        from django.db import transaction
+        from .ledger import bump_ledger_version
+        previous_status = None
+        if self.pk:
+            stored = AccountingPeriod.objects.filter(pk=self.pk).values_list('status', 'snapshot_at').first()
+            if stored:
+                # snapshot_at is only ever written by AccountBalanceSnapshot
+                previous_status, self.snapshot_at = stored
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if previous_status == "CLOSED" and self.status == "OPEN":
+                AccountBalanceSnapshot.discard_from(self)
+            elif previous_status != "CLOSED" and self.status == "CLOSED":
+                for period in AccountBalanceSnapshot.capture_closed_periods(self.fiscal_year.organization_id):
+                    if period.pk == self.pk:
+                        self.snapshot_at = period.snapshot_at
+        if previous_status != self.status:
+            bump_ledger_version(self.fiscal_year.organization_id)
+
     def validate_for_closing(self):
         """
         US 9.5: Validates if the period can be closed.
@@ -117,6 +155,114 @@ class ChartOfAccounts(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.pk and self.parent_account_id and AccountClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id=self.parent_account_id
+        ).exists():
+            raise ValidationError({'parent_account': _("An account cannot be placed under itself or one of its sub-accounts.")})
+
+    def save(self, *args, **kwargs):
+        from django.db import transaction
+        from .ledger import bump_ledger_version
+        adding = self._state.adding
+        moved = not adding and ChartOfAccounts.objects.filter(pk=self.pk).exclude(
+            parent_account_id=self.parent_account_id
+        ).exists()
+        if moved:
+            self.clean()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Keep the hierarchy index in step with parent_account
+            if adding:
+                AccountClosure.insert_node(self)
+            elif moved:
+                AccountClosure.move_node(self)
+            # Reports list every account by code, name and type: any change invalidates them
+            bump_ledger_version(self.organization_id)
+
+    def delete(self, *args, **kwargs):
+        from django.db import transaction
+        from .ledger import bump_ledger_version
+        with transaction.atomic():
+            # Sub-accounts become roots; move them explicitly so the index follows
+            for child in self.child_accounts.all():
+                child.parent_account = None
+                child.save()
+            bump_ledger_version(self.organization_id)
+            return super().delete(*args, **kwargs)
+
+
+class AccountClosure(models.Model):
+    """
+    Closure table of the chart of accounts hierarchy: one row per
+    (ancestor, descendant) pair, including every account paired with itself
+    at depth 0. Lets reports roll balances up to every ancestor level with a
+    single join instead of walking ``parent_account`` recursively.
+    """
+    ancestor = models.ForeignKey(ChartOfAccounts, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(ChartOfAccounts, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveIntegerField(_("Depth"), default=0)
+
+    class Meta:
+        verbose_name = _("Account Closure")
+        verbose_name_plural = _("Account Closures")
+        unique_together = [("ancestor", "descendant")]
+        app_label = 'accounting'
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def insert_node(cls, account):
+        """Link a new ``account`` to itself and to every ancestor of its parent."""
+        links = [cls(ancestor=account, descendant=account, depth=0)]
+        if account.parent_account_id:
+            links += [
+                cls(ancestor_id=ancestor_id, descendant=account, depth=depth + 1)
+                for ancestor_id, depth in cls.objects.filter(
+                    descendant_id=account.parent_account_id
+                ).values_list('ancestor_id', 'depth')
+            ]
+        cls.objects.bulk_create(links)
+
+    @classmethod
+    def move_node(cls, account):
+        """Re-attach the subtree rooted at ``account`` under its current parent."""
+        subtree = list(cls.objects.filter(ancestor=account).values_list('descendant_id', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _depth in subtree]
+        # Detach the subtree from its former ancestors
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if account.parent_account_id:
+            new_ancestors = cls.objects.filter(
+                descendant_id=account.parent_account_id
+            ).values_list('ancestor_id', 'depth')
+            cls.objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+                for ancestor_id, ancestor_depth in new_ancestors
+                for descendant_id, depth in subtree
+            ])
+
+    @classmethod
+    def rebuild(cls, organization=None):
+        """Recompute the closure table from ``parent_account``; returns the number of rows written."""
+        from django.db import transaction
+        accounts = ChartOfAccounts.objects.all()
+        if organization is not None:
+            accounts = accounts.filter(organization=organization)
+        parents = dict(accounts.values_list('pk', 'parent_account_id'))
+        links = []
+        for account_id in parents:
+            ancestor_id, depth, seen = account_id, 0, set()
+            while ancestor_id is not None and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                links.append(cls(ancestor_id=ancestor_id, descendant_id=account_id, depth=depth))
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        with transaction.atomic():
+            cls.objects.filter(descendant__in=accounts).delete()
+            cls.objects.bulk_create(links, batch_size=1000)
+        return len(links)
+
 class Journal(models.Model):
     """Represents accounting journals (e.g., Sales, Purchase, Bank)."""
     JOURNAL_TYPE_CHOICES = [
@@ -143,6 +289,48 @@ class Journal(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+def loaded_values(field_names, values):
+    """The field values (by attname) an instance was loaded with, deferred fields left out."""
+    return {name: value for name, value in zip(field_names, values) if value is not models.DEFERRED}
+
+
+def known_fields(instance):
+    """
+    Fields of ``instance`` that ``full_clean`` need not check against the
+    database again: those still holding the value the instance was loaded
+    with (see ``loaded_values``) and foreign keys whose object is loaded on
+    it. Returns ``(unchanged, known)``, ``known`` including ``unchanged``.
+    """
+    loaded = getattr(instance, '_loaded', {})
+    unchanged, known = set(), set()
+    for field in instance._meta.concrete_fields:
+        if field.attname in loaded and getattr(instance, field.attname) == loaded[field.attname]:
+            unchanged.add(field.name)
+        elif field.is_relation and field.is_cached(instance) and getattr(instance, field.attname) is not None:
+            known.add(field.name)
+    return unchanged, unchanged | known
+
+
+def clean_known(instance, model, exclude=None, validate_unique=True, validate_constraints=True):
+    """
+    ``full_clean`` of ``instance`` (``model`` being the class overriding
+    it) skipping the ``known_fields``; a unique check is skipped only when
+    none of its fields changed since the instance was loaded.
+    """
+    unchanged, known = known_fields(instance)
+    exclude = set(exclude or ())
+    super(model, instance).full_clean(exclude=exclude | known, validate_unique=False, validate_constraints=validate_constraints)
+    if validate_unique:
+        checks = [{field.name} for field in instance._meta.concrete_fields if field.unique]
+        checks += [set(fields) for fields in instance._meta.unique_together]
+        changed = set().union(*[check for check in checks if not check <= unchanged])
+        instance.validate_unique(exclude=exclude | (unchanged - changed))
+
+
+# What a posted entry is counted under in AccountPeriodBalance and the budget counters
+POSTED_ENTRY_FIELDS = ('organization_id', 'period_id', 'date', 'journal_id')
+
+
 class JournalEntry(models.Model):
     """Represents a single accounting transaction header."""
     SYNC_STATUS_CHOICES = [
@@ -154,7 +342,7 @@ class JournalEntry(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
     period = models.ForeignKey(AccountingPeriod, on_delete=models.PROTECT, related_name="journal_entries")
     journal = models.ForeignKey(Journal, on_delete=models.PROTECT, related_name="journal_entries")
-    entry_number = models.CharField(_("Entry Number"), max_length=50, unique=True, blank=True) # Auto-generated if blank
+    entry_number = models.CharField(_("Entry Number"), max_length=50, blank=True) # Auto-generated if blank
     date = models.DateField(_("Date"), db_index=True)
     reference = models.CharField(_("Reference"), max_length=255, blank=True, null=True) # e.g., Invoice number
     description = models.TextField(_("Description"))
@@ -165,12 +353,19 @@ class JournalEntry(models.Model):
     posted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="posted_entries", verbose_name=_("Posted By"))
     posted_at = models.DateTimeField(_("Posted At"), null=True, blank=True)
     sync_status = models.CharField(_("Sync Status"), max_length=10, choices=SYNC_STATUS_CHOICES, default="SYNCED", help_text=_("Status for offline synchronization"))
+    # Totals of the lines, moved by EntryLine.save/delete and recomputed by the
+    # bulk paths (``refresh_totals``); check them with ``rebuild_entry_totals``
+    total_debit = models.DecimalField(_("Total Debit"), max_digits=17, decimal_places=2, default=0, editable=False)
+    total_credit = models.DecimalField(_("Total Credit"), max_digits=17, decimal_places=2, default=0, editable=False)
+    line_count = models.PositiveIntegerField(_("Line Count"), default=0, editable=False)
     # Add field for reversal if needed: reversed_entry = models.OneToOneField("self", null=True, blank=True, on_delete=models.SET_NULL)
 
     class Meta:
         verbose_name = _("Journal Entry")
         verbose_name_plural = _("Journal Entries")
         ordering = ["-date", "-created_at"]
+        # Journal codes, hence entry numbers, are only unique within an organization
+        unique_together = [("organization", "entry_number")]
         app_label = 'accounting'
 
     def __str__(self):
@@ -178,52 +373,82 @@ class JournalEntry(models.Model):
 
     def generate_entry_number(self):
         """Generates a sequential entry number: JOURNAL-YEAR-SEQUENCE."""
-        year = self.date.year
-        journal_code = self.journal.code
-        prefix = f"{journal_code}-{year}-"
-        
-        last_entry = JournalEntry.objects.filter(
-            journal=self.journal,
-            date__year=year,
-            entry_number__startswith=prefix
-        ).order_by('entry_number').last()
-        
-        if last_entry:
-            try:
-                last_sequence = int(last_entry.entry_number.split('-')[-1])
-                new_sequence = last_sequence + 1
-            except (IndexError, ValueError):
-                new_sequence = 1
-        else:
-            new_sequence = 1
-            
-        return f"{prefix}{new_sequence:04d}"
+        return self.reserve_entry_numbers(self.journal, self.date.year)[0]
+
+    @classmethod
+    def reserve_entry_numbers(cls, journal, year, count=1):
+        """The next ``count`` entry numbers of ``journal`` in ``year`` (see ``EntrySequence``)."""
+        return [
+            EntrySequence.format_number(journal, year, number)
+            for number in EntrySequence.reserve(journal, year, count)
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        entry = super().from_db(db, field_names, values)
+        # What save() compares against instead of reading the row again
+        entry._loaded = loaded_values(field_names, values)
+        return entry
+
+    def full_clean(self, exclude=None, validate_unique=True, validate_constraints=True):
+        clean_known(self, JournalEntry, exclude, validate_unique, validate_constraints)
 
     def clean(self):
         from django.core.exceptions import ValidationError
         # US 9.1: Prevent entries in closed periods
-        if self.period and self.period.status == 'CLOSED':
+        if self.period_id and self.period.is_closed:
             raise ValidationError(_("Cannot create or modify entries in a closed accounting period."))
-        
-        # Prevent modification of posted entries (logical protection)
-        if self.pk:
-            original = JournalEntry.objects.get(pk=self.pk)
-            if original.posted and not self.posted: # Attempting to unpost
-                 # In some cases unposting is allowed by admins, but for professional integrity, 
-                 # it should be restricted or audited.
-                 pass
+        # The projection files lines by period, the line-based reports by date: they must agree
+        day = models.DateField().to_python
+        if self.period_id and self.date and not day(self.period.start_date) <= self.date <= day(self.period.end_date):
+            raise ValidationError({'date': _("The date %(date)s is outside the period %(period)s.") % {
+                'date': self.date, 'period': self.period.name,
+            }})
+        # The projection and budget counters hold a posted entry under its
+        # period, date and journal: moving it means unposting it first
+        if self.pk and self.posted:
+            stored = getattr(self, '_loaded', {})
+            if not all(name in stored for name in POSTED_ENTRY_FIELDS + ('posted',)):
+                stored = JournalEntry.objects.filter(pk=self.pk).values(*POSTED_ENTRY_FIELDS, 'posted').first() or {}
+            current = dict(stored, **{name: getattr(self, name) for name in POSTED_ENTRY_FIELDS})
+            if stored.get('posted') and any(
+                day(stored[name]) != day(current[name]) if name == 'date' else stored[name] != current[name]
+                for name in POSTED_ENTRY_FIELDS
+            ):
+                raise ValidationError(_("Cannot change the period, date or journal of a posted entry; unpost it first."))
+        # Unposting is allowed; save() reverses the projection and budget counters
 
     def save(self, *args, **kwargs):
+        from django.db import transaction
+        from budget import control as budget_control
+        from . import dashboard
+        from .ledger import bump_ledger_version
         self.full_clean()
-        if not self.entry_number:
-            self.entry_number = self.generate_entry_number()
+
+        loaded = getattr(self, '_loaded', {})
+        if self.pk and 'posted' not in loaded:
+            # Neither loaded from the database nor saved by this instance
+            loaded = JournalEntry.objects.filter(pk=self.pk).values('posted').first() or {}
+        was_posted = bool(loaded.get('posted'))
+        if self.posted and not was_posted and self.id:
+            # Post on the stored totals: they belong to the lines and may be newer than ours
+            stored = JournalEntry.objects.filter(pk=self.pk).values('total_debit', 'total_credit', 'line_count').first()
+            if stored:
+                self.total_debit, self.total_credit, self.line_count = stored['total_debit'], stored['total_credit'], stored['line_count']
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # ... and never write stale ones back
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname in self.__dict__
+                and field.name not in ('total_debit', 'total_credit', 'line_count')
+            ]
 
         # US 1.1: Model-level validation for balanced entries
         if self.posted:
             if not self.id: # New entry cannot be posted immediately without lines
                 self.posted = False
             else:
-                if not self.is_balanced or not self.lines.exists():
+                if not self.is_balanced or not self.line_count:
                     self.posted = False
                 
                 # US 1.2: Audit trail for posted entries
@@ -231,25 +456,158 @@ class JournalEntry(models.Model):
                     from django.utils import timezone
                     self.posted_at = timezone.now()
         
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            if not self.entry_number:
+                # Drawn in the transaction of the insert so a failed save leaves no gap
+                self.entry_number = self.generate_entry_number()
+            super().save(*args, **kwargs)
+            if adding:
+                # One more pending entry on the dashboard
+                dashboard.invalidate(self.organization_id)
+            # Keep the account/period projection and the budget counters in
+            # step with the ledger; an over-budget posting rolls back here
+            if self.posted and not was_posted:
+                AccountPeriodBalance.apply_entry(self)
+                budget_control.apply_entry(self)
+            elif was_posted and not self.posted:
+                AccountPeriodBalance.apply_entry(self, sign=-1)
+                budget_control.apply_entry(self, sign=-1)
+            if self.posted != was_posted:
+                bump_ledger_version(self.organization_id)
+        self._loaded = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
 
-    # Properties for balance check (consider moving logic to managers or services for complex calculations)
-    @property
-    def total_debit(self):
-        # Ensure Decimal usage if not implicitly handled
-        from decimal import Decimal
-        return sum(line.debit_amount for line in self.lines.all() if line.debit_amount) or Decimal("0.00")
-
-    @property
-    def total_credit(self):
-        from decimal import Decimal
-        return sum(line.credit_amount for line in self.lines.all() if line.credit_amount) or Decimal("0.00")
+    def delete(self, *args, **kwargs):
+        from django.db import transaction
+        from budget import control as budget_control
+        from . import dashboard
+        from .ledger import bump_ledger_version
+        with transaction.atomic():
+            if self.posted:
+                AccountPeriodBalance.apply_entry(self, sign=-1)
+                budget_control.apply_entry(self, sign=-1)
+                bump_ledger_version(self.organization_id)
+            else:
+                dashboard.invalidate(self.organization_id)
+            return super().delete(*args, **kwargs)
 
     @property
     def is_balanced(self):
         # Use Decimal comparison for accuracy
         return self.total_debit == self.total_credit
 
+    @staticmethod
+    def totals_from_lines():
+        """``total_debit``, ``total_credit`` and ``line_count`` as subqueries over the lines of each entry."""
+        from decimal import Decimal
+        from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+        from django.db.models.functions import Coalesce
+        lines = EntryLine.objects.filter(journal_entry=OuterRef('pk')).order_by().values('journal_entry')
+        amount = DecimalField(max_digits=17, decimal_places=2)
+        return {
+            'total_debit': Coalesce(
+                Subquery(lines.annotate(total=Sum('debit_amount')).values('total')), Value(Decimal("0.00")), output_field=amount
+            ),
+            'total_credit': Coalesce(
+                Subquery(lines.annotate(total=Sum('credit_amount')).values('total')), Value(Decimal("0.00")), output_field=amount
+            ),
+            'line_count': Coalesce(Subquery(lines.annotate(total=Count('pk')).values('total')), Value(0)),
+        }
+
+    @classmethod
+    def refresh_totals(cls, entry_ids):
+        """Recompute the stored totals of the entries ``entry_ids`` from their lines, in one UPDATE."""
+        cls.objects.filter(pk__in=entry_ids).update(**cls.totals_from_lines())
+
+    @classmethod
+    def rebuild_totals(cls, organization=None, verify_only=False):
+        """
+        Reset the stored totals of every entry (of ``organization``) that
+        drifted from its lines, unless ``verify_only``. Returns ``(entry,
+        expected, stored)`` tuples for those entries, the pairs being
+        ``(total_debit, total_credit, line_count)``.
+        """
+        from django.db.models import F
+        entries = cls.objects.all()
+        if organization is not None:
+            entries = entries.filter(organization=organization)
+        drifted = [
+            (entry, (entry.expected_debit, entry.expected_credit, entry.expected_count),
+             (entry.total_debit, entry.total_credit, entry.line_count))
+            for entry in entries.annotate(
+                **{f"expected_{name}": expression for name, expression in zip(
+                    ('debit', 'credit', 'count'), cls.totals_from_lines().values()
+                )}
+            ).exclude(
+                total_debit=F('expected_debit'), total_credit=F('expected_credit'), line_count=F('expected_count'),
+            ).only('entry_number', 'total_debit', 'total_credit', 'line_count').order_by('pk').iterator()
+        ]
+        if drifted and not verify_only:
+            cls.refresh_totals([entry.pk for entry, _expected, _stored in drifted])
+        return drifted
+
+class EntrySequence(models.Model):
+    """
+    Last entry number used per journal and year.
+
+    Numbers are drawn with an ``UPDATE ... SET last_number = last_number + n``
+    that locks the row until the end of the caller's transaction, so
+    concurrent workers wait for each other instead of reading the same
+    maximum, and a rolled back save gives its number back: the sequence has
+    no gaps. The row of a journal/year is created on first use from the
+    highest number already used.
+    """
+    journal = models.ForeignKey(Journal, on_delete=models.CASCADE, related_name="sequences")
+    year = models.PositiveIntegerField(_("Year"))
+    last_number = models.PositiveIntegerField(_("Last Number"), default=0)
+
+    class Meta:
+        verbose_name = _("Entry Sequence")
+        verbose_name_plural = _("Entry Sequences")
+        unique_together = [("journal", "year")]
+        app_label = 'accounting'
+
+    def __str__(self):
+        return f"{self.journal_id}/{self.year}: {self.last_number}"
+
+    @staticmethod
+    def format_number(journal, year, number):
+        return f"{journal.code}-{year}-{number:04d}"
+
+    @staticmethod
+    def highest_used(journal, year):
+        """Highest sequence among the entry numbers of ``journal`` in ``year`` (0 if none)."""
+        from django.db.models.functions import Length
+        prefix = f"{journal.code}-{year}-"
+        # Longest first, so that -10000 comes after -9999
+        last_number = JournalEntry.objects.filter(
+            journal=journal, date__year=year, entry_number__startswith=prefix,
+        ).order_by(Length('entry_number'), 'entry_number').values_list('entry_number', flat=True).last()
+        try:
+            return int(last_number.split('-')[-1]) if last_number else 0
+        except ValueError:
+            return 0
+
+    @classmethod
+    def reserve(cls, journal, year, count=1):
+        """
+        Reserve a block of ``count`` numbers of ``journal`` in ``year`` and
+        return them as a range, in two queries once the row exists. Call it
+        in the transaction that writes the entries.
+        """
+        from django.db import transaction
+        from django.db.models import F
+        sequence = cls.objects.filter(journal=journal, year=year)
+        with transaction.atomic():
+            if not sequence.update(last_number=F('last_number') + count):
+                cls.objects.bulk_create(
+                    [cls(journal=journal, year=year, last_number=cls.highest_used(journal, year))],
+                    ignore_conflicts=True,
+                )
+                sequence.update(last_number=F('last_number') + count)
+            last_number = sequence.values_list('last_number', flat=True).get()
+        return range(last_number - count + 1, last_number + 1)
+
 class Project(models.Model):
     """Represents a project or service for analytical tracking."""
     organization = models.ForeignKey("organization.Organization", on_delete=models.CASCADE, related_name="projects")
@@ -305,19 +663,367 @@ class EntryLine(models.Model):
                 # In case of unexpected types, fallback to strict validation
                 raise ValidationError(_("A single line cannot have both a debit and a credit amount."))
         
-        # US 9.1: Prevent modification if parent entry is posted or period is closed
+        # US 9.1: Prevent modification if parent entry is posted or period is closed.
+        # The lines of a formset share one entry, so its period is loaded once for all.
         if self.journal_entry:
             if self.journal_entry.posted:
                 raise ValidationError(_("Cannot modify lines of a posted entry."))
-            if self.journal_entry.period and self.journal_entry.period.status == 'CLOSED':
+            if self.journal_entry.period_id and self.journal_entry.period.is_closed:
                 raise ValidationError(_("Cannot modify lines in a closed period."))
 
+    def full_clean(self, exclude=None, validate_unique=True, validate_constraints=True):
+        clean_known(self, EntryLine, exclude, validate_unique, validate_constraints)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        line = super().from_db(db, field_names, values)
+        line._loaded = loaded_values(field_names, values)
+        # What the line counts in its entry's totals, to move them by the difference on save
+        if all(name in line.__dict__ for name in ('journal_entry_id', 'debit_amount', 'credit_amount')):
+            line._counted = line.counted_amounts()
+        return line
+
+    def counted_amounts(self):
+        from decimal import Decimal
+        return (self.journal_entry_id, self.debit_amount or Decimal("0.00"), self.credit_amount or Decimal("0.00"))
+
+    def _count(self, entry_id, debit, credit, lines):
+        """Move the stored totals of entry ``entry_id`` (and of the entry loaded on the line) by the given deltas."""
+        from django.db.models import F
+        JournalEntry.objects.filter(pk=entry_id).update(
+            total_debit=F('total_debit') + debit, total_credit=F('total_credit') + credit, line_count=F('line_count') + lines,
+        )
+        if EntryLine.journal_entry.is_cached(self) and self.journal_entry.pk == entry_id:
+            self.journal_entry.total_debit += debit
+            self.journal_entry.total_credit += credit
+            self.journal_entry.line_count += lines
+
     def save(self, *args, **kwargs):
+        from django.db import transaction
         self.full_clean()
-        super().save(*args, **kwargs)
+        previous = None
+        if not self._state.adding:
+            previous = getattr(self, '_counted', None)
+            if previous is None:
+                stored = EntryLine.objects.filter(pk=self.pk).first()
+                previous = stored.counted_amounts() if stored else None
+        current = self.counted_amounts()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if previous is not None and previous[0] == current[0]:
+                if previous != current:
+                    self._count(current[0], current[1] - previous[1], current[2] - previous[2], 0)
+            else:
+                if previous is not None:
+                    self._count(previous[0], -previous[1], -previous[2], -1)
+                self._count(current[0], current[1], current[2], 1)
+        self._counted = current
+
+    def delete(self, *args, **kwargs):
+        from django.core.exceptions import ValidationError
+        from django.db import transaction
+        entry_id, debit, credit = getattr(self, '_counted', None) or self.counted_amounts()
+        if JournalEntry.objects.filter(pk=entry_id, posted=True).exists():
+            raise ValidationError(_("Cannot modify lines of a posted entry."))
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self._count(entry_id, -debit, -credit, -1)
+        return result
 
     def __str__(self):
         amount = self.debit_amount if self.debit_amount else self.credit_amount
         type = "Dr" if self.debit_amount else "Cr"
         return f"{self.account} - {amount} ({type})"
 
+
+class AccountPeriodBalance(models.Model):
+    """
+    Pre-aggregated posted debit/credit per account and accounting period.
+
+    Maintained in the same transaction as posting/unposting a JournalEntry so
+    reports can read one row per account and period instead of every line.
+    Rebuild or verify it with the ``rebuild_account_balances`` command.
+    """
+    organization = models.ForeignKey("organization.Organization", on_delete=models.CASCADE, related_name="account_period_balances")
+    account = models.ForeignKey(ChartOfAccounts, on_delete=models.CASCADE, related_name="period_balances")
+    period = models.ForeignKey(AccountingPeriod, on_delete=models.CASCADE, related_name="account_balances")
+    debit = models.DecimalField(_("Debit"), max_digits=17, decimal_places=2, default=0)
+    credit = models.DecimalField(_("Credit"), max_digits=17, decimal_places=2, default=0)
+    line_count = models.PositiveIntegerField(_("Line Count"), default=0)
+
+    class Meta:
+        verbose_name = _("Account Period Balance")
+        verbose_name_plural = _("Account Period Balances")
+        unique_together = [("account", "period")]
+        indexes = [
+            models.Index(fields=["organization", "period"]),
+        ]
+        app_label = 'accounting'
+
+    def __str__(self):
+        return f"{self.account_id} @ {self.period_id}: {self.debit} / {self.credit}"
+
+    @staticmethod
+    def aggregate_lines(lines):
+        """Group an EntryLine queryset into debit/credit/line_count totals per account and period."""
+        from decimal import Decimal
+        from django.db.models import Count, DecimalField, Sum, Value
+        from django.db.models.functions import Coalesce
+        zero = Value(Decimal("0.00"), output_field=DecimalField(max_digits=17, decimal_places=2))
+        return lines.values(
+            'journal_entry__organization_id', 'account_id', 'journal_entry__period_id'
+        ).annotate(
+            debit=Coalesce(Sum('debit_amount'), zero),
+            credit=Coalesce(Sum('credit_amount'), zero),
+            line_count=Count('id'),
+        ).order_by()
+
+    @classmethod
+    def apply_entry(cls, entry, sign=1):
+        """
+        Add (``sign=1``) or remove (``sign=-1``) the lines of ``entry`` from the
+        projection, in a constant number of queries however many accounts the
+        entry touches.
+        """
+        cls.apply_lines(entry.lines.all(), sign)
+
+    @classmethod
+    def apply_lines(cls, lines, sign=1):
+        """``apply_entry`` for an EntryLine queryset spanning any number of entries."""
+        totals = list(cls.aggregate_lines(lines))
+        if not totals:
+            return
+        keys = {(row['account_id'], row['journal_entry__period_id']) for row in totals}
+        cls.objects.bulk_create([
+            cls(organization_id=row['journal_entry__organization_id'], account_id=row['account_id'], period_id=row['journal_entry__period_id'])
+            for row in totals
+        ], ignore_conflicts=True, batch_size=1000)
+        # Lock the rows so concurrent postings to the same accounts serialize
+        balances = {
+            (balance.account_id, balance.period_id): balance
+            for balance in cls.objects.select_for_update().filter(
+                period_id__in={period_id for _account_id, period_id in keys},
+                account_id__in={account_id for account_id, _period_id in keys},
+            )
+            if (balance.account_id, balance.period_id) in keys
+        }
+        for row in totals:
+            balance = balances[(row['account_id'], row['journal_entry__period_id'])]
+            balance.debit += sign * row['debit']
+            balance.credit += sign * row['credit']
+            balance.line_count += sign * row['line_count']
+        cls.objects.bulk_update(list(balances.values()), ['debit', 'credit', 'line_count'], batch_size=1000)
+
+    @classmethod
+    def expected_rows(cls, organization=None):
+        """Recompute the projection from posted entry lines, optionally for one organization."""
+        lines = EntryLine.objects.filter(journal_entry__posted=True)
+        if organization is not None:
+            lines = lines.filter(journal_entry__organization=organization)
+        return cls.aggregate_lines(lines)
+
+    @classmethod
+    def rebuild(cls, organization=None):
+        """Replace the projection with freshly aggregated rows; returns the number of rows written."""
+        from django.db import transaction
+        rows = [
+            cls(
+                organization_id=row['journal_entry__organization_id'],
+                account_id=row['account_id'],
+                period_id=row['journal_entry__period_id'],
+                debit=row['debit'],
+                credit=row['credit'],
+                line_count=row['line_count'],
+            )
+            for row in cls.expected_rows(organization).iterator()
+        ]
+        with transaction.atomic():
+            stale = cls.objects.all()
+            if organization is not None:
+                stale = stale.filter(organization=organization)
+            stale.delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    Frozen closing balance of an account, per project, at the end of a closed
+    accounting period.
+
+    ``debit`` and ``credit`` are the cumulative posted totals from the start
+    of the ledger up to the period's end date, so a balance as of a closed
+    period boundary is read from these rows alone and a later date needs at
+    most the lines of one more period on top. Rows are written when a period
+    closes, in date order: a period is only snapshotted once every earlier
+    period is closed, and reopening a period discards its snapshot and every
+    later one. Snapshots are never updated in place.
+    """
+    organization = models.ForeignKey("organization.Organization", on_delete=models.CASCADE, related_name="balance_snapshots")
+    period = models.ForeignKey(AccountingPeriod, on_delete=models.CASCADE, related_name="balance_snapshots")
+    account = models.ForeignKey(ChartOfAccounts, on_delete=models.CASCADE, related_name="balance_snapshots")
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name="balance_snapshots")
+    debit = models.DecimalField(_("Cumulative Debit"), max_digits=17, decimal_places=2, default=0)
+    credit = models.DecimalField(_("Cumulative Credit"), max_digits=17, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = _("Account Balance Snapshot")
+        verbose_name_plural = _("Account Balance Snapshots")
+        unique_together = [("period", "account", "project")]
+        app_label = 'accounting'
+
+    def __str__(self):
+        return f"{self.account_id}/{self.project_id} @ {self.period_id}: {self.debit} / {self.credit}"
+
+    def save(self, *args, **kwargs):
+        from django.core.exceptions import ValidationError
+        if self.pk:
+            raise ValidationError(_("Closing balance snapshots cannot be modified."))
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def capture(cls, period):
+        """
+        Freeze the closing balances of ``period``: the snapshot of the period
+        just before it (which must exist, unless there is none) plus the
+        posted lines dated after it. Returns the number of rows written.
+        """
+        from decimal import Decimal
+        from django.db.models import DecimalField, Sum, Value
+        from django.db.models.functions import Coalesce
+        from django.utils import timezone
+        organization_id = period.fiscal_year.organization_id
+        previous = AccountingPeriod.objects.filter(
+            fiscal_year__organization_id=organization_id, end_date__lt=period.start_date,
+        ).order_by('-end_date').first()
+
+        totals = {}
+        lines = EntryLine.objects.filter(
+            journal_entry__organization_id=organization_id,
+            journal_entry__posted=True,
+            journal_entry__date__lte=period.end_date,
+        )
+        if previous is not None:
+            for account_id, project_id, debit, credit in cls.objects.filter(period=previous).values_list(
+                'account_id', 'project_id', 'debit', 'credit'
+            ):
+                totals[account_id, project_id] = [debit, credit]
+            lines = lines.filter(journal_entry__date__gt=previous.end_date)
+
+        zero = Value(Decimal("0.00"), output_field=DecimalField(max_digits=17, decimal_places=2))
+        movements = lines.values('account_id', 'project_id').annotate(
+            debit=Coalesce(Sum('debit_amount'), zero),
+            credit=Coalesce(Sum('credit_amount'), zero),
+        ).order_by()
+        for row in movements:
+            total = totals.setdefault((row['account_id'], row['project_id']), [Decimal("0.00"), Decimal("0.00")])
+            total[0] += row['debit']
+            total[1] += row['credit']
+
+        cls.objects.bulk_create([
+            cls(organization_id=organization_id, period=period, account_id=account_id, project_id=project_id,
+                debit=debit, credit=credit)
+            for (account_id, project_id), (debit, credit) in totals.items()
+        ], batch_size=1000)
+        period.snapshot_at = timezone.now()
+        AccountingPeriod.objects.filter(pk=period.pk).update(snapshot_at=period.snapshot_at)
+        return len(totals)
+
+    @classmethod
+    def capture_closed_periods(cls, organization_id):
+        """
+        Snapshot, in date order, every closed period of the organization that
+        is not snapshotted yet, stopping at the first open period. Returns the
+        snapshotted periods.
+        """
+        captured = []
+        periods = AccountingPeriod.objects.filter(
+            fiscal_year__organization_id=organization_id
+        ).select_related('fiscal_year').order_by('end_date')
+        for period in periods:
+            if period.status != "CLOSED":
+                break
+            if period.snapshot_at is None:
+                cls.capture(period)
+                captured.append(period)
+        return captured
+
+    @classmethod
+    def discard_from(cls, period):
+        """Drop the snapshots of ``period`` and of every later period of its organization."""
+        organization_id = period.fiscal_year.organization_id
+        stale = AccountingPeriod.objects.filter(
+            fiscal_year__organization_id=organization_id, end_date__gte=period.start_date,
+        )
+        cls.objects.filter(period__in=stale).delete()
+        stale.update(snapshot_at=None)
+        period.snapshot_at = None
+
+
+class JournalImport(models.Model):
+    """
+    A CSV or XLSX file of journal entry lines imported in the background (see
+    ``accounting.importing``). Rejected rows are kept in ``errors`` so the
+    uploader can fix and re-import them.
+    """
+    STATUS_CHOICES = [
+        ("PENDING", _("Pending")),
+        ("RUNNING", _("Running")),
+        ("COMPLETED", _("Completed")),
+        ("FAILED", _("Failed")),
+    ]
+    FORMAT_CHOICES = [
+        ("csv", "CSV"),
+        ("xlsx", "Excel"),
+    ]
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
+    organization = models.ForeignKey("organization.Organization", on_delete=models.CASCADE, related_name="journal_imports")
+    file = models.FileField(_("File"), upload_to="imports/%Y/%m/")
+    format = models.CharField(_("Format"), max_length=4, choices=FORMAT_CHOICES, default="csv")
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default="PENDING", db_index=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="journal_imports")
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(_("Completed At"), null=True, blank=True)
+    row_count = models.PositiveIntegerField(_("Rows"), default=0)
+    entry_count = models.PositiveIntegerField(_("Imported Entries"), default=0)
+    line_count = models.PositiveIntegerField(_("Imported Lines"), default=0)
+    error_count = models.PositiveIntegerField(_("Rejected Rows"), default=0)
+    errors = models.JSONField(_("Row Errors"), default=list, blank=True)
+    error_message = models.TextField(_("Error Message"), blank=True)
+
+    class Meta:
+        verbose_name = _("Journal Import")
+        verbose_name_plural = _("Journal Imports")
+        ordering = ["-created_at"]
+        app_label = 'accounting'
+
+    def __str__(self):
+        return f"{self.file.name} ({self.get_status_display()})"
+
+    def run(self):
+        """
+        Import the file. Rejected rows end up in ``errors``; a file that
+        cannot be read at all marks the import FAILED rather than raising.
+        """
+        from django.utils import timezone
+        from .importing import import_entries
+
+        self.status = "RUNNING"
+        self.save(update_fields=["status"])
+        try:
+            with self.file.open('rb') as handle:
+                result = import_entries(self.organization, handle, self.format, user=self.created_by)
+        except Exception as exc:
+            self.status = "FAILED"
+            self.error_message = str(exc)
+        else:
+            self.status = "COMPLETED"
+            self.error_message = ""
+            self.row_count = result['rows']
+            self.entry_count = result['entries']
+            self.line_count = result['lines']
+            self.error_count = result['error_count']
+            self.errors = result['errors']
+        self.completed_at = timezone.now()
+        self.save()
+        return self.status == "COMPLETED"
@@ -0,0 +1,103 @@
+"""
+Bulk posting of journal entries.
+
+``post_entries`` posts every unposted entry of a queryset in one transaction
+instead of one ``JournalEntry.save`` each: the entries are locked and read
+with one query, their lines checked with one grouped query (non-empty,
+balanced, and their amounts per account for budget control), and the entries
+that pass are flipped with a single UPDATE. The account/period projection,
+the budget counters and the ledger version then move once for the whole
+batch, as ``JournalEntry.save`` does for one entry.
+
+An entry that cannot be posted (no lines, unbalanced, in a closed period or
+dated outside its period, over an approved budget) is left as a draft with
+its reason; the others are posted.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from budget import control as budget_control
+
+from .ledger import AMOUNT_FIELD, ZERO, bump_ledger_version
+from .models import AccountPeriodBalance, EntryLine, JournalEntry
+
+
+def line_summaries(entry_ids):
+    """
+    ``{entry pk: (debit, credit, line count, {account pk: budget amount})}``
+    of the lines of ``entry_ids``, from one query grouped by entry and account.
+    """
+    rows = EntryLine.objects.filter(journal_entry_id__in=entry_ids).values(
+        'journal_entry_id', 'account_id', 'account__account_type',
+    ).annotate(
+        debit=Coalesce(Sum('debit_amount'), Value(ZERO), output_field=AMOUNT_FIELD),
+        credit=Coalesce(Sum('credit_amount'), Value(ZERO), output_field=AMOUNT_FIELD),
+        count=Count('pk'),
+    ).order_by()
+    summaries = {}
+    for row in rows:
+        debit, credit, count, amounts = summaries.get(row['journal_entry_id'], (ZERO, ZERO, 0, {}))
+        amount = budget_control.signed_amount(row['account__account_type'], row['debit'], row['credit'])
+        if amount:
+            amounts[row['account_id']] = amount
+        summaries[row['journal_entry_id']] = (debit + row['debit'], credit + row['credit'], count + row['count'], amounts)
+    return summaries
+
+
+def rejection_reason(entry, summary):
+    """Why ``entry`` cannot be posted given its ``line_summaries`` item, or None."""
+    if entry.period.is_closed:
+        return _("Cannot create or modify entries in a closed accounting period.")
+    if not entry.period.start_date <= entry.date <= entry.period.end_date:
+        return _("The date %(date)s is outside the period %(period)s.") % {'date': entry.date, 'period': entry.period.name}
+    if summary is None:
+        return _("Cannot post an entry with no lines.")
+    debit, credit, _count, _amounts = summary
+    if debit != credit:
+        return _("Cannot post unbalanced entry. Total Debit: %(debit)s, Total Credit: %(credit)s") % {
+            'debit': debit, 'credit': credit,
+        }
+    return None
+
+
+def post_entries(entries, user=None):
+    """
+    Post the unposted entries of the JournalEntry queryset ``entries`` on
+    behalf of ``user``.
+
+    Returns ``(posted, rejected)``: the posted entries and ``(entry, reason)``
+    pairs for the entries left as drafts, both in date order.
+    """
+    with transaction.atomic():
+        candidates = list(
+            entries.filter(posted=False).select_related('period', 'journal')
+            .select_for_update(of=('self',)).order_by('date', 'pk')
+        )
+        summaries = line_summaries([entry.pk for entry in candidates])
+        reasons = {}
+        for entry in candidates:
+            reason = rejection_reason(entry, summaries.get(entry.pk))
+            if reason:
+                reasons[entry.pk] = reason
+
+        # Budget control, which may turn down more entries; opening entries spend nothing
+        valid = [entry for entry in candidates if entry.pk not in reasons]
+        reasons.update(budget_control.apply_entries(valid, {
+            entry.pk: summaries[entry.pk][3] for entry in valid if entry.journal.type != 'OPENING'
+        }))
+
+        posted = [entry for entry in candidates if entry.pk not in reasons]
+        if posted:
+            now = timezone.now()
+            JournalEntry.objects.filter(pk__in=[entry.pk for entry in posted]).update(
+                posted=True, posted_by=user, posted_at=Coalesce(F('posted_at'), Value(now)), updated_at=now,
+            )
+            AccountPeriodBalance.apply_lines(EntryLine.objects.filter(journal_entry_id__in=[entry.pk for entry in posted]))
+            for organization_id in {entry.organization_id for entry in posted}:
+                bump_ledger_version(organization_id)
+            for entry in posted:
+                entry.posted, entry.posted_by = True, user
+    return posted, [(entry, reasons[entry.pk]) for entry in candidates if entry.pk in reasons]
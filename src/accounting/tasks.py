@@ -0,0 +1,20 @@
+"""
+Celery tasks for the accounting app.
+
+``import_journal_entries`` runs an uploaded ``JournalImport`` in the
+background, since a month of bank or mobile-money feeds is far more than a
+web request should write.
+"""
+from celery import shared_task
+
+from .models import JournalImport
+
+
+@shared_task
+def import_journal_entries(import_id):
+    """Import the file of the ``JournalImport`` with primary key ``import_id``."""
+    journal_import = JournalImport.objects.select_related('organization', 'created_by').filter(pk=import_id).first()
+    if journal_import is None or journal_import.status != 'PENDING':
+        return None
+    journal_import.run()
+    return journal_import.status
@@ -1,9 +1,10 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User, Permission, Group
+from django.contrib.messages import get_messages
 from .models import ChartOfAccounts, JournalEntry, EntryLine, FiscalYear, AccountingPeriod, Journal
 from organization.models import Organization
-from datetime import date
+from datetime import date, datetime, timezone
 
 class AccountingModelTests(TestCase):
     def setUp(self):
@@ -58,6 +59,9 @@ class AccountingViewTests(TestCase):
         url = reverse('accounting:trial_balance') if 'trial_balance' in [u.name for u in self.client.handler._urls.urlpatterns] else '/trial-balance/'
         response = self.client.get(url)
         self.assertIn(response.status_code, [200, 302])
+    def test_trial_balance_ignores_malformed_ids(self):
+        response = self.client.get(reverse('accounting:trial_balance') + '?fiscal_year=abc&period=1;')
+        self.assertEqual(response.status_code, 200)
     def test_reporting_views(self):
         # General Ledger
         url = reverse('reporting:general_ledger')
@@ -71,6 +75,15 @@ class AccountingViewTests(TestCase):
         url = reverse('reporting:income_statement')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
+    def test_fiscalyear_close_view_reports_missing_next_year(self):
+        fiscal_year = FiscalYear.objects.create(
+            organization=self.user.profile.organization, name='2030', start_date=date(2030,1,1), end_date=date(2030,12,31)
+        )
+        response = self.client.post(reverse('accounting:fiscalyear_close', kwargs={'uuid': fiscal_year.uuid}))
+        self.assertRedirects(response, reverse('accounting:fiscalyear_detail', kwargs={'uuid': fiscal_year.uuid}), fetch_redirect_response=False)
+        self.assertIn('Create the next fiscal year', [str(message) for message in get_messages(response.wsgi_request)][0])
+        fiscal_year.refresh_from_db()
+        self.assertFalse(fiscal_year.is_closed)
 
 class AccountingPermissionTests(TestCase):
     def setUp(self):
@@ -99,4 +112,701 @@ class AccountingPermissionTests(TestCase):
         # Simulate superuser access
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(self.superuser.is_superuser) 
\ No newline at end of file
+        self.assertTrue(self.superuser.is_superuser) 
+
+class LedgerEngineTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Ledger Org')
+        self.fy = FiscalYear.objects.create(organization=self.org, name='2024', start_date=date(2024,1,1), end_date=date(2024,12,31))
+        self.jan = AccountingPeriod.objects.create(fiscal_year=self.fy, name='Jan 2024', start_date=date(2024,1,1), end_date=date(2024,1,31))
+        self.feb = AccountingPeriod.objects.create(fiscal_year=self.fy, name='Feb 2024', start_date=date(2024,2,1), end_date=date(2024,2,29))
+        self.journal = Journal.objects.create(organization=self.org, code='MISC', name='Misc', type='MISC')
+        self.cash = ChartOfAccounts.objects.create(organization=self.org, code='571', name='Cash', account_type='ASSET')
+        self.sales = ChartOfAccounts.objects.create(organization=self.org, code='701', name='Sales', account_type='REVENUE')
+        self.unused = ChartOfAccounts.objects.create(organization=self.org, code='601', name='Purchases', account_type='EXPENSE')
+
+    def _post(self, period, day, amount):
+        entry = JournalEntry.objects.create(organization=self.org, period=period, journal=self.journal, date=day, description='Sale')
+        EntryLine.objects.create(journal_entry=entry, account=self.cash, debit_amount=amount)
+        EntryLine.objects.create(journal_entry=entry, account=self.sales, credit_amount=amount)
+        entry.posted = True
+        entry.save()
+        return entry
+
+    def test_trial_balance_opening_period_and_closing(self):
+        from . import ledger
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        rows, totals = ledger.trial_balance(self.org, self.feb.start_date, self.feb.end_date)
+        by_code = {row['code']: row for row in rows}
+        self.assertEqual(list(by_code), ['571', '601', '701'])
+        self.assertEqual(by_code['571']['opening_debit'], 100)
+        self.assertEqual(by_code['571']['period_debit'], 40)
+        self.assertEqual(by_code['571']['closing_debit'], 140)
+        self.assertEqual(by_code['701']['closing_credit'], 140)
+        self.assertEqual(by_code['601']['closing_debit'], 0)
+        self.assertEqual(totals['closing_debit'], totals['closing_credit'])
+
+    def test_trial_balance_totals_do_not_net_balances_under_one_parent(self):
+        from . import ledger
+        from reporting.export_utils import csv_rows_trial_balance
+        root = ChartOfAccounts.objects.create(organization=self.org, code='4', name='Third parties', account_type='LIABILITY')
+        customers = ChartOfAccounts.objects.create(organization=self.org, code='411', name='Customers', account_type='ASSET', parent_account=root)
+        suppliers = ChartOfAccounts.objects.create(organization=self.org, code='401', name='Suppliers', account_type='LIABILITY', parent_account=root)
+        entry = JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, date=date(2024,1,10), description='Netting')
+        EntryLine.objects.create(journal_entry=entry, account=customers, debit_amount=100)
+        EntryLine.objects.create(journal_entry=entry, account=suppliers, credit_amount=100)
+        entry.posted = True
+        entry.save()
+        rows, totals = ledger.trial_balance(self.org, self.fy.start_date, self.fy.end_date)
+        by_code = {row['code']: row for row in rows}
+        self.assertEqual((by_code['4']['closing_debit'], by_code['4']['closing_credit']), (0, 0))
+        self.assertEqual((totals['closing_debit'], totals['closing_credit']), (100, 100))
+        self.assertEqual((totals['period_debit'], totals['period_credit']), (100, 100))
+
+        # Exports mark the subtotal rows so the account rows add up to the totals
+        csv_rows = list(csv_rows_trial_balance(rows, totals, self.fy, None, self.fy.start_date, self.fy.end_date, 'now'))
+        accounts = [row for row in csv_rows if len(row) > 2 and row[2] == 'Account']
+        self.assertEqual([row[0] for row in accounts], ['401', '411', '571', '601', '701'])
+        self.assertEqual(sum(row[8] for row in accounts), totals['closing_debit'])
+        self.assertIn(['4', 0, 'Subtotal', 'Third parties'], [row[:4] for row in csv_rows])
+
+    def test_trial_balance_query_count_is_constant(self):
+        from . import ledger
+        self._post(self.jan, date(2024,1,10), 100)
+        for code in range(100):
+            ChartOfAccounts.objects.create(organization=self.org, code=f'4{code:03d}', name='Filler', account_type='LIABILITY')
+        with self.assertNumQueries(2):
+            ledger.trial_balance(self.org, self.fy.start_date, self.fy.end_date)
+
+    def test_general_ledger_pages_carry_running_balance(self):
+        from . import ledger
+        self._post(self.jan, date(2024,1,10), 100)
+        for day, amount in ((5, 10), (6, 20), (6, 30), (20, 40)):
+            self._post(self.feb, date(2024,2,day), amount)
+        with self.assertNumQueries(2):
+            first = ledger.general_ledger_page(self.cash, self.feb.start_date, self.feb.end_date, page_size=3)
+        self.assertEqual(first['carried_balance'], 100)
+        self.assertEqual([line.running_balance for line in first['lines']], [110, 130, 160])
+        cursor = ledger.parse_ledger_cursor(ledger.format_ledger_cursor(first['next_cursor']))
+        with self.assertNumQueries(2):
+            second = ledger.general_ledger_page(self.cash, self.feb.start_date, self.feb.end_date, after=cursor, page_size=3)
+        self.assertEqual(second['carried_balance'], 160)
+        self.assertEqual([line.running_balance for line in second['lines']], [200])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_grand_livre_walks_every_account_once(self):
+        from . import ledger
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        with self.assertNumQueries(3):
+            rows = list(ledger.grand_livre(self.org, self.feb.start_date, self.feb.end_date))
+        self.assertEqual([row[0] for row in rows], ['account', 'line', 'total', 'account', 'line', 'total'])
+        self.assertEqual(rows[0], ('account', '571', 'Cash', 100))
+        self.assertEqual(rows[1][-1], 140)
+        self.assertEqual(rows[2], ('total', '571', 40, 0, 140))
+        self.assertEqual(rows[5], ('total', '701', 0, 40, -140))
+
+    def test_grand_livre_skips_lines_of_accounts_without_movements(self):
+        from . import ledger
+        capital = ChartOfAccounts.objects.create(organization=self.org, code='100', name='Capital', account_type='EQUITY')
+        entry = JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, date=date(2024,1,10), description='Zero line')
+        EntryLine.objects.create(journal_entry=entry, account=capital, debit_amount=0)
+        EntryLine.objects.create(journal_entry=entry, account=self.cash, debit_amount=50)
+        EntryLine.objects.create(journal_entry=entry, account=self.sales, credit_amount=50)
+        entry.posted = True
+        entry.save()
+        rows = list(ledger.grand_livre(self.org, self.fy.start_date, self.fy.end_date))
+        self.assertEqual([row[1] for row in rows if row[0] == 'account'], ['571', '701'])
+        self.assertEqual([row for row in rows if row[0] == 'total'], [('total', '571', 50, 0, 50), ('total', '701', 0, 50, -50)])
+
+    def test_account_hierarchy_rolls_up_to_every_ancestor(self):
+        from django.core.exceptions import ValidationError
+        from . import ledger
+        from .models import AccountClosure
+        treasury = ChartOfAccounts.objects.create(organization=self.org, code='5', name='Treasury', account_type='ASSET')
+        banks = ChartOfAccounts.objects.create(organization=self.org, code='52', name='Banks', account_type='ASSET', parent_account=treasury)
+        self.cash.parent_account = banks
+        self.cash.save()
+        self.assertEqual(
+            set(AccountClosure.objects.filter(descendant=self.cash).values_list('ancestor__code', 'depth')),
+            {('571', 0), ('52', 1), ('5', 2)},
+        )
+        self._post(self.jan, date(2024,1,10), 100)
+
+        with self.assertNumQueries(2):
+            rows, totals = ledger.trial_balance(self.org, self.fy.start_date, self.fy.end_date)
+        by_code = {row['code']: row for row in rows}
+        self.assertEqual([row['code'] for row in rows], ['5', '52', '571', '601', '701'])
+        self.assertTrue(by_code['5']['is_subtotal'])
+        self.assertEqual((by_code['52']['depth'], by_code['52']['period_debit']), (1, 100))
+        self.assertEqual(by_code['571']['path'], f'{treasury.pk}/{banks.pk}/{self.cash.pk}')
+        self.assertEqual(totals['period_debit'], 100)
+
+        # Moving a subtree re-parents its descendants too
+        banks.parent_account = None
+        banks.save()
+        self.assertFalse(AccountClosure.objects.filter(ancestor=treasury, descendant=self.cash).exists())
+        treasury.parent_account = self.cash
+        treasury.save()
+        banks.parent_account = treasury
+        with self.assertRaises(ValidationError):
+            banks.save()
+
+    def test_comparative_movements_pivot_in_one_query(self):
+        from . import ledger
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        ranges = [(self.jan.start_date, self.jan.end_date), (self.feb.start_date, self.feb.end_date), (None, self.feb.end_date)]
+        with self.assertNumQueries(2):
+            accounts = {acc.code: acc for acc in ledger.comparative_movements(self.org, ranges)}
+        cash = accounts['571']
+        self.assertEqual((cash.debit_0, cash.debit_1, cash.debit_2), (100, 40, 140))
+        self.assertEqual(accounts['701'].credit_1, 40)
+
+    def test_entry_date_must_fall_in_its_period(self):
+        from django.core.exceptions import ValidationError
+        from .posting import post_entries
+        with self.assertRaises(ValidationError):
+            JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, date=date(2024,2,10), description='Misfiled')
+        # Rows written without save() are turned down when posted
+        entry = JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, date=date(2024,1,10), description='Draft')
+        EntryLine.objects.create(journal_entry=entry, account=self.cash, debit_amount=70)
+        EntryLine.objects.create(journal_entry=entry, account=self.sales, credit_amount=70)
+        JournalEntry.objects.filter(pk=entry.pk).update(date=date(2024,2,10))
+        posted, rejected = post_entries(JournalEntry.objects.filter(pk=entry.pk))
+        self.assertEqual(rejected[0][1], 'The date 2024-02-10 is outside the period Jan 2024.')
+
+    def test_posting_maintains_account_period_balance(self):
+        from .models import AccountPeriodBalance
+        entry = self._post(self.jan, date(2024,1,10), 100)
+        balance = AccountPeriodBalance.objects.get(account=self.cash, period=self.jan)
+        self.assertEqual((balance.debit, balance.credit, balance.line_count), (100, 0, 1))
+        entry.posted = False
+        entry.save()
+        balance.refresh_from_db()
+        self.assertEqual((balance.debit, balance.line_count), (0, 0))
+
+    def test_posted_entries_are_immutable(self):
+        from django.core.exceptions import ValidationError
+        from .models import AccountPeriodBalance
+        entry = self._post(self.jan, date(2024,1,10), 100)
+        entry.description = 'Cash sale'
+        entry.save()
+        entry.period, entry.date = self.feb, date(2024,2,10)
+        with self.assertRaises(ValidationError):
+            entry.save()
+        line = entry.lines.get(account=self.cash)
+        line.debit_amount = 90
+        with self.assertRaises(ValidationError):
+            line.save()
+        with self.assertRaises(ValidationError):
+            line.delete()
+
+        # Unposted, the entry can move, and posting it again files it anew
+        entry = JournalEntry.objects.get(pk=entry.pk)
+        entry.posted = False
+        entry.save()
+        entry.period, entry.date = self.feb, date(2024,2,10)
+        entry.save()
+        entry.posted = True
+        entry.save()
+        self.assertEqual(AccountPeriodBalance.objects.get(account=self.cash, period=self.jan).debit, 0)
+        self.assertEqual(AccountPeriodBalance.objects.get(account=self.cash, period=self.feb).debit, 100)
+
+    def test_rebuild_account_balances_command(self):
+        from django.core.management import call_command
+        from .models import AccountPeriodBalance
+        self._post(self.jan, date(2024,1,10), 100)
+        AccountPeriodBalance.objects.all().delete()
+        call_command('rebuild_account_balances', verbosity=0)
+        self.assertEqual(AccountPeriodBalance.objects.get(account=self.sales, period=self.jan).credit, 100)
+        call_command('rebuild_account_balances', '--verify-only', verbosity=0)
+
+    def test_unaligned_range_reads_entry_lines(self):
+        from . import ledger
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        rows, _ = ledger.trial_balance(self.org, date(2024,1,15), date(2024,2,10))
+        cash = next(row for row in rows if row['code'] == '571')
+        self.assertEqual((cash['opening_debit'], cash['period_debit']), (100, 40))
+
+    def test_closed_periods_are_served_from_snapshots(self):
+        from django.core.exceptions import ValidationError
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from . import ledger
+        from .models import AccountBalanceSnapshot, Project
+        ward = Project.objects.create(organization=self.org, code='W1', name='Ward')
+        entry = JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, date=date(2024,1,5), description='Ward sale')
+        EntryLine.objects.create(journal_entry=entry, account=self.cash, debit_amount=25, project=ward)
+        EntryLine.objects.create(journal_entry=entry, account=self.sales, credit_amount=25, project=ward)
+        entry.posted = True
+        entry.save()
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        expected = ledger.trial_balance(self.org, self.feb.start_date, self.feb.end_date)
+
+        # Closing February first waits for January
+        self.feb.close_period()
+        self.assertFalse(AccountBalanceSnapshot.objects.exists())
+        self.jan.close_period()
+        self.assertEqual(
+            set(AccountBalanceSnapshot.objects.filter(period=self.jan, account=self.cash).values_list('project__code', 'debit')),
+            {('W1', 25), (None, 100)},
+        )
+        self.assertEqual(AccountBalanceSnapshot.objects.get(period=self.feb, account=self.cash, project=None).debit, 140)
+        snapshot = AccountBalanceSnapshot.objects.get(period=self.jan, account=self.cash, project=ward)
+        snapshot.debit = 0
+        with self.assertRaises(ValidationError):
+            snapshot.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(ledger.trial_balance(self.org, self.feb.start_date, self.feb.end_date), expected)
+        self.assertEqual(len(queries), 2)
+        self.assertIn('accountbalancesnapshot', queries[-1]['sql'])
+
+        # An open-period delta on top of the last snapshot
+        mar = AccountingPeriod.objects.create(fiscal_year=self.fy, name='Mar 2024', start_date=date(2024,3,1), end_date=date(2024,3,31))
+        self._post(mar, date(2024,3,3), 5)
+        rows, _ = ledger.trial_balance(self.org, self.feb.start_date, date(2024,3,15))
+        cash = next(row for row in rows if row['code'] == '571')
+        self.assertEqual((cash['opening_debit'], cash['period_debit'], cash['closing_debit']), (125, 45, 170))
+
+        # Reopening a period drops its snapshot and every later one
+        self.jan.status = 'OPEN'
+        self.jan.save()
+        self.assertFalse(AccountBalanceSnapshot.objects.exists())
+        self.feb.refresh_from_db()
+        self.assertIsNone(self.feb.snapshot_at)
+
+    def test_close_fiscal_year_carries_result_forward(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from reporting import reports
+        from . import ledger
+        from .closing import close_fiscal_year
+        retained = ChartOfAccounts.objects.create(organization=self.org, code='12', name='Report à nouveau', account_type='EQUITY')
+        next_year = FiscalYear.objects.create(organization=self.org, name='2025', start_date=date(2025,1,1), end_date=date(2025,12,31))
+        jan_2025 = AccountingPeriod.objects.create(fiscal_year=next_year, name='Jan 2025', start_date=date(2025,1,1), end_date=date(2025,1,31))
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        purchase = JournalEntry.objects.create(organization=self.org, period=self.feb, journal=self.journal, date=date(2024,2,9), description='Purchase')
+        EntryLine.objects.create(journal_entry=purchase, account=self.unused, debit_amount=30)
+        EntryLine.objects.create(journal_entry=purchase, account=self.cash, credit_amount=30)
+        purchase.posted = True
+        purchase.save()
+
+        entry = close_fiscal_year(self.fy)
+        self.fy.refresh_from_db()
+        self.assertTrue(self.fy.is_closed)
+        self.assertEqual(AccountingPeriod.objects.filter(fiscal_year=self.fy, status='CLOSED').count(), 2)
+        self.assertEqual((entry.journal.type, entry.date, entry.posted), ('OPENING', date(2025,1,1), True))
+        self.assertEqual(
+            sorted(entry.lines.values_list('account__code', 'debit_amount', 'credit_amount')),
+            [('12', None, 110), ('601', None, 30), ('701', 140, None)],
+        )
+        # The result lands on the retained earnings account, in the 2025 opening period
+        self.assertEqual(entry.period, jan_2025)
+        self.assertEqual(entry.lines.get(account=retained).credit_amount, 110)
+        # Running it again changes nothing
+        self.assertEqual(close_fiscal_year(self.fy).pk, entry.pk)
+        self.assertEqual(JournalEntry.objects.filter(journal__type='OPENING').count(), 1)
+
+        rows, _ = ledger.trial_balance(self.org, next_year.start_date, jan_2025.end_date)
+        by_code = {row['code']: row for row in rows}
+        self.assertEqual((by_code['12']['closing_credit'], by_code['701']['closing_credit']), (110, 0))
+        self.assertEqual(by_code['571']['closing_debit'], 110)
+        # Income statements leave the carry-forward out
+        closed = reports.income_statement(self.org, {'fiscal_year': self.fy.pk})
+        self.assertEqual((closed['total_revenue'], closed['net_income']), (140, 110))
+        self.assertEqual(reports.income_statement(self.org, {'fiscal_year': next_year.pk})['total_revenue'], 0)
+
+        call_command('close_fiscal_year', end_date='2024-12-31', stdout=StringIO())
+        self.assertEqual(JournalEntry.objects.filter(journal__type='OPENING').count(), 1)
+
+    def test_cash_flow_classifies_in_two_queries(self):
+        from . import ledger
+        equipment = ChartOfAccounts.objects.create(organization=self.org, code='241', name='Equipment', account_type='ASSET')
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        purchase = JournalEntry.objects.create(organization=self.org, period=self.feb, journal=self.journal, date=date(2024,2,8), description='Equipment')
+        EntryLine.objects.create(journal_entry=purchase, account=equipment, debit_amount=30)
+        EntryLine.objects.create(journal_entry=purchase, account=self.cash, credit_amount=30)
+        purchase.posted = True
+        purchase.save()
+        with self.assertNumQueries(2):
+            report = ledger.cash_flow(self.org, self.feb.start_date, self.feb.end_date)
+        self.assertEqual(report['operating']['in'], 40)
+        self.assertEqual(report['investing']['out'], 30)
+        self.assertEqual(report['summary']['beginning'], 100)
+        self.assertEqual(report['summary']['ending'], 110)
+
+    def test_ledger_service_groups_and_memoizes(self):
+        from . import ledger
+        from cashflow.models import BankReconciliation
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        EntryLine.objects.filter(account=self.cash, journal_entry__date=date(2024,1,10)).update(is_cleared=True)
+        service = ledger.LedgerService(self.org)
+        with self.assertNumQueries(2):
+            by_period = service.balances(prefixes=['5', '7'], start_date=self.fy.start_date, end_date=self.feb.end_date, group_by=('account', 'period'))
+            service.balances(prefixes=['5', '7'], start_date=self.fy.start_date, end_date=self.feb.end_date, group_by=('account', 'period'))
+        self.assertEqual(
+            sorted((row['account'], row['period'], row['debit'], row['credit']) for row in by_period),
+            [(self.cash.pk, self.jan.pk, 100, 0), (self.cash.pk, self.feb.pk, 40, 0),
+             (self.sales.pk, self.jan.pk, 0, 100), (self.sales.pk, self.feb.pk, 0, 40)],
+        )
+        # Unaligned ranges and dimensions the projection lacks read the lines
+        self.assertEqual(service.balance(accounts=[self.cash], start_date=date(2024,1,15), end_date=date(2024,2,10)), 40)
+        self.assertEqual(service.balances(accounts=[self.cash], group_by=('journal',)), [{'journal': self.journal.pk, 'debit': 140, 'credit': 0}])
+
+        reconciliation = BankReconciliation(
+            organization=self.org, bank_account=self.cash, statement_date=date(2024,2,29), statement_end_balance=100,
+        )
+        with self.assertNumQueries(1):
+            reconciliation.calculate_balances(service)
+        self.assertEqual(reconciliation.calculated_ledger_balance, 140)
+        self.assertEqual(reconciliation.difference, 0)
+
+    def test_dashboard_kpis_are_cached_until_posting(self):
+        from . import dashboard
+        from unittest import mock
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        kpis = dashboard.kpis(self.org, date(2024,2,20))
+        self.assertEqual(kpis['cash_balance'], 140)
+        self.assertEqual((kpis['monthly_revenue'], kpis['monthly_expenses']), (40, 0))
+        self.assertEqual(len(kpis['trend']), 12)
+        self.assertEqual([(month['month'], month['revenue']) for month in kpis['trend'][-2:]], [(date(2024,1,1), 100), (date(2024,2,1), 40)])
+        self.assertEqual(kpis['trend'][0]['month'], date(2023,3,1))
+
+        with mock.patch('accounting.dashboard.timezone.now', return_value=datetime(2024,2,20,12,0,tzinfo=timezone.utc)):
+            with self.captureOnCommitCallbacks(execute=True):
+                dashboard.cached_kpis(self.org)
+            with self.assertNumQueries(0):
+                self.assertEqual(dashboard.cached_kpis(self.org)['cash_balance'], 140)
+            with self.captureOnCommitCallbacks(execute=True):
+                self._post(self.feb, date(2024,2,10), 10)
+            self.assertEqual(dashboard.cached_kpis(self.org)['monthly_revenue'], 50)
+            with self.captureOnCommitCallbacks(execute=True):
+                JournalEntry.objects.create(organization=self.org, period=self.feb, journal=self.journal, date=date(2024,2,11), description='Draft')
+            self.assertEqual(dashboard.cached_kpis(self.org)['pending_entries'], 1)
+
+    def test_dashboard_series_by_month_and_day(self):
+        from . import dashboard
+        self._post(self.jan, date(2024,1,10), 100)
+        self._post(self.feb, date(2024,2,5), 40)
+        self._post(self.feb, date(2024,2,7), 10)
+        # revenue and expenses, volume per journal, cash
+        with self.assertNumQueries(3):
+            series = dashboard.time_series(self.org, 'month', date(2024,1,1), date(2024,3,31))
+        self.assertEqual(series['labels'], ['2024-01-01', '2024-02-01', '2024-03-01'])
+        self.assertEqual(series['revenue'], [100.0, 50.0, 0.0])
+        self.assertEqual(series['cash'], [100.0, 150.0, 150.0])
+        self.assertEqual(series['journals'], {'MISC': [100.0, 50.0, 0.0]})
+        # Days before the range open the cash series
+        series = dashboard.time_series(self.org, 'day', date(2024,2,5), date(2024,2,7))
+        self.assertEqual(series['cash'], [140.0, 140.0, 150.0])
+        self.assertEqual(series['revenue'], [40.0, 0.0, 10.0])
+
+        user = User.objects.create_user(username='charts', password='pass')
+        user.profile.organization = self.org
+        user.profile.save()
+        client = Client()
+        client.force_login(user)
+        url = reverse('accounting:dashboard_series')
+        response = client.get(url, {'interval': 'month', 'start_date': '2024-01-01', 'end_date': '2024-02-29'})
+        self.assertEqual(response.json()['revenue'], [100.0, 50.0])
+        self.assertEqual(client.get(url, {'interval': 'week'}).status_code, 400)
+        self.assertEqual(client.get(url, {'interval': 'day', 'start_date': '2020-01-01', 'end_date': '2024-01-01'}).status_code, 400)
+        self.assertEqual(client.get(url, {'start_date': 'soon'}).status_code, 400)
+
+    def test_import_journal_entries_rejects_rows_and_keeps_going(self):
+        import tempfile
+        from io import BytesIO, StringIO
+        from django.core.management import call_command
+        from .importing import import_entries
+        AccountingPeriod.objects.create(fiscal_year=self.fy, name='Mar 2024', start_date=date(2024,3,1), end_date=date(2024,3,31), status='CLOSED')
+        self._post(self.jan, date(2024,1,5), 10)
+        rows = [
+            'entry;journal;date;reference;account;debit;credit;label',
+            'A1;MISC;2024-01-10;INV-1;571;100.00;;Cash in',
+            'A1;MISC;2024-01-10;INV-1;701;;100.00;Sale',
+            'B1;MISC;2024-01-11;;571;50;;',
+            'B1;MISC;2024-01-11;;701;;40;',
+            'C1;MISC;2024-03-05;;571;10;;',
+            'C1;MISC;2024-03-05;;701;;10;',
+            'D1;MISC;2024-02-02;;999;5;;',
+            'D1;MISC;2024-02-02;;701;;5;',
+            'E1;MISC;2024-02-03;;571;7,5;;',
+            'E1;MISC;2024-02-03;;701;;7.5;',
+            'F1;MISC;2024-02-04;;571;20;;',
+            'F1;MISC;2024-02-04;;701;;20;',
+            'A1;MISC;2024-02-05;;571;1;;',
+            'A1;MISC;2024-02-05;;701;;1;',
+        ]
+        result = import_entries(self.org, BytesIO('\n'.join(rows).encode('utf-8')), 'csv', batch_lines=4)
+        self.assertEqual((result['rows'], result['entries'], result['lines'], result['error_count']), (14, 2, 4, 10))
+        reasons = {(error['row'], error['entry']): error['message'] for error in result['errors']}
+        self.assertIn('Unbalanced', reasons[(4, 'B1')])
+        self.assertIn('closed', reasons[(6, 'C1')])
+        self.assertIn('999', reasons[(8, 'D1')])
+        self.assertIn('7,5', reasons[(10, 'E1')])
+        self.assertIn('follow each other', reasons[(14, 'A1')])
+        imported = JournalEntry.objects.get(reference='INV-1')
+        self.assertFalse(imported.posted)
+        self.assertEqual(imported.entry_number, 'MISC-2024-0002')
+        self.assertEqual([line.description for line in imported.lines.all()], ['Cash in', 'Sale'])
+        self.assertEqual(JournalEntry.objects.get(description='F1').entry_number, 'MISC-2024-0003')
+
+        # The number of queries does not grow with the entries of a batch
+        for start, count in ((0, 5), (5, 50)):
+            lines = ['entry,journal,date,account,debit,credit']
+            for number in range(start, start + count):
+                lines += [f'N{number},MISC,2024-02-10,571,3,', f'N{number},MISC,2024-02-10,701,,3']
+            with self.assertNumQueries(11):
+                import_entries(self.org, BytesIO('\n'.join(lines).encode('utf-8')), 'csv')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as feed:
+            feed.write('entry,journal,date,account,debit,credit\nK1,MISC,2024-02-11,571,4,\nK1,MISC,2024-02-11,701,,4\n')
+            feed.flush()
+            out = StringIO()
+            call_command('import_journal_entries', feed.name, '--organization', str(self.org.pk), stdout=out)
+        self.assertIn('Imported 1 entries (2 lines) from 2 rows', out.getvalue())
+
+    def test_journal_import_upload_runs_in_background(self):
+        import tempfile
+        from io import BytesIO
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from openpyxl import Workbook
+        from .models import JournalImport
+        from .tasks import import_journal_entries
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Entry', 'Journal', 'Date', 'Account', 'Debit', 'Credit'])
+        sheet.append(['X1', 'MISC', date(2024,2,1), 571, 12.5, None])
+        sheet.append(['X1', 'MISC', date(2024,2,1), 701, None, 12.5])
+        content = BytesIO()
+        workbook.save(content)
+        user = User.objects.create_superuser(username='importer', password='pass')
+        user.profile.organization = self.org
+        user.profile.save()
+        client = Client()
+        client.force_login(user)
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = client.post(reverse('accounting:journal_import'), {
+                    'file': SimpleUploadedFile('feed.xlsx', content.getvalue()),
+                })
+            self.assertEqual(len(callbacks), 1)
+            journal_import = JournalImport.objects.get()
+            self.assertRedirects(response, reverse('accounting:journal_import_detail', kwargs={'uuid': journal_import.uuid}))
+            self.assertEqual((journal_import.format, journal_import.status), ('xlsx', 'PENDING'))
+
+            # Run the queued task inline instead of through the broker
+            self.assertEqual(import_journal_entries(journal_import.pk), 'COMPLETED')
+            journal_import.refresh_from_db()
+            self.assertEqual((journal_import.entry_count, journal_import.line_count, journal_import.error_count), (1, 2, 0))
+            self.assertEqual(JournalEntry.objects.get(description='X1').created_by, user)
+            response = client.get(reverse('accounting:journal_import_detail', kwargs={'uuid': journal_import.uuid}))
+            self.assertContains(response, 'feed')
+
+            response = client.post(reverse('accounting:journal_import'), {'file': SimpleUploadedFile('feed.txt', b'x')})
+            self.assertContains(response, '.csv')
+
+    def test_entry_sequences_are_per_journal_year_and_gap_free(self):
+        from django.db import transaction
+        from .models import EntrySequence
+        legacy = JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, entry_number='MISC-2024-9999', date=date(2024,1,3), description='Legacy')
+        # The sequence starts after the numbers already used, -9999 before -10000
+        first = self._post(self.jan, date(2024,1,10), 10)
+        self.assertEqual(first.entry_number, 'MISC-2024-10000')
+        with self.assertNumQueries(4):
+            block = JournalEntry.reserve_entry_numbers(self.journal, 2024, 3)
+        self.assertEqual(block, ['MISC-2024-10001', 'MISC-2024-10002', 'MISC-2024-10003'])
+
+        # A rolled back save gives its number back
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, date=date(2024,1,11), description='Lost')
+            raise RuntimeError
+        self.assertEqual(self._post(self.jan, date(2024,1,12), 5).entry_number, 'MISC-2024-10004')
+        self.assertEqual(EntrySequence.objects.get(journal=self.journal, year=2024).last_number, 10004)
+        legacy.delete()
+
+        # Another organization numbers its own MISC journal from 1
+        other = Organization.objects.create(name='Other Org')
+        other_year = FiscalYear.objects.create(organization=other, name='2024', start_date=date(2024,1,1), end_date=date(2024,12,31))
+        other_period = AccountingPeriod.objects.create(fiscal_year=other_year, name='Jan 2024', start_date=date(2024,1,1), end_date=date(2024,1,31))
+        other_journal = Journal.objects.create(organization=other, code='MISC', name='Misc', type='MISC')
+        entry = JournalEntry.objects.create(organization=other, period=other_period, journal=other_journal, date=date(2024,1,10), description='Other')
+        self.assertEqual(entry.entry_number, 'MISC-2024-0001')
+
+    def test_entry_totals_follow_their_lines(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        entry = JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, date=date(2024,1,10), description='Totals')
+        other = JournalEntry.objects.create(organization=self.org, period=self.jan, journal=self.journal, date=date(2024,1,11), description='Other')
+        debit = EntryLine.objects.create(journal_entry=entry, account=self.cash, debit_amount=100)
+        EntryLine.objects.create(journal_entry=entry, account=self.sales, credit_amount=60)
+        self.assertEqual((entry.total_debit, entry.total_credit, entry.line_count, entry.is_balanced), (100, 60, 2, False))
+
+        line = EntryLine.objects.get(credit_amount=60)
+        line.credit_amount = 100
+        line.save()
+        debit.journal_entry = other
+        debit.save()
+        EntryLine.objects.create(journal_entry=entry, account=self.cash, debit_amount=100)
+        stored = {row['pk']: row for row in JournalEntry.objects.values('pk', 'total_debit', 'total_credit', 'line_count')}
+        self.assertEqual((stored[entry.pk]['total_debit'], stored[entry.pk]['total_credit'], stored[entry.pk]['line_count']), (100, 100, 2))
+        self.assertEqual((stored[other.pk]['total_debit'], stored[other.pk]['line_count']), (100, 1))
+        EntryLine.objects.get(pk=debit.pk).delete()
+        self.assertEqual(JournalEntry.objects.get(pk=other.pk).line_count, 0)
+
+        # Posting reads the stored totals
+        entry = JournalEntry.objects.get(pk=entry.pk)
+        entry.posted = True
+        with self.assertNumQueries(0):
+            self.assertTrue(entry.is_balanced)
+        entry.save()
+        self.assertTrue(JournalEntry.objects.get(pk=entry.pk).posted)
+
+        JournalEntry.objects.filter(pk=entry.pk).update(total_debit=1)
+        with self.assertRaisesMessage(CommandError, '1 journal entries'):
+            call_command('rebuild_entry_totals', '--verify-only', stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_entry_totals', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(JournalEntry.objects.get(pk=entry.pk).total_debit, 100)
+        call_command('rebuild_entry_totals', '--verify-only', stdout=StringIO())
+
+    def test_post_entries_in_one_batch(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from budget.models import Budget, BudgetLine
+        from .models import AccountPeriodBalance
+        from .posting import post_entries
+
+        def draft(period, day, lines):
+            entry = JournalEntry.objects.create(organization=self.org, period=period, journal=self.journal, date=day, description='Draft')
+            for account, debit, credit in lines:
+                EntryLine.objects.create(journal_entry=entry, account=account, debit_amount=debit, credit_amount=credit)
+            return entry
+
+        budget = Budget.objects.create(organization=self.org, fiscal_year=self.fy, name='Budget 2024')
+        BudgetLine.objects.create(budget=budget, account=self.unused, allocated_amount=50)
+        budget.approve()
+        march = AccountingPeriod.objects.create(fiscal_year=self.fy, name='Mar 2024', start_date=date(2024,3,1), end_date=date(2024,3,31))
+        sale = draft(self.jan, date(2024,1,10), [(self.cash, 100, None), (self.sales, None, 100)])
+        purchase = draft(self.jan, date(2024,1,12), [(self.unused, 30, None), (self.cash, None, 30)])
+        over_budget = draft(self.feb, date(2024,2,1), [(self.unused, 40, None), (self.cash, None, 40)])
+        unbalanced = draft(self.feb, date(2024,2,2), [(self.cash, 10, None), (self.sales, None, 5)])
+        empty = draft(self.feb, date(2024,2,3), [])
+        closed = draft(march, date(2024,3,5), [(self.cash, 10, None), (self.sales, None, 10)])
+        AccountingPeriod.objects.filter(pk=march.pk).update(status='CLOSED')
+        already = self._post(self.feb, date(2024,2,4), 20)
+        user = User.objects.create_user(username='poster', password='pass')
+
+        with CaptureQueriesContext(connection) as queries:
+            posted, rejected = post_entries(JournalEntry.objects.filter(organization=self.org), user=user)
+        self.assertEqual([entry.pk for entry in posted], [sale.pk, purchase.pk])
+        reasons = {entry.pk: reason for entry, reason in rejected}
+        self.assertEqual(list(reasons), [over_budget.pk, unbalanced.pk, empty.pk, closed.pk])
+        self.assertIn('exceeded', reasons[over_budget.pk])
+        self.assertEqual(reasons[unbalanced.pk], 'Cannot post unbalanced entry. Total Debit: 10.00, Total Credit: 5.00')
+        self.assertEqual(reasons[empty.pk], 'Cannot post an entry with no lines.')
+        self.assertIn('closed accounting period', reasons[closed.pk])
+        self.assertEqual(set(JournalEntry.objects.filter(posted=True, posted_by=user).values_list('pk', flat=True)), {sale.pk, purchase.pk})
+        self.assertFalse(JournalEntry.objects.filter(pk=already.pk, posted_by=user).exists())
+        self.assertEqual(AccountPeriodBalance.objects.get(account=self.cash, period=self.jan).debit, 100)
+        self.assertEqual(BudgetLine.objects.get().consumed, 30)
+        call_command('rebuild_account_balances', '--verify-only', stdout=StringIO())
+        call_command('rebuild_budget_counters', '--verify-only', stdout=StringIO())
+
+        # The same number of queries for more entries
+        for day in range(1, 11):
+            draft(self.feb, date(2024,2,day), [(self.cash, day, None), (self.sales, None, day)])
+        draft(self.feb, date(2024,2,15), [(self.unused, 10, None), (self.cash, None, 10)])
+        with CaptureQueriesContext(connection) as more_queries:
+            posted, rejected = post_entries(JournalEntry.objects.filter(organization=self.org), user=user)
+        self.assertEqual((len(posted), len(rejected)), (11, 4))
+        self.assertEqual(len(more_queries), len(queries))
+
+        # The list view posts the selected drafts and lists the ones it could not post
+        user.is_staff = True
+        user.save()
+        user.profile.organization = self.org
+        user.profile.save()
+        client = Client()
+        client.force_login(user)
+        response = client.post(reverse('accounting:journal_entry_bulk_post'), {'entries': [str(empty.uuid)]})
+        self.assertContains(response, 'Cannot post an entry with no lines.')
+        EntryLine.objects.create(journal_entry=unbalanced, account=self.sales, credit_amount=5)
+        response = client.post(reverse('accounting:journal_entry_bulk_post'), {'entries': [str(unbalanced.uuid)]})
+        self.assertRedirects(response, reverse('accounting:journal_entry_list'), fetch_redirect_response=False)
+        self.assertTrue(JournalEntry.objects.get(pk=unbalanced.pk).posted)
+
+        stderr = StringIO()
+        call_command('post_journal_entries', '--organization', str(self.org.pk), '--until', '2024-02-28', stdout=StringIO(), stderr=stderr)
+        self.assertIn('Cannot post an entry with no lines.', stderr.getvalue())
+
+    def test_saving_an_entry_with_many_lines_takes_constant_queries(self):
+        from .forms import EntryLineFormSet, JournalEntryForm
+
+        def post_data(count, lines=()):
+            data = {
+                'period': self.jan.pk, 'journal': self.journal.pk, 'date': '2024-01-10', 'description': 'Payroll',
+                'entry_number': '', 'reference': '', 'posted_by': '', 'posted_at': '',
+                'lines-TOTAL_FORMS': str(count), 'lines-INITIAL_FORMS': str(len(lines)),
+                'lines-MIN_NUM_FORMS': '0', 'lines-MAX_NUM_FORMS': '1000',
+            }
+            for index in range(count):
+                account, side = (self.cash, 'debit_amount') if index % 2 == 0 else (self.sales, 'credit_amount')
+                data[f'lines-{index}-account'] = account.pk
+                data[f'lines-{index}-{side}'] = '10.00'
+                if index < len(lines):
+                    data[f'lines-{index}-id'] = lines[index].pk
+            return data
+
+        def save(data, entry=None):
+            form = JournalEntryForm(data, instance=entry)
+            form.instance.organization = self.org
+            formset = EntryLineFormSet(data, instance=form.instance)
+            self.assertTrue(form.is_valid() and formset.is_valid(), (form.errors, formset.errors))
+            entry = form.save()
+            formset.instance = entry
+            formset.save()
+            return entry
+
+        # Creating: period, journal, accounts, unique checks, entry number, entry, lines, totals
+        save(post_data(4))  # starts the journal's sequence
+        with self.assertNumQueries(17):
+            entry = save(post_data(50))
+        self.assertEqual((entry.total_debit, entry.total_credit, entry.line_count), (250, 250, 50))
+        with self.assertNumQueries(17):
+            save(post_data(4))
+
+        # Editing: period, journal, the lines once, accounts, entry, then one DELETE, UPDATE and INSERT of lines
+        entry = JournalEntry.objects.select_related('period').get(pk=entry.pk)
+        data = post_data(51, list(entry.lines.order_by('pk')))
+        data['entry_number'] = entry.entry_number
+        data['lines-0-debit_amount'] = '20.00'
+        data['lines-1-credit_amount'] = '20.00'
+        data['lines-2-DELETE'] = 'on'
+        with self.assertNumQueries(14):
+            entry = save(data, entry)
+        self.assertEqual((entry.total_debit, entry.total_credit, entry.line_count), (260, 260, 50))
+        stored = JournalEntry.objects.values_list('total_debit', 'total_credit', 'line_count').get(pk=entry.pk)
+        self.assertEqual(stored, (260, 260, 50))
+
+        # The model path no longer re-reads the entry, its period or the line's relations
+        entry = JournalEntry.objects.select_related('period').get(pk=entry.pk)
+        with self.assertNumQueries(4):
+            EntryLine.objects.create(journal_entry=entry, account=self.sales, credit_amount=10)
+        entry.description = 'Payroll, January'
+        with self.assertNumQueries(3):
+            entry.save()
+        self.assertEqual(JournalEntry.objects.get(pk=entry.pk).total_credit, 270)
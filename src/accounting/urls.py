@@ -7,8 +7,9 @@ from .views import (
     JournalDeleteView, JournalDetailView,
     JournalEntryListView, JournalEntryCreateView, JournalEntryUpdateView,
     JournalEntryDeleteView, JournalEntryDetailView,
-    JournalEntryPostView,
+    JournalEntryPostView, JournalEntryBulkPostView, JournalImportCreateView, JournalImportDetailView,
     FiscalYearListView, FiscalYearCreateView, FiscalYearUpdateView, FiscalYearDeleteView, FiscalYearDetailView,
+    FiscalYearCloseView,
     AccountingPeriodListView, AccountingPeriodCreateView, AccountingPeriodUpdateView, AccountingPeriodDeleteView, AccountingPeriodDetailView,
     AccountingPeriodCloseView,
     ProjectListView, ProjectCreateView, ProjectUpdateView, ProjectDeleteView, ProjectDetailView
@@ -20,6 +21,7 @@ app_name = 'accounting'
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('dashboard/series/', views.dashboard_series, name='dashboard_series'),
     path('journals/', views.journals, name='journals'),
     path('journal-entries/', views.journal_entries, name='journal_entries'),
     path('journal-entries/create/', views.journal_entry_create, name='journal_entry_create'),
@@ -40,12 +42,16 @@ urlpatterns = [
     path('journal-entry/<uuid:uuid>/edit/', JournalEntryUpdateView.as_view(), name='journal_entry_edit'),
     path('journal-entry/<uuid:uuid>/delete/', JournalEntryDeleteView.as_view(), name='journal_entry_delete'),
     path('journal-entry/<uuid:uuid>/', JournalEntryDetailView.as_view(), name='journal_entry_detail'),
+    path('journal-entry/post/', JournalEntryBulkPostView.as_view(), name='journal_entry_bulk_post'),
     path('journal-entry/<uuid:uuid>/post/', JournalEntryPostView.as_view(), name='journal_entry_post'),
+    path('journal-entry/import/', JournalImportCreateView.as_view(), name='journal_import'),
+    path('journal-entry/import/<uuid:uuid>/', JournalImportDetailView.as_view(), name='journal_import_detail'),
     path('fiscalyears/', FiscalYearListView.as_view(), name='fiscalyear_list'),
     path('fiscalyears/create/', FiscalYearCreateView.as_view(), name='fiscalyear_create'),
     path('fiscalyears/<uuid:uuid>/edit/', FiscalYearUpdateView.as_view(), name='fiscalyear_edit'),
     path('fiscalyears/<uuid:uuid>/delete/', FiscalYearDeleteView.as_view(), name='fiscalyear_delete'),
     path('fiscalyears/<uuid:uuid>/', FiscalYearDetailView.as_view(), name='fiscalyear_detail'),
+    path('fiscalyears/<uuid:uuid>/close/', FiscalYearCloseView.as_view(), name='fiscalyear_close'),
     path('fiscalyear/<uuid:uuid>/periods/', AccountingPeriodListView.as_view(), name='accountingperiod_list'),
     path('fiscalyear/<uuid:uuid>/periods/create/', AccountingPeriodCreateView.as_view(), name='accountingperiod_create'),
     path('periods/<uuid:uuid>/edit/', AccountingPeriodUpdateView.as_view(), name='accountingperiod_edit'),
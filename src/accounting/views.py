@@ -1,13 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.urls import reverse_lazy
-from .models import ChartOfAccounts, JournalEntry, FiscalYear, AccountingPeriod, Journal, Project, EntryLine
+from . import dashboard as dashboard_kpis, ledger
+from .models import ChartOfAccounts, JournalEntry, FiscalYear, AccountingPeriod, Journal, Project, EntryLine, JournalImport
 
 from organization.models import Organization
-from .forms import ChartOfAccountsForm, JournalForm, JournalEntryForm, EntryLineFormSet, FiscalYearForm, AccountingPeriodForm
+from .forms import ChartOfAccountsForm, JournalForm, JournalEntryForm, EntryLineFormSet, FiscalYearForm, AccountingPeriodForm, JournalImportForm
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from core.mixins import TenantAccessMixin, RoleRequiredMixin, _get_user_organization
@@ -114,26 +116,11 @@ def dashboard(request):
         organization=organization
     ).order_by('-date')[:5]
     
-    # Calculate financial summaries
-    # In a real implementation, these would be calculated from actual data
-    cash_balance = 4600000  # Example value
-    
-    # Calculate monthly revenue and expenses
-    first_day_of_month = timezone.now().date().replace(day=1)
-    monthly_revenue = 11700000  # Example value
-    monthly_expenses = 7300000  # Example value
-    
-    # Count pending entries
-    pending_entries = JournalEntry.objects.filter(
-        organization=organization,
-        posted=False
-    ).count()
+    # Ledger figures, cached until the organization posts again
+    kpis = dashboard_kpis.cached_kpis(organization, ledger.LedgerService.for_request(request, organization))
     
     context = {
-        'cash_balance': cash_balance,
-        'monthly_revenue': monthly_revenue,
-        'monthly_expenses': monthly_expenses,
-        'pending_entries': pending_entries,
+        **kpis,
         'recent_entries': recent_entries,
         'current_fiscal_year': current_fiscal_year,
         'current_period': current_period,
@@ -142,6 +129,35 @@ def dashboard(request):
     
     return render(request, 'dashboard/index.html', context)
 
+@login_required
+def dashboard_series(request):
+    """
+    Chart series of the dashboard as JSON: ``?interval=month`` (default) or
+    ``day``, optionally bounded by ``start_date`` and ``end_date``.
+    """
+    from django.utils.dateparse import parse_date
+    organization = _get_user_organization(request.user)
+    if organization is None:
+        from django.core.exceptions import PermissionDenied
+        raise PermissionDenied(
+            "You are not assigned to an organization. Contact an administrator."
+        )
+    interval = request.GET.get('interval', 'month')
+    bounds = {}
+    try:
+        for name in ('start_date', 'end_date'):
+            if request.GET.get(name):
+                bounds[name] = parse_date(request.GET[name])
+                if bounds[name] is None:
+                    raise ValueError(f"Invalid {name}, expected YYYY-MM-DD")
+        start_date, end_date = dashboard_kpis.series_range(interval, timezone.now().date(), **bounds)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    series = dashboard_kpis.cached_time_series(
+        organization, interval, start_date, end_date, ledger.LedgerService.for_request(request, organization)
+    )
+    return JsonResponse(series)
+
 @login_required
 def chart_of_accounts(request):
     """View for displaying the chart of accounts."""
@@ -187,20 +203,38 @@ def trial_balance(request):
         organization=organization
     ).order_by('-start_date')
     
-    # Get current fiscal year
-    current_fiscal_year = fiscal_years.first()
+    # Get selected (or current) fiscal year
+    # Ids that are not numbers fall back to the defaults
+    fiscal_year_id = request.GET.get('fiscal_year', '')
+    period_id = request.GET.get('period', '')
+    current_fiscal_year = fiscal_years.filter(pk=fiscal_year_id).first() if fiscal_year_id.isdigit() else None
+    if current_fiscal_year is None:
+        current_fiscal_year = fiscal_years.first()
     
     # Get periods for the current fiscal year
     periods = []
+    period = None
+    report_data = []
+    grand_totals = dict.fromkeys(ledger.TRIAL_BALANCE_COLUMNS, ledger.ZERO)
     if current_fiscal_year:
         periods = AccountingPeriod.objects.filter(
             fiscal_year=current_fiscal_year
         ).order_by('start_date')
+        if period_id.isdigit():
+            period = periods.filter(pk=period_id).first()
+        date_range = period or current_fiscal_year
+        report_data, grand_totals = ledger.trial_balance(
+            organization, date_range.start_date, date_range.end_date
+        )
     
     context = {
         'fiscal_years': fiscal_years,
         'current_fiscal_year': current_fiscal_year,
+        'fiscal_year': current_fiscal_year,
+        'period': period,
         'periods': periods,
+        'report_data': report_data,
+        'grand_totals': grand_totals,
         'generation_date': timezone.now().date(),
     }
     
@@ -277,6 +311,9 @@ class JournalEntryListView(TenantAccessMixin, ListView):
     template_name = 'accounting/journal_entries.html'
     context_object_name = 'journal_entries'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('journal')
+
 @method_decorator(permission_required('accounting.add_journalentry', raise_exception=True), name='dispatch')
 class JournalEntryCreateView(TenantAccessMixin, CreateView):
     model = JournalEntry
@@ -292,10 +329,18 @@ class JournalEntryCreateView(TenantAccessMixin, CreateView):
             context['formset'] = EntryLineFormSet()
         return context
     def form_valid(self, form):
+        from django.core.exceptions import PermissionDenied
+        organization = _get_user_organization(self.request.user)
+        if organization is None:
+            raise PermissionDenied(
+                "You are not assigned to an organization. Contact an administrator."
+            )
         context = self.get_context_data()
         formset = context['formset']
-        # form.instance.organization set by TenantAccessMixin
+        form.instance.organization = organization
         form.instance.created_by = self.request.user
+        # Validate the lines against the entry being created (and its period)
+        formset.instance = form.instance
         if form.is_valid() and formset.is_valid():
             self.object = form.save()
             formset.instance = self.object
@@ -313,7 +358,8 @@ class JournalEntryUpdateView(TenantAccessMixin, UpdateView):
     slug_url_kwarg = 'uuid'
 
     def get_queryset(self):
-        return super().get_queryset().filter(posted=False)
+        # The lines are validated against this entry and its period
+        return super().get_queryset().filter(posted=False).select_related('period')
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.POST:
@@ -364,7 +410,7 @@ class JournalEntryPostView(RoleRequiredMixin, TenantAccessMixin, UpdateView):
             return redirect('accounting:journal_entry_detail', uuid=self.object.uuid)
         
         # US 1.1: Prevent posting unbalanced entries
-        if not self.object.lines.exists():
+        if not self.object.line_count:
             messages.error(request, 'Cannot post an entry with no lines.')
             return redirect('accounting:journal_entry_detail', uuid=self.object.uuid)
             
@@ -374,10 +420,60 @@ class JournalEntryPostView(RoleRequiredMixin, TenantAccessMixin, UpdateView):
 
         self.object.posted = True
         self.object.posted_by = request.user
-        self.object.save()
+        try:
+            self.object.save()
+        except ValidationError as e:
+            for message in e.messages:
+                messages.error(request, message)
+            return redirect('accounting:journal_entry_detail', uuid=self.object.uuid)
         messages.success(request, 'Entry posted successfully.')
         return redirect(self.success_url)
 
+class JournalEntryBulkPostView(RoleRequiredMixin, TenantAccessMixin, ListView):
+    """Post the selected draft entries at once; the ones that cannot be posted are listed with their reason."""
+    model = JournalEntry
+    template_name = 'accounting/journal_entry_bulk_post.html'
+    required_roles = ['Senior Accountant', 'Admin']
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        from .posting import post_entries
+        selected = self.get_queryset().filter(uuid__in=request.POST.getlist('entries'))
+        posted, rejected = post_entries(selected, user=request.user)
+        if posted:
+            messages.success(request, f'{len(posted)} entries posted.')
+        if not rejected:
+            return redirect('accounting:journal_entry_list')
+        return render(request, self.template_name, {'posted': posted, 'rejected': rejected})
+
+@method_decorator(permission_required('accounting.add_journalentry', raise_exception=True), name='dispatch')
+class JournalImportCreateView(TenantAccessMixin, CreateView):
+    """Upload a CSV/XLSX file of entry lines; the import runs in the background."""
+    model = JournalImport
+    form_class = JournalImportForm
+    template_name = 'accounting/journal_import_form.html'
+
+    def form_valid(self, form):
+        from django.db import transaction
+        from .tasks import import_journal_entries
+        form.instance.created_by = self.request.user
+        with transaction.atomic():
+            response = super().form_valid(form)
+            journal_import = self.object
+            transaction.on_commit(lambda: import_journal_entries.delay(journal_import.pk))
+        return response
+
+    def get_success_url(self):
+        return reverse_lazy('accounting:journal_import_detail', kwargs={'uuid': self.object.uuid})
+
+class JournalImportDetailView(TenantAccessMixin, DetailView):
+    """Progress of an import and its rejected rows."""
+    model = JournalImport
+    template_name = 'accounting/journal_import_detail.html'
+    context_object_name = 'journal_import'
+    slug_field = 'uuid'
+    slug_url_kwarg = 'uuid'
+
 class FiscalYearListView(TenantAccessMixin, ListView):
     model = FiscalYear
     template_name = 'accounting/fiscalyear_list.html'
@@ -416,6 +512,23 @@ class FiscalYearDetailView(TenantAccessMixin, DetailView):
     slug_field = 'uuid'
     slug_url_kwarg = 'uuid'
 
+class FiscalYearCloseView(RoleRequiredMixin, TenantAccessMixin, DetailView):
+    model = FiscalYear
+    slug_field = 'uuid'
+    slug_url_kwarg = 'uuid'
+    required_roles = ['Admin']
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        success, message = self.object.close_year(
+            retained_earnings_code=request.POST.get('retained_earnings') or None, user=request.user,
+        )
+        if success:
+            messages.success(request, message)
+        else:
+            messages.error(request, message)
+        return redirect('accounting:fiscalyear_detail', uuid=self.object.uuid)
+
 class AccountingPeriodListView(TenantAccessMixin, ListView):
     model = AccountingPeriod
     template_name = 'accounting/accountingperiod_list.html'
@@ -0,0 +1,263 @@
+"""
+Budget control.
+
+Every budget line keeps two counters: ``consumed``, the posted actual of its
+account over its period (or its budget's fiscal year), and ``committed``, the
+amount of its open commitments. They move with ``F()`` expressions in the
+transaction that posts, unposts or deletes an entry or changes a commitment,
+so the funds still available on a line (``BudgetLine.available``) are read
+from one row instead of re-aggregating the ledger and the commitments.
+
+Lines of APPROVED budgets are enforced: a posting or a commitment that would
+take an expense line beyond its allocation is refused with a
+``ValidationError`` (or, when posting a batch with ``apply_entries``, only
+the entries that would are turned down). Lines of draft budgets are counted
+all the same, so their counters are right once the budget is approved.
+``budget_execution`` recomputes the same figures from scratch;
+``rebuild_budget_counters`` realigns the counters with it.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.translation import gettext as _
+
+from accounting.ledger import ZERO
+
+from .execution import budget_execution
+from .models import Budget, BudgetCommitment, BudgetLine
+
+COUNTER_FIELD = DecimalField(max_digits=15, decimal_places=2)
+
+
+def lines_for(period):
+    """Budget lines an entry of ``period`` counts against: the period's own and its fiscal year's."""
+    return BudgetLine.objects.filter(
+        Q(period=period) | Q(period__isnull=True, budget__fiscal_year_id=period.fiscal_year_id)
+    )
+
+
+def signed_amount(account_type, debit, credit):
+    """What a debit/credit movement spends on an account of ``account_type`` (earns, for revenue)."""
+    if account_type == 'REVENUE':
+        return credit - debit
+    return debit - credit
+
+
+def entry_amounts(entry):
+    """
+    Net signed amount of ``entry`` per account, from one grouped query.
+    Opening entries spend nothing (see ``budget.execution``).
+    """
+    if entry.journal.type == 'OPENING':
+        return {}
+    rows = entry.lines.values('account_id', 'account__account_type').annotate(
+        debit=Coalesce(Sum('debit_amount'), Value(ZERO), output_field=COUNTER_FIELD),
+        credit=Coalesce(Sum('credit_amount'), Value(ZERO), output_field=COUNTER_FIELD),
+    ).order_by()
+    amounts = {}
+    for row in rows:
+        amount = signed_amount(row['account__account_type'], row['debit'], row['credit'])
+        if amount:
+            amounts[row['account_id']] = amount
+    return amounts
+
+
+def is_controlled(line):
+    """Whether ``line`` is enforced: an expense line of an APPROVED budget."""
+    return line.budget.status == 'APPROVED' and line.account.account_type != 'REVENUE'
+
+
+def exceeded_message(line, available, amount):
+    return _("Budget %(budget)s exceeded on %(account)s: %(available)s available, %(amount)s requested.") % {
+        'budget': line.budget.name, 'account': line.account, 'available': available, 'amount': amount,
+    }
+
+
+def _enforce(lines, amounts):
+    """Refuse ``amounts`` (per line pk) that exceed the funds of approved expense lines among ``lines``."""
+    errors = []
+    controlled = lines.filter(budget__status='APPROVED').exclude(account__account_type='REVENUE')
+    for line in controlled.select_related('budget', 'account').select_for_update(of=('self',)).order_by('pk'):
+        amount = amounts.get(line.pk, ZERO)
+        if amount > 0 and amount > line.available:
+            errors.append(exceeded_message(line, line.available, amount))
+    if errors:
+        raise ValidationError(errors)
+
+
+def check_funds(account, period, amount):
+    """
+    Whether ``amount`` can be spent on ``account`` in ``period``.
+
+    Returns ``(allowed, available)``, ``available`` being the least funds
+    left over the approved budget lines covering them, or None when no
+    approved budget does (nothing to enforce). Reads the counters only.
+    """
+    available = None
+    for line in lines_for(period).filter(account=account, budget__status='APPROVED').only(
+        'allocated_amount', 'consumed', 'committed'
+    ):
+        available = line.available if available is None else min(available, line.available)
+    return available is None or amount <= available, available
+
+
+def release_commitments(entries):
+    """Mark the open commitments invoiced by ``entries`` as INVOICED and free their amounts."""
+    open_commitments = BudgetCommitment.objects.filter(journal_entry__in=entries, status='COMMITTED')
+    for row in open_commitments.values('budget_line').annotate(total=Sum('amount')).order_by():
+        BudgetLine.objects.filter(pk=row['budget_line']).update(committed=F('committed') - row['total'])
+    open_commitments.update(status='INVOICED')
+
+
+def restore_commitments(entries):
+    """
+    Undo ``release_commitments`` for ``entries`` being unposted or deleted:
+    the commitments they invoiced are COMMITTED again and hold their amounts.
+    """
+    invoiced = BudgetCommitment.objects.filter(journal_entry__in=entries, status='INVOICED')
+    for row in invoiced.values('budget_line').annotate(total=Sum('amount')).order_by():
+        BudgetLine.objects.filter(pk=row['budget_line']).update(committed=F('committed') + row['total'])
+    invoiced.update(status='COMMITTED')
+
+
+def apply_entry(entry, sign=1):
+    """
+    Add (``sign=1``, enforcing approved budgets) or remove (``sign=-1``) the
+    amounts of ``entry`` to the ``consumed`` counter of the lines it counts
+    against, with a single UPDATE. Posting an entry first invoices the
+    commitments linked to it; unposting it opens them again.
+    """
+    if sign > 0:
+        release_commitments([entry])
+    else:
+        restore_commitments([entry])
+    amounts = entry_amounts(entry)
+    if not amounts:
+        return
+    lines = lines_for(entry.period).filter(account_id__in=amounts)
+    if sign > 0:
+        _enforce(lines, {
+            pk: amounts[account_id] for pk, account_id in lines.values_list('pk', 'account_id')
+        })
+    lines.update(consumed=F('consumed') + Case(
+        *[When(account_id=account_id, then=Value(sign * amount)) for account_id, amount in amounts.items()],
+        default=Value(ZERO), output_field=COUNTER_FIELD,
+    ))
+
+
+def _add_consumed(lines, amounts):
+    """Add ``amounts`` (per line pk) to the ``consumed`` counters of ``lines`` with a single UPDATE."""
+    lines.update(consumed=F('consumed') + Case(
+        *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+        default=Value(ZERO), output_field=COUNTER_FIELD,
+    ))
+
+
+def apply_entries(entries, amounts):
+    """
+    Budget control of posting several ``entries`` at once (in date order,
+    with their period loaded), ``amounts`` being the ``entry_amounts`` of
+    each, per entry pk.
+
+    Each entry is checked against the funds left by the entries before it,
+    plus the commitments it invoices, so one that would take an approved
+    expense line beyond its allocation is turned down alone. Returns
+    ``{entry pk: reason}`` for those; the counters and commitments of the
+    others are updated, in a fixed number of queries.
+    """
+    accounts = {account_id for by_account in amounts.values() for account_id in by_account}
+    if not accounts:
+        release_commitments(entries)
+        return {}
+    lines = list(BudgetLine.objects.filter(account_id__in=accounts).filter(
+        Q(period_id__in={entry.period_id for entry in entries})
+        | Q(period__isnull=True, budget__fiscal_year_id__in={entry.period.fiscal_year_id for entry in entries})
+    ).select_related('budget', 'account').select_for_update(of=('self',)).order_by('pk'))
+    by_period, by_year = {}, {}
+    for line in lines:
+        if line.period_id:
+            by_period.setdefault((line.account_id, line.period_id), []).append(line)
+        else:
+            by_year.setdefault((line.account_id, line.budget.fiscal_year_id), []).append(line)
+    invoiced = {}
+    for row in BudgetCommitment.objects.filter(journal_entry__in=entries, status='COMMITTED').values(
+        'journal_entry', 'budget_line'
+    ).annotate(total=Sum('amount')).order_by():
+        invoiced.setdefault(row['journal_entry'], {})[row['budget_line']] = row['total']
+
+    available = {line.pk: line.available for line in lines if is_controlled(line)}
+    consumed, rejected, accepted = {}, {}, []
+    for entry in entries:
+        spent = {}
+        for account_id, amount in amounts.get(entry.pk, {}).items():
+            for line in by_period.get((account_id, entry.period_id), []) + by_year.get((account_id, entry.period.fiscal_year_id), []):
+                spent[line] = spent.get(line, ZERO) + amount
+        freed = invoiced.get(entry.pk, {})
+        errors = [
+            exceeded_message(line, available[line.pk] + freed.get(line.pk, ZERO), amount)
+            for line, amount in spent.items()
+            if line.pk in available and amount > 0 and amount > available[line.pk] + freed.get(line.pk, ZERO)
+        ]
+        if errors:
+            rejected[entry.pk] = ' '.join(errors)
+            continue
+        accepted.append(entry)
+        for line_pk, amount in freed.items():
+            if line_pk in available:
+                available[line_pk] += amount
+        for line, amount in spent.items():
+            consumed[line.pk] = consumed.get(line.pk, ZERO) + amount
+            if line.pk in available:
+                available[line.pk] -= amount
+    release_commitments(accepted)
+    if consumed:
+        _add_consumed(BudgetLine.objects.filter(pk__in=consumed), consumed)
+    return rejected
+
+
+def open_amount(budget_line_id, amount, status):
+    """What a commitment holds on its line: its amount while COMMITTED, nothing once invoiced or cancelled."""
+    return {budget_line_id: amount} if status == 'COMMITTED' and amount else {}
+
+
+def apply_commitment(previous, current):
+    """
+    Move the ``committed`` counters from a commitment's ``previous`` state to
+    its ``current`` one, both ``open_amount`` dicts. Increases are enforced
+    against approved budgets.
+    """
+    changes = {}
+    for held, sign in ((previous, -1), (current, 1)):
+        for line_id, amount in held.items():
+            changes[line_id] = changes.get(line_id, ZERO) + sign * amount
+    increases = {line_id: delta for line_id, delta in changes.items() if delta > 0}
+    if increases:
+        _enforce(BudgetLine.objects.filter(pk__in=increases), increases)
+    for line_id, delta in changes.items():
+        if delta:
+            BudgetLine.objects.filter(pk=line_id).update(committed=F('committed') + delta)
+
+
+def expected_counters(budgets):
+    """``(line, consumed, committed)`` of every line of ``budgets``, recomputed by ``budget_execution``."""
+    for budget in budgets:
+        for line in budget_execution(budget)['lines']:
+            yield line, line.actual_spent, line.committed_amount
+
+
+def rebuild_counters(organization=None, verify_only=False):
+    """
+    Reset the counters of every budget line (of ``organization``) that
+    drifted, unless ``verify_only``. Returns ``(line, expected, stored)``
+    tuples for those lines, the pairs being ``(consumed, committed)``.
+    """
+    budgets = Budget.objects.select_related('fiscal_year', 'organization')
+    if organization is not None:
+        budgets = budgets.filter(organization=organization)
+    drifted = []
+    for line, consumed, committed in expected_counters(budgets):
+        if (line.consumed, line.committed) != (consumed, committed):
+            drifted.append((line, (consumed, committed), (line.consumed, line.committed)))
+            if not verify_only:
+                BudgetLine.objects.filter(pk=line.pk).update(consumed=consumed, committed=committed)
+    return drifted
@@ -0,0 +1,96 @@
+"""
+Budget execution: actuals, commitments and variances of the budget lines.
+
+A line's actual is the posted movement of its account over its accounting
+period, or over the budget's fiscal year when it has none, signed by the
+account type (credit minus debit for revenue accounts, debit minus credit
+otherwise). Opening entries are left out, since the one carrying a closed
+year's result forward reverses the result accounts without spending or
+earning anything (see ``accounting.closing``).
+
+``budget_execution`` computes every line of a budget from two grouped
+queries, one for the actuals and one for the open commitments, however many
+lines the budget has.
+"""
+from django.db.models import Sum
+
+from accounting.ledger import ZERO, LedgerService
+
+from .models import BudgetCommitment
+
+# Grouping of the actuals: the period picks the lines that have one, the
+# fiscal year the lines that don't, and the journal type the entries to skip
+ACTUAL_GROUPING = ('account', 'period', 'fiscal_year', 'journal_type')
+
+
+def actual_range(fiscal_year, periods):
+    """Dates covering ``fiscal_year`` and the ``periods`` budgeted on their own."""
+    start_date = min([fiscal_year.start_date] + [period.start_date for period in periods])
+    end_date = max([fiscal_year.end_date] + [period.end_date for period in periods])
+    return start_date, end_date
+
+
+def index_actuals(rows):
+    """
+    Sum ``ledger.balances`` rows grouped by ``ACTUAL_GROUPING`` into
+    ``(debit, credit)`` per ``(account, period)`` and per ``(account,
+    fiscal_year)``.
+    """
+    by_period, by_year = {}, {}
+    for row in rows:
+        if row['journal_type'] == 'OPENING':
+            continue
+        for index, key in ((by_period, (row['account'], row['period'])), (by_year, (row['account'], row['fiscal_year']))):
+            debit, credit = index.get(key, (ZERO, ZERO))
+            index[key] = (debit + row['debit'], credit + row['credit'])
+    return by_period, by_year
+
+
+def line_actual(line, by_period, by_year):
+    """Actual amount of ``line`` out of ``index_actuals``."""
+    if line.period_id:
+        debit, credit = by_period.get((line.account_id, line.period_id), (ZERO, ZERO))
+    else:
+        debit, credit = by_year.get((line.account_id, line.budget.fiscal_year_id), (ZERO, ZERO))
+    if line.account.account_type == 'REVENUE':
+        return credit - debit
+    return debit - credit
+
+
+def budget_execution(budget, service=None):
+    """
+    Budget vs actual of every line of ``budget``.
+
+    Returns ``{'lines': [...], 'totals': {...}}``: the lines in account code
+    order with ``actual_spent`` and ``committed_amount`` set, so their
+    ``variance``, ``funds_available`` and ``variance_percentage`` need no
+    further query, and the sums of ``allocated``, ``actual``, ``committed``,
+    ``variance`` and ``funds_available`` over the lines.
+    """
+    if service is None:
+        service = LedgerService(budget.organization)
+    lines = list(budget.lines.select_related('account', 'period').order_by('account__code', 'period__start_date'))
+    by_period = by_year = {}
+    if lines:
+        start_date, end_date = actual_range(budget.fiscal_year, [line.period for line in lines if line.period])
+        rows = service.balances(
+            accounts={line.account_id for line in lines}, start_date=start_date, end_date=end_date,
+            group_by=ACTUAL_GROUPING,
+        )
+        by_period, by_year = index_actuals(rows)
+    committed = dict(
+        BudgetCommitment.objects.filter(budget_line__budget=budget, status='COMMITTED')
+        .values('budget_line').annotate(total=Sum('amount')).order_by().values_list('budget_line', 'total')
+    )
+
+    totals = {'allocated': ZERO, 'actual': ZERO, 'committed': ZERO, 'variance': ZERO, 'funds_available': ZERO}
+    for line in lines:
+        line.budget = budget
+        line.actual_spent = line_actual(line, by_period, by_year)
+        line.committed_amount = committed.get(line.pk, ZERO)
+        totals['allocated'] += line.allocated_amount
+        totals['actual'] += line.actual_spent
+        totals['committed'] += line.committed_amount
+        totals['variance'] += line.variance
+        totals['funds_available'] += line.funds_available
+    return {'lines': lines, 'totals': totals}
@@ -0,0 +1,45 @@
+"""
+Management command to rebuild and verify the budget control counters
+(``BudgetLine.consumed`` and ``BudgetLine.committed``) from the posted ledger
+and the open commitments.
+
+Usage:
+    python manage.py rebuild_budget_counters [--organization ID] [--verify-only]
+
+Options:
+    --organization ID    Limit the rebuild/verification to one organization
+    --verify-only        Report the drifted lines without rewriting them
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from budget.control import rebuild_counters
+from organization.models import Organization
+
+
+class Command(BaseCommand):
+    help = "Rebuild the consumed/committed counters of the budget lines, then verify them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Organization ID to process (default: all)')
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help='Only report budget lines whose counters do not match the ledger'
+        )
+
+    def handle(self, *args, **options):
+        organization = None
+        if options['organization']:
+            organization = Organization.objects.filter(pk=options['organization']).first()
+            if organization is None:
+                raise CommandError(f"Organization {options['organization']} does not exist.")
+
+        with transaction.atomic():
+            drifted = rebuild_counters(organization, verify_only=options['verify_only'])
+        if options['verify_only'] and drifted:
+            for line, expected, stored in drifted[:20]:
+                self.stderr.write(f"Mismatch for budget line {line.pk}: expected {expected}, found {stored}")
+            raise CommandError(f"{len(drifted)} budget lines do not match the ledger.")
+        if drifted:
+            self.stdout.write(f"Rebuilt the counters of {len(drifted)} budget lines.")
+        self.stdout.write(self.style.SUCCESS("Budget counters match the ledger."))
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    """Seed the counters of the lines that existed before budget control."""
+    from django.db.models import Sum
+    BudgetLine = apps.get_model('budget', 'BudgetLine')
+    BudgetCommitment = apps.get_model('budget', 'BudgetCommitment')
+    EntryLine = apps.get_model('accounting', 'EntryLine')
+    for line in BudgetLine.objects.select_related('account', 'budget').iterator():
+        lines = EntryLine.objects.filter(
+            account_id=line.account_id, journal_entry__posted=True
+        ).exclude(journal_entry__journal__type='OPENING')
+        if line.period_id:
+            lines = lines.filter(journal_entry__period_id=line.period_id)
+        else:
+            lines = lines.filter(journal_entry__period__fiscal_year_id=line.budget.fiscal_year_id)
+        totals = lines.aggregate(debit=Sum('debit_amount'), credit=Sum('credit_amount'))
+        debit, credit = totals['debit'] or 0, totals['credit'] or 0
+        committed = BudgetCommitment.objects.filter(
+            budget_line_id=line.pk, status='COMMITTED'
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        BudgetLine.objects.filter(pk=line.pk).update(
+            consumed=credit - debit if line.account.account_type == 'REVENUE' else debit - credit,
+            committed=committed,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_accountbalancesnapshot'),
+        ('budget', '0002_budget_uuid_budgetcommitment_uuid_budgetline_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budgetline',
+            name='committed',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=15, verbose_name='Committed'),
+        ),
+        migrations.AddField(
+            model_name='budgetline',
+            name='consumed',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=15, verbose_name='Consumed'),
+        ),
+        migrations.AddIndex(
+            model_name='budgetline',
+            index=models.Index(fields=['account', 'period'], name='budget_budg_account_e8ab7d_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
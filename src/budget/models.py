@@ -1,7 +1,9 @@
 # /home/ubuntu/accounting_project/src/budget/models.py
+from decimal import Decimal
 from django.db import models
 import uuid
 from django.contrib.auth.models import User
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 # Use string references for ForeignKey to avoid circular imports initially
@@ -43,6 +45,10 @@ class BudgetLine(models.Model):
     account = models.ForeignKey("accounting.ChartOfAccounts", on_delete=models.PROTECT, related_name="budget_lines")
     period = models.ForeignKey("accounting.AccountingPeriod", on_delete=models.PROTECT, related_name="budget_lines", null=True, blank=True, help_text=_("Optional: Specify period for monthly/quarterly budgets"))
     allocated_amount = models.DecimalField(_("Allocated Amount"), max_digits=15, decimal_places=2, default=0.00)
+    # Budget control counters, kept up to date by budget.control on posting and
+    # on commitment changes (``rebuild_budget_counters`` realigns them)
+    consumed = models.DecimalField(_("Consumed"), max_digits=15, decimal_places=2, default=0, editable=False)
+    committed = models.DecimalField(_("Committed"), max_digits=15, decimal_places=2, default=0, editable=False)
     # Add fields for analytical dimensions if needed
 
     class Meta:
@@ -50,56 +56,69 @@ class BudgetLine(models.Model):
         verbose_name_plural = _("Budget Lines")
         # Ensure unique budget line per account/period within a budget
         unique_together = [("budget", "account", "period")]
+        indexes = [
+            models.Index(fields=["account", "period"]),
+        ]
         app_label = 'budget'
 
     def __str__(self):
         period_str = f" - {self.period.name}" if self.period else ""
         return f"{self.budget.name} - {self.account}{period_str}: {self.allocated_amount}"
 
+    def save(self, *args, **kwargs):
+        # Count what is already posted against a new or re-targeted line
+        stored = BudgetLine.objects.filter(pk=self.pk).values_list('account_id', 'period_id').first() if self.pk else None
+        if stored != (self.account_id, self.period_id):
+            self.consumed = self.get_actual_spent()
+        super().save(*args, **kwargs)
+
+    @property
+    def available(self):
+        """Funds left according to the control counters: Budget - Consumed - Committed."""
+        return self.allocated_amount - self.consumed - self.committed
+
     def get_committed_amount(self):
         """Calculates total amount currently committed but not yet invoiced."""
         from django.db.models import Sum
         total = self.commitments.filter(status='COMMITTED').aggregate(total=Sum('amount'))['total'] or Decimal("0.00")
         return total
 
-    def get_actual_spent(self):
+    def get_actual_spent(self, service=None):
         """Calculates the actual amount spent against this budget line."""
-        from accounting.models import EntryLine
-        from decimal import Decimal
-        qs = EntryLine.objects.filter(
-            account=self.account,
-            journal_entry__posted=True
-        )
-        if self.period:
-            qs = qs.filter(journal_entry__period=self.period)
-        else:
-            qs = qs.filter(journal_entry__period__fiscal_year=self.budget.fiscal_year)
-            
-        summary = qs.aggregate(
-            debit=models.Sum('debit_amount'),
-            credit=models.Sum('credit_amount')
+        from .execution import ACTUAL_GROUPING, actual_range, index_actuals, line_actual
+        if service is None:
+            service = self.ledger_service
+        start_date, end_date = actual_range(self.budget.fiscal_year, [self.period] if self.period else [])
+        rows = service.balances(
+            accounts=[self.account_id], start_date=start_date, end_date=end_date, group_by=ACTUAL_GROUPING,
         )
-        
-        debit = summary['debit'] or Decimal("0.00")
-        credit = summary['credit'] or Decimal("0.00")
-        
-        # For Expense accounts: Balance = Debit - Credit
-        # For Revenue accounts: Balance = Credit - Debit
-        if self.account.account_type == 'EXPENSE':
-            return debit - credit
-        elif self.account.account_type == 'REVENUE':
-            return credit - debit
-        return debit - credit # Default
+        return line_actual(self, *index_actuals(rows))
+
+    @cached_property
+    def ledger_service(self):
+        """Ledger reads of this line. Views may set a request's service."""
+        from accounting.ledger import LedgerService
+        return LedgerService(self.budget.organization)
+
+    # Computed once per instance; ``execution.budget_execution`` sets both for
+    # every line of a budget from two grouped queries
+    @cached_property
+    def actual_spent(self):
+        return self.get_actual_spent()
+
+    @cached_property
+    def committed_amount(self):
+        return self.get_committed_amount()
 
     @property
     def variance(self):
         """Traditional variance: Budget - Actual."""
-        return self.allocated_amount - self.get_actual_spent()
+        return self.allocated_amount - self.actual_spent
 
     @property
     def funds_available(self):
         """Executive view: Budget - Actual - Committed."""
-        return self.allocated_amount - self.get_actual_spent() - self.get_committed_amount()
+        return self.allocated_amount - self.actual_spent - self.committed_amount
 
     @property
     def variance_percentage(self):
@@ -134,3 +153,22 @@ class BudgetCommitment(models.Model):
     def __str__(self):
         return f"Commitment {self.id} for {self.budget_line.account}: {self.amount}"
 
+    def save(self, *args, **kwargs):
+        from django.db import transaction
+        from .control import apply_commitment, open_amount
+        with transaction.atomic():
+            stored = BudgetCommitment.objects.filter(pk=self.pk).values_list('budget_line_id', 'amount', 'status').first() if self.pk else None
+            # Refused (ValidationError) when it would overrun an approved budget
+            apply_commitment(
+                open_amount(*stored) if stored else {}, open_amount(self.budget_line_id, self.amount, self.status),
+            )
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        from django.db import transaction
+        from .control import apply_commitment, open_amount
+        with transaction.atomic():
+            stored = BudgetCommitment.objects.filter(pk=self.pk).values_list('budget_line_id', 'amount', 'status').first()
+            apply_commitment(open_amount(*stored) if stored else {}, {})
+            return super().delete(*args, **kwargs)
+
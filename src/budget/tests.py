@@ -0,0 +1,124 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth.models import User
+from accounting.models import ChartOfAccounts, JournalEntry, EntryLine, FiscalYear, AccountingPeriod, Journal
+from organization.models import Organization
+from .models import Budget, BudgetLine, BudgetCommitment
+from datetime import date
+from io import StringIO
+
+class BudgetExecutionTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Budget Org')
+        self.fy = FiscalYear.objects.create(organization=self.org, name='2024', start_date=date(2024,1,1), end_date=date(2024,12,31))
+        self.jan = AccountingPeriod.objects.create(fiscal_year=self.fy, name='Jan 2024', start_date=date(2024,1,1), end_date=date(2024,1,31))
+        self.feb = AccountingPeriod.objects.create(fiscal_year=self.fy, name='Feb 2024', start_date=date(2024,2,1), end_date=date(2024,2,29))
+        self.journal = Journal.objects.create(organization=self.org, code='ACH', name='Achats', type='PURCHASE')
+        self.bank = ChartOfAccounts.objects.create(organization=self.org, code='521', name='Bank', account_type='ASSET')
+        self.supplies = ChartOfAccounts.objects.create(organization=self.org, code='604', name='Supplies', account_type='EXPENSE')
+        self.sales = ChartOfAccounts.objects.create(organization=self.org, code='701', name='Sales', account_type='REVENUE')
+        self.budget = Budget.objects.create(organization=self.org, fiscal_year=self.fy, name='Budget 2024')
+
+    def _post(self, period, day, account, debit=None, credit=None):
+        entry = JournalEntry.objects.create(organization=self.org, period=period, journal=self.journal, date=day, description='Op')
+        amount = debit or credit
+        EntryLine.objects.create(journal_entry=entry, account=account, debit_amount=debit, credit_amount=credit)
+        EntryLine.objects.create(journal_entry=entry, account=self.bank, debit_amount=credit, credit_amount=debit)
+        entry.posted = True
+        entry.save()
+        return amount
+
+    def test_budget_execution_in_two_grouped_queries(self):
+        from .execution import budget_execution
+        yearly = BudgetLine.objects.create(budget=self.budget, account=self.supplies, allocated_amount=500)
+        january = BudgetLine.objects.create(budget=self.budget, account=self.supplies, period=self.jan, allocated_amount=100)
+        revenue = BudgetLine.objects.create(budget=self.budget, account=self.sales, allocated_amount=1000)
+        for code in range(30):
+            account = ChartOfAccounts.objects.create(organization=self.org, code=f'61{code:02d}', name='Filler', account_type='EXPENSE')
+            BudgetLine.objects.create(budget=self.budget, account=account, allocated_amount=10)
+        self._post(self.jan, date(2024,1,10), self.supplies, debit=80)
+        self._post(self.feb, date(2024,2,10), self.supplies, debit=50)
+        self._post(self.feb, date(2024,2,12), self.sales, credit=300)
+        BudgetCommitment.objects.create(budget_line=yearly, commitment_date=date(2024,2,15), amount=200, description='PO 1')
+        BudgetCommitment.objects.create(budget_line=yearly, commitment_date=date(2024,2,16), amount=70, description='PO 2', status='CANCELLED')
+
+        budget = Budget.objects.select_related('fiscal_year', 'organization').get(pk=self.budget.pk)
+        # lines, actuals, commitments
+        with self.assertNumQueries(3):
+            execution = budget_execution(budget)
+            by_pk = {line.pk: line for line in execution['lines']}
+            figures = [(by_pk[line.pk].actual_spent, by_pk[line.pk].committed_amount, by_pk[line.pk].funds_available) for line in (yearly, january, revenue)]
+        self.assertEqual(figures, [(130, 200, 170), (80, 0, 20), (300, 0, 700)])
+        self.assertEqual(execution['totals']['allocated'], 1900)
+        self.assertEqual(execution['totals']['actual'], 510)
+        self.assertEqual(execution['totals']['committed'], 200)
+        # The per-line path agrees with the set-based one
+        self.assertEqual(BudgetLine.objects.get(pk=january.pk).actual_spent, 80)
+        self.assertEqual(BudgetLine.objects.get(pk=revenue.pk).variance, 700)
+
+    def test_budget_detail_and_export(self):
+        user = User.objects.create_user(username='budgeter', password='pass', is_staff=True)
+        user.profile.organization = self.org
+        user.profile.save()
+        BudgetLine.objects.create(budget=self.budget, account=self.supplies, allocated_amount=500)
+        self._post(self.jan, date(2024,1,10), self.supplies, debit=80)
+        client = Client()
+        client.force_login(user)
+        response = client.get(reverse('budget:budget_detail', kwargs={'uuid': self.budget.uuid}))
+        self.assertContains(response, '420.00 FC')
+        response = client.get(reverse('budget:budget_export', kwargs={'uuid': self.budget.uuid}) + '?format=csv')
+        rows = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertIn('604,Supplies,,500.00,80.00,0.00,420.00,420.00,84.00', rows)
+        response = client.get(reverse('budget:budget_export', kwargs={'uuid': self.budget.uuid}) + '?format=xlsx')
+        self.assertEqual(response.status_code, 200)
+
+    def test_budget_control_counters_and_enforcement(self):
+        from django.core.exceptions import ValidationError
+        from django.core.management import call_command
+        from .control import check_funds
+        self._post(self.jan, date(2024,1,5), self.supplies, debit=30)
+        yearly = BudgetLine.objects.create(budget=self.budget, account=self.supplies, allocated_amount=200)
+        self.assertEqual(yearly.consumed, 30)
+        self._post(self.feb, date(2024,2,10), self.supplies, debit=50)
+        commitment = BudgetCommitment.objects.create(budget_line=yearly, commitment_date=date(2024,2,15), amount=60, description='PO 1')
+        yearly.refresh_from_db()
+        self.assertEqual((yearly.consumed, yearly.committed, yearly.available), (80, 60, 60))
+        # Draft budgets are counted but not enforced
+        self.assertEqual(check_funds(self.supplies, self.feb, 100), (True, None))
+
+        self.budget.approve()
+        with self.assertNumQueries(1):
+            self.assertEqual(check_funds(self.supplies, self.feb, 100), (False, 60))
+        with self.assertRaises(ValidationError):
+            BudgetCommitment.objects.create(budget_line=yearly, commitment_date=date(2024,2,16), amount=61, description='PO 2')
+        entry = JournalEntry.objects.create(organization=self.org, period=self.feb, journal=self.journal, date=date(2024,2,20), description='Too much')
+        EntryLine.objects.create(journal_entry=entry, account=self.supplies, debit_amount=61)
+        EntryLine.objects.create(journal_entry=entry, account=self.bank, credit_amount=61)
+        entry.posted = True
+        with self.assertRaises(ValidationError):
+            entry.save()
+        self.assertFalse(JournalEntry.objects.get(pk=entry.pk).posted)
+
+        # Posting the invoice of the commitment frees what it held
+        commitment.journal_entry = entry
+        commitment.save()
+        entry.save()
+        commitment.refresh_from_db()
+        yearly.refresh_from_db()
+        self.assertEqual(commitment.status, 'INVOICED')
+        self.assertEqual((yearly.consumed, yearly.committed, yearly.available), (141, 0, 59))
+        # Unposting the invoice holds the commitment again
+        entry.posted = False
+        entry.save()
+        commitment.refresh_from_db()
+        yearly.refresh_from_db()
+        self.assertEqual(commitment.status, 'COMMITTED')
+        self.assertEqual((yearly.consumed, yearly.committed, yearly.available), (80, 60, 60))
+        entry.posted = True
+        entry.save()
+        entry.delete()
+        commitment.refresh_from_db()
+        yearly.refresh_from_db()
+        self.assertEqual(commitment.status, 'COMMITTED')
+        self.assertEqual((yearly.consumed, yearly.committed, yearly.available), (80, 60, 60))
+        call_command('rebuild_budget_counters', '--verify-only', stdout=StringIO())
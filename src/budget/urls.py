@@ -7,6 +7,7 @@ urlpatterns = [
     path('budgets/', views.BudgetListView.as_view(), name='budget_list'),
     path('budgets/create/', views.BudgetCreateView.as_view(), name='budget_create'),
     path('budgets/<uuid:uuid>/', views.BudgetDetailView.as_view(), name='budget_detail'),
+    path('budgets/<uuid:uuid>/export/', views.BudgetExecutionExportView.as_view(), name='budget_export'),
     path('budgets/<uuid:uuid>/edit/', views.BudgetUpdateView.as_view(), name='budget_edit'),
     path('budgets/<uuid:uuid>/delete/', views.BudgetDeleteView.as_view(), name='budget_delete'),
     
@@ -2,6 +2,12 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.urls import reverse_lazy
 from django.contrib import messages
+from django.utils import timezone
+from accounting.ledger import LedgerService
+from reporting.export_utils import (
+    csv_rows_budget_execution, streaming_csv_response, write_excel_budget_execution, xlsx_response,
+)
+from .execution import budget_execution
 from .models import Budget, BudgetLine, BudgetCommitment
 from .forms import BudgetForm, BudgetLineForm
 from core.mixins import TenantAccessMixin, RoleRequiredMixin
@@ -39,6 +45,32 @@ class BudgetDetailView(TenantAccessMixin, DetailView):
     slug_field = 'uuid'
     slug_url_kwarg = 'uuid'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('fiscal_year', 'organization')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        execution = budget_execution(self.object, LedgerService.for_request(self.request, self.object.organization))
+        context['lines'] = execution['lines']
+        context['totals'] = execution['totals']
+        return context
+
+class BudgetExecutionExportView(BudgetDetailView):
+    """Budget vs actual of every line as ``?format=csv`` (default) or ``xlsx``."""
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        execution = budget_execution(self.object, LedgerService.for_request(request, self.object.organization))
+        generation_date = timezone.now().date()
+        filename = f"budget_vs_actual_{self.object.fiscal_year.name}"
+        if request.GET.get('format') == 'xlsx':
+            return xlsx_response(
+                write_excel_budget_execution(self.object, execution, generation_date), f"{filename}.xlsx"
+            )
+        return streaming_csv_response(
+            request, csv_rows_budget_execution(self.object, execution, generation_date), f"{filename}.csv"
+        )
+
 class BudgetLineCreateView(TenantAccessMixin, CreateView):
     model = BudgetLine
     form_class = BudgetLineForm
@@ -225,37 +225,32 @@ class BankReconciliation(models.Model):
     def __str__(self):
         return f"Reconciliation for {self.bank_account} as of {self.statement_date}"
 
-    def calculate_balances(self):
+    def calculate_balances(self, service=None):
         """Calculates the ledger balance and adjusted bank balance."""
-        from accounting.models import EntryLine
+        from accounting.ledger import LedgerService
         from decimal import Decimal
-        
+        if service is None:
+            service = LedgerService(self.organization)
+
+        # Posted lines of the account up to date, split between cleared and
+        # outstanding (not cleared yet) in one grouped read
+        by_status = {
+            row['cleared']: row for row in service.balances(
+                accounts=[self.bank_account_id], end_date=self.statement_date, group_by=('cleared',)
+            )
+        }
+        zero = {'debit': Decimal("0.00"), 'credit': Decimal("0.00")}
+        cleared, outstanding = by_status.get(True, zero), by_status.get(False, zero)
+
         # 1. Full Ledger Balance (all posted entries for this account up to date)
-        ledger_summary = EntryLine.objects.filter(
-            account=self.bank_account,
-            journal_entry__posted=True,
-            journal_entry__date__lte=self.statement_date
-        ).aggregate(
-            debit=models.Sum('debit_amount'),
-            credit=models.Sum('credit_amount')
-        )
-        ledger_debit = ledger_summary['debit'] or Decimal("0.00")
-        ledger_credit = ledger_summary['credit'] or Decimal("0.00")
+        ledger_debit = cleared['debit'] + outstanding['debit']
+        ledger_credit = cleared['credit'] + outstanding['credit']
         self.calculated_ledger_balance = ledger_debit - ledger_credit
 
         # 2. Adjusted Balance (Outstanding items)
         # Outstanding items = Ledger items that are NOT cleared
-        outstanding_summary = EntryLine.objects.filter(
-            account=self.bank_account,
-            journal_entry__posted=True,
-            journal_entry__date__lte=self.statement_date,
-            is_cleared=False
-        ).aggregate(
-            debit=models.Sum('debit_amount'),
-            credit=models.Sum('credit_amount')
-        )
-        outstanding_debits = outstanding_summary['debit'] or Decimal("0.00") # Deposits in transit
-        outstanding_credits = outstanding_summary['credit'] or Decimal("0.00") # Outstanding checks
+        outstanding_debits = outstanding['debit'] # Deposits in transit
+        outstanding_credits = outstanding['credit'] # Outstanding checks
 
         # Statement Balance = Ledger Balance - Deposits in Transit + Outstanding Checks
         # Wait, if I have $100 in ledger, but $20 is a deposit in transit, statement has $80.
@@ -67,8 +67,9 @@ class BankReconciliationCreateView(RoleRequiredMixin, CreateView):
     required_roles = ['Senior Accountant', 'Admin']
 
     def form_valid(self, form):
+        from accounting.ledger import LedgerService
         response = super().form_valid(form)
-        self.object.calculate_balances()
+        self.object.calculate_balances(LedgerService.for_request(self.request, self.object.organization))
         self.object.save()
         return response
 
@@ -186,3 +186,36 @@ SERVER_EMAIL = env('SERVER_EMAIL', default='root@localhost')
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
+
+# Cache: Redis when REDIS_URL is set, otherwise per-process memory
+REDIS_URL = env('REDIS_URL', default=None)
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a computed report stays cached; posting invalidates it earlier
+REPORT_CACHE_TIMEOUT = env.int('REPORT_CACHE_TIMEOUT', default=24 * 60 * 60)
+
+# Celery
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
+CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)
+
+# Consolidated reporting: offline exports (manage.py export_consolidation) of
+# at least CONSOLIDATION_PARALLEL_THRESHOLD organizations are aggregated in
+# parallel, by Celery workers ('celery') or a local pool of
+# CONSOLIDATION_WORKERS processes ('processes'). Web requests stay inline.
+CONSOLIDATION_EXECUTOR = env('CONSOLIDATION_EXECUTOR', default='celery')
+CONSOLIDATION_PARALLEL_THRESHOLD = env.int('CONSOLIDATION_PARALLEL_THRESHOLD', default=4)
+CONSOLIDATION_WORKERS = env.int('CONSOLIDATION_WORKERS', default=4)
+CONSOLIDATION_TIMEOUT = env.int('CONSOLIDATION_TIMEOUT', default=300)
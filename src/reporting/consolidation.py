@@ -0,0 +1,237 @@
+"""
+Consolidated reporting across organizations.
+
+Each organization (entity) keeps its own chart of accounts; the accounts are
+matched across entities by their SYSCOHADA code, optionally truncated to its
+first ``level`` digits so that entities that subdivide an account further
+(``5211``, ``52110``) still land on the same line (``521``).
+
+The per-entity aggregates are independent grouped queries. Web requests
+compute them inline, so that a page never waits on workers it cannot see;
+offline callers (``manage.py export_consolidation``) pass ``parallel`` to
+spread larger groups over Celery workers when ``CONSOLIDATION_EXECUTOR`` is
+``'celery'`` (the default), or over a process pool when it is
+``'processes'``. Small groups stay inline, where the start-up would cost
+more than the queries. The merged result has the comparative statement
+layout, with one column per entity followed by the consolidated total, and
+is cached under the ledger versions of all the entities involved.
+"""
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from accounting import ledger
+from organization.models import Organization
+
+from .reports import DEBIT_NATURE, _param_list
+
+# Statement sections of the consolidated view, in display order
+SECTIONS = (
+    ("Assets", 'ASSET'),
+    ("Liabilities", 'LIABILITY'),
+    ("Equity", 'EQUITY'),
+    ("Revenue", 'REVENUE'),
+    ("Expenses", 'EXPENSE'),
+)
+
+# Balance sheet accounts are consolidated as of the end date, income
+# statement accounts over the date range
+PERIOD_TYPES = ledger.RESULT_ACCOUNT_TYPES
+
+CENT = Decimal("0.01")
+
+
+def _parse_date(value, default):
+    if not value:
+        return default
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return default
+
+
+def entity_balances(organization_id, start_date, end_date):
+    """
+    Aggregate one entity for the consolidation, as JSON-serializable rows.
+
+    Returns ``[code, name, account_type, balance]`` lists, ``balance`` being
+    the net debit minus credit as a string: cumulative up to ``end_date`` for
+    balance sheet accounts, between ``start_date`` and ``end_date`` for
+    revenue and expense accounts. Accounts without movements are left out.
+    Dates may be given as ISO strings (as they arrive in a Celery task).
+    """
+    start_date, end_date = _parse_date(start_date, None), _parse_date(end_date, None)
+    organization = Organization.objects.get(pk=organization_id)
+    accounts = ledger.account_movements(organization, start_date, end_date).values_list(
+        'pk', 'code', 'name', 'account_type', 'opening_debit', 'opening_credit', 'period_debit', 'period_credit'
+    )
+    carried = ledger.carry_forward_movements(organization, [(start_date, end_date)], rollup=False)
+    rows = []
+    for account_id, code, name, account_type, opening_debit, opening_credit, period_debit, period_credit in accounts:
+        balance = period_debit - period_credit
+        if account_type in PERIOD_TYPES:
+            for debit, credit in carried.get(account_id, ()):
+                balance -= debit - credit
+        else:
+            balance += opening_debit - opening_credit
+        if balance:
+            rows.append([code, name, account_type, str(balance.quantize(CENT))])
+    return rows
+
+
+def _pool_worker(organization_id, start_date, end_date):
+    try:
+        return entity_balances(organization_id, start_date, end_date)
+    finally:
+        connections.close_all()
+
+
+def collect_balances(organization_ids, start_date, end_date, parallel=False):
+    """
+    Run ``entity_balances`` for every entity; with ``parallel``, spread them
+    over workers when there are enough of them. Waiting on Celery workers
+    from inside a task would deadlock, so never pass ``parallel`` there.
+    """
+    arguments = [(organization_id, start_date.isoformat(), end_date.isoformat()) for organization_id in organization_ids]
+    if not parallel or len(arguments) < settings.CONSOLIDATION_PARALLEL_THRESHOLD:
+        return [entity_balances(*args) for args in arguments]
+
+    if settings.CONSOLIDATION_EXECUTOR == 'celery':
+        from celery import group
+        from .tasks import consolidation_entity_balances
+        result = group(consolidation_entity_balances.s(*args) for args in arguments).apply_async()
+        return result.get(timeout=settings.CONSOLIDATION_TIMEOUT)
+
+    # Spawned workers set Django up afresh instead of sharing the forked
+    # parent's database connections.
+    import django
+    with ProcessPoolExecutor(
+        max_workers=min(settings.CONSOLIDATION_WORKERS, len(arguments)),
+        mp_context=get_context('spawn'),
+        initializer=django.setup,
+    ) as pool:
+        return list(pool.map(_pool_worker, *zip(*arguments)))
+
+
+def consolidation_key(code, level):
+    """Line of the consolidated view an account ``code`` maps to."""
+    return code[:level] if level else code
+
+
+def merge(entity_rows, level=None):
+    """
+    Merge the ``entity_balances`` of several entities into consolidated lines.
+
+    Returns ``{account_type: [(code, name, balances)]}`` where ``balances``
+    has one net balance per entity plus the consolidated sum, sorted by code.
+    The name is the one of the entity account whose code matches the line
+    exactly, otherwise the first one met.
+    """
+    width = len(entity_rows)
+    lines = {}
+    for index, rows in enumerate(entity_rows):
+        for code, name, account_type, balance in rows:
+            key = consolidation_key(code, level)
+            line = lines.get((account_type, key))
+            if line is None:
+                line = lines[account_type, key] = {'name': name, 'exact': code == key, 'balances': [Decimal("0.00")] * width}
+            elif code == key and not line['exact']:
+                line['name'], line['exact'] = name, True
+            line['balances'][index] += Decimal(balance)
+
+    merged = {}
+    for (account_type, key), line in sorted(lines.items(), key=lambda item: item[0][1]):
+        balances = line['balances'] + [sum(line['balances'], Decimal("0.00"))]
+        merged.setdefault(account_type, []).append((key, line['name'], balances))
+    return merged
+
+
+def consolidated_statement(organizations, start_date, end_date, level=None, parallel=False):
+    """
+    Consolidated balance sheet and income statement of ``organizations``.
+
+    Returns a comparative statement dict (see ``reports.comparative_statement``)
+    whose columns are the entity names followed by ``Consolidated``, so the
+    comparative page fragment and exporters render it as is.
+    """
+    entity_rows = collect_balances([organization.pk for organization in organizations], start_date, end_date, parallel)
+    merged = merge(entity_rows, level)
+    width = len(organizations) + 1
+    result = {
+        'title': "Consolidated Statements / États consolidés",
+        'columns': [organization.name for organization in organizations] + ["Consolidated"],
+        'sections': [],
+        'summary': [],
+    }
+    totals_by_type = {}
+    for section_title, account_type in SECTIONS:
+        sign = 1 if account_type in DEBIT_NATURE else -1
+        rows = []
+        totals = [Decimal("0.00")] * width
+        for code, name, balances in merged.get(account_type, []):
+            balances = [sign * balance for balance in balances]
+            rows.append({'code': code, 'name': name, 'balances': balances, 'depth': 0, 'path': code, 'is_subtotal': False})
+            totals = [total + balance for total, balance in zip(totals, balances)]
+        totals_by_type[account_type] = totals
+        result['sections'].append({'title': section_title, 'rows': rows, 'totals': totals})
+    result['summary'] = [
+        ("Net Income", [revenue - expense for revenue, expense in zip(totals_by_type['REVENUE'], totals_by_type['EXPENSE'])]),
+        ("Total Liabilities + Equity", [
+            liability + equity for liability, equity in zip(totals_by_type['LIABILITY'], totals_by_type['EQUITY'])
+        ]),
+    ]
+    return result
+
+
+def consolidation(params, parallel=False):
+    """
+    Resolve the ``organizations``, ``start_date``, ``end_date`` and ``level``
+    parameters and build the consolidated report data (see
+    ``collect_balances`` for ``parallel``).
+
+    Defaults: every active organization, from the first day of the current
+    year to today, accounts matched on their full code. Malformed values
+    fall back to the defaults.
+    """
+    today = timezone.now().date()
+    start_date = _parse_date(params.get('start_date'), today.replace(month=1, day=1))
+    end_date = _parse_date(params.get('end_date'), today)
+    level = params.get('level')
+    level = int(level) if level and str(level).isdigit() else None
+
+    organizations = Organization.objects.filter(is_active=True).order_by('name')
+    organization_ids = [value for value in _param_list(params, 'organizations') if value.isdigit()]
+    if organization_ids:
+        organizations = organizations.filter(pk__in=organization_ids)
+    organizations = list(organizations)
+
+    return {
+        'organizations': organizations,
+        'start_date': start_date,
+        'end_date': end_date,
+        'level': level,
+        'comparison': (
+            cached_consolidated_statement(organizations, start_date, end_date, level, parallel) if organizations else None
+        ),
+    }
+
+
+def cached_consolidated_statement(organizations, start_date, end_date, level=None, parallel=False):
+    """``consolidated_statement`` reused until one of the entities posts again."""
+    versions = [(organization.pk, ledger.ledger_version(organization.pk)) for organization in organizations]
+    digest = hashlib.md5(repr((versions, start_date, end_date, level)).encode('utf-8')).hexdigest()
+    key = f"report:consolidated:{digest}"
+    result = cache.get(key)
+    if result is None:
+        result = consolidated_statement(organizations, start_date, end_date, level, parallel)
+        cache.set(key, result, settings.REPORT_CACHE_TIMEOUT)
+    return result
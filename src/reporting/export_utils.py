@@ -1,15 +1,97 @@
 """
-PDF and Excel export utilities for reporting views.
-
-Uses reportlab for PDF and openpyxl for Excel (xlsx) generation.
+PDF, Excel and CSV export utilities for reporting views.
+
+Uses reportlab for PDF and openpyxl for Excel (xlsx) generation. Large Excel
+reports use openpyxl write-only worksheets spooled to a temporary file
+(``write_excel_*`` + ``xlsx_response``) so their memory use is bounded. CSV
+reports are described as row generators (``csv_rows_*``) that are streamed to
+the client row by row with ``streaming_csv_response``, or spooled to a file
+for background exports.
 """
 from io import BytesIO
 from decimal import Decimal
 from datetime import date
 
-from django.http import HttpResponse
+import tempfile
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 import csv
-from io import StringIO
+
+# Number of rows fetched per database round trip when streaming a queryset
+STREAM_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Workbooks larger than this are spooled from memory to a temporary file on disk
+XLSX_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+class _Echo:
+    """Pseudo file whose ``write`` hands the CSV-encoded line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _encode_csv(rows):
+    """Yield each row of ``rows`` as an encoded CSV line."""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _write_only_sheet(title):
+    """Create a write-only workbook and its single worksheet."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    return wb, ws
+
+
+def _styled(ws, value, **style):
+    """Return a write-only cell holding ``value`` with the given style attributes."""
+    from openpyxl.cell import WriteOnlyCell
+
+    cell = WriteOnlyCell(ws, value=value)
+    for name, attr in style.items():
+        setattr(cell, name, attr)
+    return cell
+
+
+def _spool_workbook(wb):
+    """Save ``wb`` into a rewound spooled temporary file."""
+    spool = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_MEMORY)
+    wb.save(spool)
+    spool.seek(0)
+    return spool
+
+
+def xlsx_response(spool, filename):
+    """Serve a spooled workbook as an attachment, in chunks."""
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def streaming_csv_response(request, rows, filename):
+    """
+    Stream ``rows`` to the client as a CSV attachment.
+
+    Rows are encoded one at a time so worker memory does not depend on the
+    size of the report. The body is gzip-compressed on the fly when the
+    client advertises support for it.
+    """
+    content = (line.encode('utf-8') for line in _encode_csv(rows))
+    accepts_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if accepts_gzip:
+        content = compress_sequence(content)
+    resp = StreamingHttpResponse(content, content_type='text/csv; charset=utf-8')
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if accepts_gzip:
+        resp['Content-Encoding'] = 'gzip'
+    patch_vary_headers(resp, ('Accept-Encoding',))
+    return resp
 
 
 
@@ -83,18 +165,17 @@ def export_pdf_general_ledger(entry_lines, selected_account, generation_date, fi
     return buffer.getvalue()
 
 
-def export_excel_general_ledger(entry_lines, selected_account, generation_date, fiscal_year=None, period=None):
-    """Generate Excel for general ledger report."""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, Border, Side
+def write_excel_general_ledger(entry_lines, selected_account, generation_date, fiscal_year=None, period=None):
+    """Write the general ledger with a write-only worksheet; returns a spooled file."""
+    from openpyxl.styles import Font
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "General Ledger"
+    wb, ws = _write_only_sheet("General Ledger")
+    # Column widths must be set before the first row is written
+    for col in "ABDE":
+        ws.column_dimensions[col].width = 15
+    ws.column_dimensions['C'].width = 30
 
-    ws.append(["General Ledger / Grand Livre"])
-    ws.merge_cells('A1:E1')
-    ws['A1'].font = Font(bold=True, size=14)
+    ws.append([_styled(ws, "General Ledger / Grand Livre", font=Font(bold=True, size=14))])
     if selected_account:
         ws.append([f"Account: {selected_account.code} - {selected_account.name}"])
     if fiscal_year:
@@ -105,28 +186,18 @@ def export_excel_general_ledger(entry_lines, selected_account, generation_date,
     ws.append([])
 
     headers = ["Date", "Reference", "Description", "Debit", "Credit"]
-    ws.append(headers)
-    for row in headers:
-        ws.cell(row=ws.max_row, column=headers.index(row) + 1).font = Font(bold=True)
+    ws.append([_styled(ws, header, font=Font(bold=True)) for header in headers])
 
-    for line in entry_lines:
-        je = line.journal_entry
+    for entry_date, reference, description, debit, credit in _general_ledger_lines(entry_lines):
         ws.append([
-            str(je.date),
-            je.reference or "-",
-            line.description or "-",
-            float(line.debit_amount) if line.debit_amount else 0,
-            float(line.credit_amount) if line.credit_amount else 0,
+            str(entry_date),
+            reference or "-",
+            description or "-",
+            float(debit) if debit else 0,
+            float(credit) if credit else 0,
         ])
 
-    for col in range(1, 6):
-        ws.column_dimensions[chr(64 + col)].width = 15
-    ws.column_dimensions['C'].width = 30
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
+    return _spool_workbook(wb)
 
 
 def export_pdf_balance_sheet(assets, liabilities, equity, total_assets, total_liabilities, total_equity, as_of_date, generation_date):
@@ -200,6 +271,89 @@ def export_excel_balance_sheet(assets, liabilities, equity, total_assets, total_
     return buffer.getvalue()
 
 
+def _comparative_table(comparison):
+    """Yield ``(kind, row)`` for a comparative statement: the header, account rows, section totals and summary lines."""
+    yield 'header', ["Code", "Name", *comparison['columns']]
+    for section in comparison['sections']:
+        yield 'section', ["", section['title'].upper()] + [""] * len(comparison['columns'])
+        for row in section['rows']:
+            yield 'account', [row['code'], "  " * row['depth'] + row['name'], *row['balances']]
+        yield 'total', ["", f"TOTAL {section['title'].upper()}", *section['totals']]
+    for label, values in comparison['summary']:
+        yield 'total', ["", label.upper(), *values]
+
+
+def export_pdf_comparative_statement(comparison, generation_date):
+    """Generate PDF for a comparative (multi-column) balance sheet or income statement."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=1*cm, leftMargin=1*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
+    styles = getSampleStyleSheet()
+    elements = []
+
+    elements.append(Paragraph(comparison['title'], styles['Heading1']))
+    elements.append(Paragraph(f"Generated: {generation_date}", styles['Normal']))
+    elements.append(Spacer(1, 0.5*cm))
+
+    data = []
+    bold_rows = []
+    for kind, row in _comparative_table(comparison):
+        if kind in ('section', 'total', 'header'):
+            bold_rows.append(len(data))
+        data.append(row[:2] + [value if kind in ('header', 'section') else _format_decimal(value) for value in row[2:]])
+
+    value_width = min(4*cm, (27.7*cm - 9*cm) / max(len(comparison['columns']), 1))
+    t = Table(data, colWidths=[2*cm, 7*cm] + [value_width] * len(comparison['columns']), repeatRows=1)
+    style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ]
+    style += [('FONTNAME', (0, row), (-1, row), 'Helvetica-Bold') for row in bold_rows]
+    t.setStyle(TableStyle(style))
+    elements.append(t)
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def write_excel_comparative_statement(comparison, generation_date):
+    """Write a comparative statement with a write-only worksheet; returns a spooled file."""
+    from openpyxl.styles import Font
+
+    wb, ws = _write_only_sheet("Comparative")
+    ws.column_dimensions['A'].width = 12
+    ws.column_dimensions['B'].width = 40
+
+    ws.append([_styled(ws, comparison['title'], font=Font(bold=True, size=14))])
+    ws.append([f"Generated: {generation_date}"])
+    ws.append([])
+    for kind, row in _comparative_table(comparison):
+        if kind == 'account':
+            ws.append(row[:2] + [float(value) for value in row[2:]])
+        elif kind == 'total':
+            ws.append([_styled(ws, value if i < 2 else float(value), font=Font(bold=True)) for i, value in enumerate(row)])
+        else:
+            ws.append([_styled(ws, value, font=Font(bold=True)) for value in row])
+    return _spool_workbook(wb)
+
+
+def csv_rows_comparative_statement(comparison, generation_date):
+    """Yield the CSV rows of a comparative statement."""
+    yield [comparison['title']]
+    yield [f"Generated: {generation_date}"]
+    yield []
+    for _kind, row in _comparative_table(comparison):
+        yield row
+
+
 def export_pdf_income_statement(revenues, expenses, total_revenue, total_expense, net_income, start_date, end_date, generation_date):
     """Generate PDF for income statement."""
     from reportlab.lib import colors
@@ -267,6 +421,18 @@ def export_excel_income_statement(revenues, expenses, total_revenue, total_expen
     return buffer.getvalue()
 
 
+# Subtotal rows cover their sub-accounts: sum the "Account" rows only
+TRIAL_BALANCE_HEADERS = [
+    "Code", "Level", "Type", "Name",
+    "Opening Debit", "Opening Credit", "Period Debit", "Period Credit", "Closing Debit", "Closing Credit",
+]
+
+
+def _trial_balance_account(row):
+    """The code, level, row type and indented name of a trial balance row."""
+    return [row['code'], row['depth'], "Subtotal" if row['is_subtotal'] else "Account", "  " * row['depth'] + row['name']]
+
+
 def export_pdf_trial_balance(report_data, grand_totals, fiscal_year, period, start_date, end_date, generation_date):
     """Generate PDF for trial balance."""
     from reportlab.lib import colors
@@ -286,28 +452,28 @@ def export_pdf_trial_balance(report_data, grand_totals, fiscal_year, period, sta
     elements.append(Paragraph(f"Generated: {generation_date}", styles['Normal']))
     elements.append(Spacer(1, 0.3*cm))
 
-    headers = ["Code", "Name", "Opening Debit", "Opening Credit", "Period Debit", "Period Credit", "Closing Debit", "Closing Credit"]
+    headers = TRIAL_BALANCE_HEADERS
     data = [headers]
     for row in report_data:
         data.append([
-            row['code'], row['name'],
+            *_trial_balance_account(row),
             _format_decimal(row['opening_debit']), _format_decimal(row['opening_credit']),
             _format_decimal(row['period_debit']), _format_decimal(row['period_credit']),
             _format_decimal(row['closing_debit']), _format_decimal(row['closing_credit']),
         ])
     data.append([
-        "", "TOTALS",
+        "", "", "", "TOTALS",
         _format_decimal(grand_totals['opening_debit']), _format_decimal(grand_totals['opening_credit']),
         _format_decimal(grand_totals['period_debit']), _format_decimal(grand_totals['period_credit']),
         _format_decimal(grand_totals['closing_debit']), _format_decimal(grand_totals['closing_credit']),
     ])
 
-    col_widths = [2*cm, 5*cm, 2.5*cm, 2.5*cm, 2.5*cm, 2.5*cm, 2.5*cm, 2.5*cm]
+    col_widths = [1.8*cm, 1.2*cm, 1.8*cm, 5*cm, 2.4*cm, 2.4*cm, 2.4*cm, 2.4*cm, 2.4*cm, 2.4*cm]
     t = Table(data, colWidths=col_widths)
     t.setStyle(TableStyle([
         ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
         ('FONTSIZE', (0, 0), (-1, -1), 8),
         ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
@@ -318,39 +484,31 @@ def export_pdf_trial_balance(report_data, grand_totals, fiscal_year, period, sta
     return buffer.getvalue()
 
 
-def export_excel_trial_balance(report_data, grand_totals, fiscal_year, period, start_date, end_date, generation_date):
-    """Generate Excel for trial balance."""
-    from openpyxl import Workbook
+def write_excel_trial_balance(report_data, grand_totals, fiscal_year, period, start_date, end_date, generation_date):
+    """Write the trial balance with a write-only worksheet; returns a spooled file."""
     from openpyxl.styles import Font
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Trial Balance"
+    wb, ws = _write_only_sheet("Trial Balance")
     period_str = period.name if period else (fiscal_year.name if fiscal_year else f"{start_date} - {end_date}")
     ws.append(["Trial Balance / Balance de Verification"])
     ws.append([f"Period: {period_str}", f"Generated: {generation_date}"])
     ws.append([])
-    headers = ["Code", "Name", "Opening Debit", "Opening Credit", "Period Debit", "Period Credit", "Closing Debit", "Closing Credit"]
-    ws.append(headers)
-    for c in range(1, 9):
-        ws.cell(row=ws.max_row, column=c).font = Font(bold=True)
+    headers = TRIAL_BALANCE_HEADERS
+    ws.append([_styled(ws, header, font=Font(bold=True)) for header in headers])
     for row in report_data:
         ws.append([
-            row['code'], row['name'],
+            *_trial_balance_account(row),
             float(row['opening_debit']), float(row['opening_credit']),
             float(row['period_debit']), float(row['period_credit']),
             float(row['closing_debit']), float(row['closing_credit']),
         ])
     ws.append([
-        "", "TOTALS",
+        "", "", "", "TOTALS",
         float(grand_totals['opening_debit']), float(grand_totals['opening_credit']),
         float(grand_totals['period_debit']), float(grand_totals['period_credit']),
         float(grand_totals['closing_debit']), float(grand_totals['closing_credit']),
     ])
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
+    return _spool_workbook(wb)
 
 
 def export_pdf_cash_flow(report_data, start_date, end_date, generation_date):
@@ -451,135 +609,236 @@ def export_excel_cash_flow(report_data, start_date, end_date, generation_date):
     return buffer.getvalue()
 
 
-def export_csv_general_ledger(entry_lines, selected_account, generation_date, fiscal_year=None, period=None):
-    """Generate CSV for general ledger report."""
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["General Ledger / Grand Livre"])
+def _general_ledger_lines(entry_lines):
+    """Yield ``(date, reference, description, debit, credit)`` for each ledger line.
+
+    When ``entry_lines`` is a queryset it is read in chunks through
+    ``values_list`` so that no model instances are built.
+    """
+    if hasattr(entry_lines, 'values_list'):
+        yield from entry_lines.values_list(
+            'journal_entry__date', 'journal_entry__reference', 'description', 'debit_amount', 'credit_amount'
+        ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    else:
+        for line in entry_lines:
+            je = line.journal_entry
+            yield je.date, je.reference, line.description, line.debit_amount, line.credit_amount
+
+
+def csv_rows_general_ledger(entry_lines, selected_account, generation_date, fiscal_year=None, period=None):
+    """Yield the CSV rows of the general ledger report."""
+    yield ["General Ledger / Grand Livre"]
     if selected_account:
-        writer.writerow([f"Account: {selected_account.code} - {selected_account.name}"])
+        yield [f"Account: {selected_account.code} - {selected_account.name}"]
     if fiscal_year:
-        writer.writerow([f"Fiscal Year: {fiscal_year.name}"])
+        yield [f"Fiscal Year: {fiscal_year.name}"]
     if period:
-        writer.writerow([f"Period: {period.name}"])
-    writer.writerow([f"Generated: {generation_date}"])
-    writer.writerow([])
-    
-    headers = ["Date", "Reference", "Description", "Debit", "Credit"]
-    writer.writerow(headers)
-    
-    for line in entry_lines:
-        je = line.journal_entry
-        writer.writerow([
-            str(je.date),
-            je.reference or "-",
-            line.description or "-",
-            line.debit_amount or 0,
-            line.credit_amount or 0,
-        ])
-    
-    return output.getvalue()
+        yield [f"Period: {period.name}"]
+    yield [f"Generated: {generation_date}"]
+    yield []
 
+    yield ["Date", "Reference", "Description", "Debit", "Credit"]
 
-def export_csv_balance_sheet(assets, liabilities, equity, total_assets, total_liabilities, total_equity, as_of_date, generation_date):
-    """Generate CSV for balance sheet."""
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["Balance Sheet / Bilan"])
-    writer.writerow([f"As of: {as_of_date}", f"Generated: {generation_date}"])
-    writer.writerow([])
-    
-    writer.writerow(["Code", "Name", "Balance"])
+    for entry_date, reference, description, debit, credit in _general_ledger_lines(entry_lines):
+        yield [
+            str(entry_date),
+            reference or "-",
+            description or "-",
+            debit or 0,
+            credit or 0,
+        ]
+
+
+def _grand_livre_header(organization, fiscal_year, period, generation_date):
+    header = [["Grand Livre / General Ledger - All Accounts"], [f"Organization: {organization.name}"]]
+    if fiscal_year:
+        header.append([f"Fiscal Year: {fiscal_year.name}"])
+    if period:
+        header.append([f"Period: {period.name}"])
+    header.append([f"Generated: {generation_date}"])
+    return header
+
+
+GRAND_LIVRE_HEADERS = ["Date", "Entry", "Journal", "Reference", "Description", "Debit", "Credit", "Balance"]
+
+
+def csv_rows_grand_livre(rows, organization, generation_date, fiscal_year=None, period=None):
+    """Yield the CSV rows of the whole-ledger export from the ``ledger.grand_livre`` stream."""
+    yield from _grand_livre_header(organization, fiscal_year, period, generation_date)
+    for row in rows:
+        kind = row[0]
+        if kind == 'account':
+            _kind, code, name, opening = row
+            yield []
+            yield [f"Account: {code} - {name}"]
+            yield GRAND_LIVRE_HEADERS
+            yield ["", "", "", "", "Opening balance", "", "", opening]
+        elif kind == 'line':
+            _kind, entry_date, entry_number, journal_code, reference, description, debit, credit, balance = row
+            yield [str(entry_date), entry_number, journal_code, reference or "-", description or "-", debit, credit, balance]
+        else:
+            _kind, code, total_debit, total_credit, closing = row
+            yield ["", "", "", "", f"Total {code}", total_debit, total_credit, closing]
+
+
+def write_excel_grand_livre(rows, organization, generation_date, fiscal_year=None, period=None):
+    """Write the whole-ledger export with a write-only worksheet; returns a spooled file."""
+    from openpyxl.styles import Font
+
+    wb, ws = _write_only_sheet("Grand Livre")
+    for col in "ABCDFGH":
+        ws.column_dimensions[col].width = 15
+    ws.column_dimensions['E'].width = 40
+    bold = Font(bold=True)
+
+    ws.append([_styled(ws, "Grand Livre / General Ledger - All Accounts", font=Font(bold=True, size=14))])
+    for line in _grand_livre_header(organization, fiscal_year, period, generation_date)[1:]:
+        ws.append(line)
+
+    for row in rows:
+        kind = row[0]
+        if kind == 'account':
+            _kind, code, name, opening = row
+            ws.append([])
+            ws.append([_styled(ws, f"{code} - {name}", font=bold)])
+            ws.append([_styled(ws, header, font=bold) for header in GRAND_LIVRE_HEADERS])
+            ws.append(["", "", "", "", "Opening balance", None, None, float(opening)])
+        elif kind == 'line':
+            _kind, entry_date, entry_number, journal_code, reference, description, debit, credit, balance = row
+            ws.append([
+                str(entry_date), entry_number, journal_code, reference or "-", description or "-",
+                float(debit), float(credit), float(balance),
+            ])
+        else:
+            _kind, code, total_debit, total_credit, closing = row
+            ws.append([
+                "", "", "", "", _styled(ws, f"Total {code}", font=bold),
+                _styled(ws, float(total_debit), font=bold),
+                _styled(ws, float(total_credit), font=bold),
+                _styled(ws, float(closing), font=bold),
+            ])
+
+    return _spool_workbook(wb)
+
+
+def csv_rows_balance_sheet(assets, liabilities, equity, total_assets, total_liabilities, total_equity, as_of_date, generation_date):
+    """Yield the CSV rows of the balance sheet."""
+    yield ["Balance Sheet / Bilan"]
+    yield [f"As of: {as_of_date}", f"Generated: {generation_date}"]
+    yield []
+
+    yield ["Code", "Name", "Balance"]
     for row in assets:
-        writer.writerow([row['code'], row['name'], row['balance']])
-    writer.writerow(["", "TOTAL ASSETS", total_assets])
+        yield [row['code'], row['name'], row['balance']]
+    yield ["", "TOTAL ASSETS", total_assets]
     for row in liabilities:
-        writer.writerow([row['code'], row['name'], row['balance']])
-    writer.writerow(["", "TOTAL LIABILITIES", total_liabilities])
+        yield [row['code'], row['name'], row['balance']]
+    yield ["", "TOTAL LIABILITIES", total_liabilities]
     for row in equity:
-        writer.writerow([row['code'], row['name'], row['balance']])
-    writer.writerow(["", "TOTAL EQUITY", total_equity])
-    
-    return output.getvalue()
+        yield [row['code'], row['name'], row['balance']]
+    yield ["", "TOTAL EQUITY", total_equity]
 
 
-def export_csv_income_statement(revenues, expenses, total_revenue, total_expense, net_income, start_date, end_date, generation_date):
-    """Generate CSV for income statement."""
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["Income Statement / Compte de Resultat"])
-    writer.writerow([f"Period: {start_date} to {end_date}", f"Generated: {generation_date}"])
-    writer.writerow([])
-    
-    writer.writerow(["Code", "Name", "Amount"])
+def csv_rows_income_statement(revenues, expenses, total_revenue, total_expense, net_income, start_date, end_date, generation_date):
+    """Yield the CSV rows of the income statement."""
+    yield ["Income Statement / Compte de Resultat"]
+    yield [f"Period: {start_date} to {end_date}", f"Generated: {generation_date}"]
+    yield []
+
+    yield ["Code", "Name", "Amount"]
     for row in revenues:
-        writer.writerow([row['code'], row['name'], row['balance']])
-    writer.writerow(["", "TOTAL REVENUE", total_revenue])
+        yield [row['code'], row['name'], row['balance']]
+    yield ["", "TOTAL REVENUE", total_revenue]
     for row in expenses:
-        writer.writerow([row['code'], row['name'], row['balance']])
-    writer.writerow(["", "TOTAL EXPENSES", total_expense])
-    writer.writerow(["", "NET INCOME", net_income])
-    
-    return output.getvalue()
+        yield [row['code'], row['name'], row['balance']]
+    yield ["", "TOTAL EXPENSES", total_expense]
+    yield ["", "NET INCOME", net_income]
 
 
-def export_csv_trial_balance(report_data, grand_totals, fiscal_year, period, start_date, end_date, generation_date):
-    """Generate CSV for trial balance."""
-    output = StringIO()
-    writer = csv.writer(output)
-    
+def csv_rows_trial_balance(report_data, grand_totals, fiscal_year, period, start_date, end_date, generation_date):
+    """Yield the CSV rows of the trial balance."""
     period_str = period.name if period else (fiscal_year.name if fiscal_year else f"{start_date} - {end_date}")
-    writer.writerow(["Trial Balance / Balance de Verification"])
-    writer.writerow([f"Period: {period_str}", f"Generated: {generation_date}"])
-    writer.writerow([])
-    
-    headers = ["Code", "Name", "Opening Debit", "Opening Credit", "Period Debit", "Period Credit", "Closing Debit", "Closing Credit"]
-    writer.writerow(headers)
-    
+    yield ["Trial Balance / Balance de Verification"]
+    yield [f"Period: {period_str}", f"Generated: {generation_date}"]
+    yield []
+
+    yield TRIAL_BALANCE_HEADERS
+
     for row in report_data:
-        writer.writerow([
-            row['code'], row['name'],
+        yield [
+            *_trial_balance_account(row),
             row['opening_debit'], row['opening_credit'],
             row['period_debit'], row['period_credit'],
             row['closing_debit'], row['closing_credit'],
-        ])
-    
-    writer.writerow([
-        "", "TOTALS",
+        ]
+
+    yield [
+        "", "", "", "TOTALS",
         grand_totals['opening_debit'], grand_totals['opening_credit'],
         grand_totals['period_debit'], grand_totals['period_credit'],
         grand_totals['closing_debit'], grand_totals['closing_credit'],
-    ])
-    
-    return output.getvalue()
+    ]
 
 
-def export_csv_cash_flow(report_data, start_date, end_date, generation_date):
-    """Generate CSV for cash flow statement."""
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["Cash Flow Statement / Flux des Trésoreries"])
-    writer.writerow([f"Period: {start_date} to {end_date}", f"Generated: {generation_date}"])
-    writer.writerow([])
-    
-    writer.writerow(["Activity", "Section", "Amount"])
-    
-    def write_section(title, data):
-        writer.writerow([title, "Inflows", data['in']])
-        writer.writerow(["", "Outflows", -data['out']])
-        writer.writerow(["", f"Net Cash from {title}", data['net']])
-
-    write_section("Operating Activities", report_data['operating'])
-    write_section("Investing Activities", report_data['investing'])
-    write_section("Financing Activities", report_data['financing'])
-    
-    writer.writerow([])
-    writer.writerow(["", "NET INCREASE/DECREASE IN CASH", report_data['summary']['net_change']])
-    writer.writerow(["", "CASH AT BEGINNING OF PERIOD", report_data['summary']['beginning']])
-    writer.writerow(["", "CASH AT END OF PERIOD", report_data['summary']['ending']])
-    
-    return output.getvalue()
+def csv_rows_cash_flow(report_data, start_date, end_date, generation_date):
+    """Yield the CSV rows of the cash flow statement."""
+    yield ["Cash Flow Statement / Flux des Trésoreries"]
+    yield [f"Period: {start_date} to {end_date}", f"Generated: {generation_date}"]
+    yield []
+
+    yield ["Activity", "Section", "Amount"]
+
+    for title, key in (("Operating Activities", 'operating'), ("Investing Activities", 'investing'), ("Financing Activities", 'financing')):
+        data = report_data[key]
+        yield [title, "Inflows", data['in']]
+        yield ["", "Outflows", -data['out']]
+        yield ["", f"Net Cash from {title}", data['net']]
+
+    yield []
+    yield ["", "NET INCREASE/DECREASE IN CASH", report_data['summary']['net_change']]
+    yield ["", "CASH AT BEGINNING OF PERIOD", report_data['summary']['beginning']]
+    yield ["", "CASH AT END OF PERIOD", report_data['summary']['ending']]
+
+
+BUDGET_EXECUTION_HEADERS = [
+    "Account", "Name", "Period", "Allocated", "Actual", "Committed", "Variance", "Funds Available", "Variance %",
+]
+
+
+def _budget_execution_rows(execution):
+    """The line and total rows of a budget execution (see ``budget.execution``)."""
+    for line in execution['lines']:
+        yield [
+            line.account.code, line.account.name, line.period.name if line.period else "",
+            line.allocated_amount, line.actual_spent, line.committed_amount,
+            line.variance, line.funds_available, round(Decimal(line.variance_percentage), 2),
+        ]
+    totals = execution['totals']
+    yield [
+        "", "", "", "TOTALS", "",
+        totals['allocated'], totals['actual'], totals['committed'], totals['variance'], totals['funds_available'], "",
+    ]
+
+
+def csv_rows_budget_execution(budget, execution, generation_date):
+    """Yield the CSV rows of the budget vs actual report of ``budget``."""
+    yield ["Budget vs Actual / Exécution budgétaire"]
+    yield [f"Budget: {budget.name}", f"Fiscal Year: {budget.fiscal_year.name}", f"Generated: {generation_date}"]
+    yield []
+    yield BUDGET_EXECUTION_HEADERS
+    yield from _budget_execution_rows(execution)
+
+
+def write_excel_budget_execution(budget, execution, generation_date):
+    """Write the budget vs actual report with a write-only worksheet; returns a spooled file."""
+    from openpyxl.styles import Font
+
+    wb, ws = _write_only_sheet("Budget vs Actual")
+    ws.column_dimensions['B'].width = 30
+    ws.append([_styled(ws, "Budget vs Actual / Exécution budgétaire", font=Font(bold=True, size=14))])
+    ws.append([f"Budget: {budget.name}", f"Fiscal Year: {budget.fiscal_year.name}", f"Generated: {generation_date}"])
+    ws.append([])
+    ws.append([_styled(ws, header, font=Font(bold=True)) for header in BUDGET_EXECUTION_HEADERS])
+    for row in _budget_execution_rows(execution):
+        ws.append([float(value) if isinstance(value, Decimal) else value for value in row])
+    return _spool_workbook(wb)
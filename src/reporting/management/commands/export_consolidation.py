@@ -0,0 +1,57 @@
+"""
+Management command to export the consolidated statements of several
+organizations, aggregating larger groups in parallel (see
+``reporting.consolidation.collect_balances``).
+
+Usage:
+    python manage.py export_consolidation [--organizations ID,ID,...]
+        [--start-date YYYY-MM-DD] [--end-date YYYY-MM-DD] [--level N]
+        [--format pdf|xlsx|csv] [--output PATH]
+
+Options:
+    --organizations IDS  Comma-separated ids (default: all active ones)
+    --start-date DATE    Start of the income statement (default: January 1st)
+    --end-date DATE      Balance sheet date, end of the income statement
+                         (default: today)
+    --level N            Match accounts on the first N digits of their code
+    --format FORMAT      csv (default), xlsx or pdf
+    --output PATH        File to write
+                         (default: consolidated_<start>_<end>.<format>)
+"""
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reporting import reports
+from reporting.consolidation import consolidation
+
+
+class Command(BaseCommand):
+    help = "Export the consolidated balance sheet and income statement of several organizations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organizations', help='Comma-separated organization IDs')
+        parser.add_argument('--start-date', help='Start date (YYYY-MM-DD)')
+        parser.add_argument('--end-date', help='End date (YYYY-MM-DD)')
+        parser.add_argument('--level', type=int, help='Account code digits to match on')
+        parser.add_argument('--format', choices=['csv', 'xlsx', 'pdf'], default='csv', help='Export format')
+        parser.add_argument('--output', help='Output file path')
+
+    def handle(self, *args, **options):
+        params = {
+            'organizations': options['organizations'],
+            'start_date': options['start_date'],
+            'end_date': options['end_date'],
+            'level': options['level'],
+        }
+        data = consolidation(params, parallel=True)
+        if not reports.is_exportable(reports.CONSOLIDATED, data):
+            raise CommandError("No active organization matches --organizations.")
+
+        output = options['output'] or f"consolidated_{data['start_date']}_{data['end_date']}.{options['format']}"
+        content = reports.export_file(reports.CONSOLIDATED, options['format'], data, timezone.now().date())
+        with open(output, 'wb') as destination:
+            shutil.copyfileobj(content, destination)
+        content.close()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}."))
@@ -0,0 +1,74 @@
+"""
+Management command to export the whole general ledger (grand livre) of an
+organization, every account in one streamed pass.
+
+Usage:
+    python manage.py export_grand_livre --organization ID (--fiscal-year ID | --period ID)
+        [--format csv|xlsx] [--output PATH] [--queue]
+
+Options:
+    --organization ID    Organization to export
+    --fiscal-year ID     Export a whole fiscal year
+    --period ID          Export a single accounting period
+    --format FORMAT      csv (default) or xlsx
+    --output PATH        File to write (default: grand_livre_<range>.<format>)
+    --queue              Hand the export to a Celery worker as a GeneratedReport instead
+"""
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from organization.models import Organization
+from reporting import reports
+from reporting.models import GeneratedReport, ReportTemplate
+
+
+class Command(BaseCommand):
+    help = "Export the general ledger of every account of an organization for a fiscal year or period."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, required=True, help='Organization ID')
+        parser.add_argument('--fiscal-year', type=int, help='Fiscal year ID')
+        parser.add_argument('--period', type=int, help='Accounting period ID')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', help='Export format')
+        parser.add_argument('--output', help='Output file path')
+        parser.add_argument('--queue', action='store_true', help='Generate in a Celery worker')
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.filter(pk=options['organization']).first()
+        if organization is None:
+            raise CommandError(f"Organization {options['organization']} does not exist.")
+
+        params = {}
+        if options['period']:
+            params['period'] = options['period']
+        elif options['fiscal_year']:
+            params['fiscal_year'] = options['fiscal_year']
+        else:
+            raise CommandError("Give --fiscal-year or --period.")
+
+        if options['queue']:
+            from reporting.tasks import generate_report
+            with transaction.atomic():
+                report = GeneratedReport.objects.create(
+                    organization=organization,
+                    template=ReportTemplate.standard(reports.GRAND_LIVRE),
+                    parameters_json=params,
+                    format=options['format'],
+                )
+                transaction.on_commit(lambda: generate_report.delay(report.pk))
+            self.stdout.write(self.style.SUCCESS(f"Queued grand livre export {report.uuid}."))
+            return
+
+        data = reports.grand_livre(organization, params)
+        if not reports.is_exportable(reports.GRAND_LIVRE, data):
+            raise CommandError("The fiscal year or period does not exist for this organization.")
+
+        output = options['output'] or f"grand_livre_{data['start_date']}_{data['end_date']}.{options['format']}"
+        content = reports.export_file(reports.GRAND_LIVRE, options['format'], data, timezone.now().date())
+        with open(output, 'wb') as destination:
+            shutil.copyfileobj(content, destination)
+        content.close()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}."))
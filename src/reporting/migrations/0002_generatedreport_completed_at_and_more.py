@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:33
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedreport',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Completed At'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='error_message',
+            field=models.TextField(blank=True, verbose_name='Error Message'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='format',
+            field=models.CharField(choices=[('pdf', 'PDF'), ('xlsx', 'Excel'), ('csv', 'CSV')], default='pdf', max_length=4, verbose_name='Format'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=10, verbose_name='Status'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='uuid',
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='generatedreport',
+            name='end_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Report End Date'),
+        ),
+        migrations.AlterField(
+            model_name='reporttemplate',
+            name='type',
+            field=models.CharField(choices=[('GENERAL_LEDGER', 'General Ledger'), ('TRIAL_BALANCE', 'Trial Balance'), ('BALANCE_SHEET', 'Balance Sheet'), ('INCOME_STATEMENT', 'Income Statement'), ('CASH_FLOW', 'Cash Flow Statement'), ('BUDGET_VS_ACTUAL', 'Budget vs Actual'), ('CUSTOM', 'Custom Report')], max_length=20, verbose_name='Report Type'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporting', '0002_generatedreport_completed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reporttemplate',
+            name='type',
+            field=models.CharField(choices=[('GENERAL_LEDGER', 'General Ledger'), ('GRAND_LIVRE', 'General Ledger (All Accounts)'), ('TRIAL_BALANCE', 'Trial Balance'), ('BALANCE_SHEET', 'Balance Sheet'), ('INCOME_STATEMENT', 'Income Statement'), ('CASH_FLOW', 'Cash Flow Statement'), ('BUDGET_VS_ACTUAL', 'Budget vs Actual'), ('CUSTOM', 'Custom Report')], max_length=20, verbose_name='Report Type'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 # /home/ubuntu/accounting_project/src/reporting/models.py
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
@@ -8,6 +10,9 @@ from django.utils.translation import gettext_lazy as _
 class ReportTemplate(models.Model):
     """Defines templates for standard and custom reports."""
     REPORT_TYPE_CHOICES = [
+        ("GENERAL_LEDGER", _("General Ledger")),
+        ("GRAND_LIVRE", _("General Ledger (All Accounts)")),
+        ("TRIAL_BALANCE", _("Trial Balance")),
         ("BALANCE_SHEET", _("Balance Sheet")),
         ("INCOME_STATEMENT", _("Income Statement")),
         ("CASH_FLOW", _("Cash Flow Statement")),
@@ -29,16 +34,41 @@ class ReportTemplate(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def standard(cls, report_type):
+        """Return the standard template of ``report_type``, creating it on first use."""
+        template, _created = cls.objects.get_or_create(
+            type=report_type, is_standard=True,
+            defaults={'name': dict(cls.REPORT_TYPE_CHOICES)[report_type]},
+        )
+        return template
+
 class GeneratedReport(models.Model):
     """Stores instances of generated reports."""
+    STATUS_CHOICES = [
+        ("PENDING", _("Pending")),
+        ("RUNNING", _("Running")),
+        ("COMPLETED", _("Completed")),
+        ("FAILED", _("Failed")),
+    ]
+    FORMAT_CHOICES = [
+        ("pdf", "PDF"),
+        ("xlsx", "Excel"),
+        ("csv", "CSV"),
+    ]
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
     organization = models.ForeignKey("organization.Organization", on_delete=models.CASCADE, related_name="generated_reports")
     template = models.ForeignKey(ReportTemplate, on_delete=models.PROTECT, related_name="generated_reports")
     generation_date = models.DateTimeField(_("Generation Datetime"), auto_now_add=True)
     start_date = models.DateField(_("Report Start Date"), null=True, blank=True)
-    end_date = models.DateField(_("Report End Date"))
+    end_date = models.DateField(_("Report End Date"), null=True, blank=True)
     parameters_json = models.JSONField(_("Parameters Used (JSON)"), blank=True, null=True)
     generated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="generated_reports")
     file = models.FileField(_("Report File"), upload_to="reports/%Y/%m/", null=True, blank=True) # Store PDF/XLS
+    format = models.CharField(_("Format"), max_length=4, choices=FORMAT_CHOICES, default="pdf")
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default="PENDING", db_index=True)
+    error_message = models.TextField(_("Error Message"), blank=True)
+    completed_at = models.DateTimeField(_("Completed At"), null=True, blank=True)
 
     class Meta:
         verbose_name = _("Generated Report")
@@ -49,3 +79,37 @@ class GeneratedReport(models.Model):
     def __str__(self):
         return f"{self.template.name} generated on {self.generation_date}"
 
+    @property
+    def is_ready(self):
+        return self.status == "COMPLETED" and bool(self.file)
+
+    def generate(self):
+        """
+        Compute the report from ``parameters_json`` and store the export in
+        ``file``. Failures are recorded on the instance rather than raised so
+        that the requester can see them when polling.
+        """
+        from django.utils import timezone
+        from . import reports
+
+        self.status = "RUNNING"
+        self.save(update_fields=["status"])
+        try:
+            data = reports.cached_build(self.template.type, self.organization, self.parameters_json or {})
+            if not reports.is_exportable(self.template.type, data):
+                raise ValueError(_("The report parameters do not select anything to export."))
+            content = reports.export_file(self.template.type, self.format, data, timezone.now().date())
+            filename = f"{reports.FILENAMES[self.template.type]}_{self.uuid.hex[:8]}.{self.format}"
+            self.start_date = data.get('start_date')
+            self.end_date = data.get('end_date')
+            self.file.save(filename, content, save=False)
+        except Exception as exc:
+            self.status = "FAILED"
+            self.error_message = str(exc)
+        else:
+            self.status = "COMPLETED"
+            self.error_message = ""
+        self.completed_at = timezone.now()
+        self.save()
+        return self.status == "COMPLETED"
+
@@ -0,0 +1,611 @@
+"""
+Report builders shared by the reporting views and background tasks.
+
+Each builder resolves the report parameters (the same keys the views accept
+in the query string: ``account``, ``fiscal_year``, ``period``, ``date``) for
+an organization and returns the data needed to render or export the report.
+The balance sheet and income statement also accept ``periods``,
+``fiscal_years`` and (balance sheet only) ``dates`` lists, which switch them
+to a comparative, one column per entry, layout.
+``export_content`` and ``export_file`` turn that data into PDF, XLSX or CSV.
+
+``cached_build`` memoizes the aggregated reports in the cache, keyed by the
+organization's ledger version, so that switching between the HTML page and
+its exports does not recompute them while nothing has been posted.
+"""
+import hashlib
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from accounting import ledger
+from accounting.models import ChartOfAccounts, EntryLine, FiscalYear, AccountingPeriod
+
+from .export_utils import (
+    _encode_csv,
+    export_pdf_general_ledger,
+    write_excel_general_ledger,
+    csv_rows_general_ledger,
+    export_pdf_balance_sheet,
+    export_excel_balance_sheet,
+    csv_rows_balance_sheet,
+    export_pdf_income_statement,
+    export_excel_income_statement,
+    csv_rows_income_statement,
+    export_pdf_trial_balance,
+    write_excel_trial_balance,
+    csv_rows_trial_balance,
+    export_pdf_cash_flow,
+    export_excel_cash_flow,
+    csv_rows_cash_flow,
+    csv_rows_grand_livre,
+    write_excel_grand_livre,
+    export_pdf_comparative_statement,
+    write_excel_comparative_statement,
+    csv_rows_comparative_statement,
+)
+
+GENERAL_LEDGER = 'GENERAL_LEDGER'
+BALANCE_SHEET = 'BALANCE_SHEET'
+INCOME_STATEMENT = 'INCOME_STATEMENT'
+TRIAL_BALANCE = 'TRIAL_BALANCE'
+CASH_FLOW = 'CASH_FLOW'
+GRAND_LIVRE = 'GRAND_LIVRE'
+CONSOLIDATED = 'CONSOLIDATED'
+
+# ``account`` value selecting the whole-ledger export on the general ledger page
+ALL_ACCOUNTS = 'all'
+
+EXPORT_FORMATS = ('pdf', 'xlsx', 'csv')
+
+FILENAMES = {
+    GENERAL_LEDGER: 'general_ledger',
+    BALANCE_SHEET: 'balance_sheet',
+    INCOME_STATEMENT: 'income_statement',
+    TRIAL_BALANCE: 'trial_balance',
+    CASH_FLOW: 'cash_flow',
+    GRAND_LIVRE: 'grand_livre',
+    CONSOLIDATED: 'consolidated',
+}
+
+
+def general_ledger(organization, params):
+    """Posted lines of the selected account, optionally limited to a fiscal year or period."""
+    fiscal_year_id = params.get('fiscal_year')
+    period_id = params.get('period')
+    account_id = params.get('account')
+    fiscal_year = FiscalYear.objects.filter(pk=fiscal_year_id, organization=organization).first() if fiscal_year_id else None
+    period = AccountingPeriod.objects.filter(pk=period_id, fiscal_year__organization=organization).first() if period_id else None
+    periods = AccountingPeriod.objects.filter(fiscal_year=fiscal_year).order_by('start_date') if fiscal_year else []
+    selected_account = None
+    entry_lines = []
+    if account_id and account_id != ALL_ACCOUNTS:
+        selected_account = ChartOfAccounts.objects.filter(pk=account_id, organization=organization).first()
+        if selected_account:
+            qs = EntryLine.objects.filter(account=selected_account, journal_entry__posted=True)
+            if period:
+                qs = qs.filter(journal_entry__date__gte=period.start_date, journal_entry__date__lte=period.end_date)
+            elif fiscal_year:
+                qs = qs.filter(journal_entry__date__gte=fiscal_year.start_date, journal_entry__date__lte=fiscal_year.end_date)
+            entry_lines = qs.select_related('journal_entry').order_by('journal_entry__date', 'id')
+    date_range = period or fiscal_year
+    return {
+        'selected_account': selected_account,
+        'fiscal_year': fiscal_year,
+        'period': period,
+        'periods': periods,
+        'entry_lines': entry_lines,
+        'start_date': date_range.start_date if date_range else None,
+        'end_date': date_range.end_date if date_range else None,
+    }
+
+
+# Account types whose balance is naturally on the debit side
+DEBIT_NATURE = ('ASSET', 'EXPENSE')
+
+
+def statement_section(accounts, account_type):
+    """
+    Rows of one financial statement section from rolled-up ``accounts``.
+
+    Rows come in hierarchy order with ``depth``, ``path`` and ``is_subtotal``
+    (accounts with sub-accounts show their subtree's balance). Zero balances
+    are left out. Returns ``(rows, total)``, the total summing top-level rows.
+    """
+    rows = []
+    total = Decimal("0.00")
+    section = [acc for acc in accounts if acc.account_type == account_type]
+    for acc, depth, path, has_children in ledger.hierarchy_order(section):
+        if account_type in DEBIT_NATURE:
+            balance = acc.period_debit - acc.period_credit
+        else:
+            balance = acc.period_credit - acc.period_debit
+        if balance == 0:
+            continue
+        rows.append({
+            'code': acc.code, 'name': acc.name, 'balance': balance,
+            'depth': depth, 'path': path, 'is_subtotal': has_children,
+        })
+        if depth == 0:
+            total += balance
+    return rows, total
+
+
+COMPARATIVE_PARAMETERS = ('periods', 'fiscal_years', 'dates')
+
+# Widest comparison a statement accepts (e.g. 24 months)
+COMPARATIVE_MAX_COLUMNS = 24
+
+
+def _param_list(params, key):
+    """Values of a list parameter, given repeated (``?periods=1&periods=2``) or comma separated."""
+    values = params.getlist(key) if hasattr(params, 'getlist') else params.get(key) or []
+    if isinstance(values, (str, int)):
+        values = [values]
+    return [part.strip() for value in values for part in str(value).split(',') if part.strip()]
+
+
+def comparison_columns(organization, params, as_of):
+    """
+    Resolve the ``fiscal_years``, ``periods`` and ``dates`` parameters into
+    ``(label, start_date, end_date)`` columns. With ``as_of`` (balance sheet)
+    every column is a balance at its end date and ``start_date`` is None.
+    Malformed ids and dates are skipped.
+    """
+    columns = []
+    fiscal_year_ids = [value for value in _param_list(params, 'fiscal_years') if value.isdigit()]
+    for fiscal_year in FiscalYear.objects.filter(organization=organization, pk__in=fiscal_year_ids).order_by('start_date'):
+        columns.append((fiscal_year.name, None if as_of else fiscal_year.start_date, fiscal_year.end_date))
+    period_ids = [value for value in _param_list(params, 'periods') if value.isdigit()]
+    for period in AccountingPeriod.objects.filter(
+        fiscal_year__organization=organization, pk__in=period_ids
+    ).order_by('start_date'):
+        columns.append((period.name, None if as_of else period.start_date, period.end_date))
+    if as_of:
+        for value in _param_list(params, 'dates'):
+            try:
+                as_of_date = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                continue
+            columns.append((as_of_date.isoformat(), None, as_of_date))
+    return columns[:COMPARATIVE_MAX_COLUMNS]
+
+
+def comparative_statement(organization, title, columns, sections):
+    """
+    Pivot a statement into an account x column matrix from one grouped query.
+
+    ``sections`` lists ``(title, account_type)`` pairs. Returns a dict with
+    the ``title``, column ``labels`` as ``columns`` and, per section, its
+    hierarchy-ordered ``rows`` (each with a ``balances`` list) and
+    ``totals``. Callers add ``summary`` lines.
+    """
+    ranges = [(start_date, end_date) for _label, start_date, end_date in columns]
+    account_types = [account_type for _title, account_type in sections]
+    accounts = ledger.comparative_movements(organization, ranges).filter(account_type__in=account_types)
+    if set(account_types) & set(ledger.RESULT_ACCOUNT_TYPES):
+        accounts = ledger.without_carry_forward(
+            organization, accounts, ranges, [(f'debit_{index}', f'credit_{index}') for index in range(len(ranges))],
+        )
+    accounts = list(accounts)
+    result = {'title': title, 'columns': [label for label, _start, _end in columns], 'sections': [], 'summary': []}
+    for section_title, account_type in sections:
+        sign = 1 if account_type in DEBIT_NATURE else -1
+        rows = []
+        totals = [Decimal("0.00")] * len(ranges)
+        section = [acc for acc in accounts if acc.account_type == account_type]
+        for acc, depth, path, has_children in ledger.hierarchy_order(section):
+            balances = [
+                sign * (getattr(acc, f'debit_{index}') - getattr(acc, f'credit_{index}'))
+                for index in range(len(ranges))
+            ]
+            if not any(balances):
+                continue
+            rows.append({
+                'code': acc.code, 'name': acc.name, 'balances': balances,
+                'depth': depth, 'path': path, 'is_subtotal': has_children,
+            })
+            if depth == 0:
+                totals = [total + balance for total, balance in zip(totals, balances)]
+        result['sections'].append({'title': section_title, 'rows': rows, 'totals': totals})
+    return result
+
+
+def balance_sheet(organization, params):
+    """
+    Asset, liability and equity balances as of ``date`` (default: today), or
+    side by side at the end of each requested fiscal year, period or date.
+    """
+    columns = comparison_columns(organization, params, as_of=True)
+    if columns:
+        comparison = comparative_statement(organization, "Comparative Balance Sheet / Bilan comparatif", columns, [
+            ("Assets", 'ASSET'), ("Liabilities", 'LIABILITY'), ("Equity", 'EQUITY'),
+        ])
+        _assets, liabilities, equity = comparison['sections']
+        comparison['summary'] = [("Total Liabilities + Equity", [
+            liability + own_funds for liability, own_funds in zip(liabilities['totals'], equity['totals'])
+        ])]
+        last_date = max(end_date for _label, _start, end_date in columns)
+        return {
+            'as_of_date': last_date,
+            'assets': [], 'liabilities': [], 'equity': [],
+            'total_assets': Decimal("0.00"), 'total_liabilities': Decimal("0.00"), 'total_equity': Decimal("0.00"),
+            'current_fiscal_year': None,
+            'comparison': comparison,
+            'start_date': None,
+            'end_date': last_date,
+        }
+
+    as_of_date = params.get('date') or timezone.now().date()
+    if isinstance(as_of_date, str):
+        as_of_date = datetime.strptime(as_of_date, '%Y-%m-%d').date()
+
+    # Aggregate posted amounts up to the as-of date, rolled up the account hierarchy
+    accounts = list(ledger.account_movements(organization, None, as_of_date, rollup=True).filter(
+        account_type__in=['ASSET', 'LIABILITY', 'EQUITY']
+    ))
+
+    asset_accounts, total_assets = statement_section(accounts, 'ASSET')
+    liability_accounts, total_liabilities = statement_section(accounts, 'LIABILITY')
+    equity_accounts, total_equity = statement_section(accounts, 'EQUITY')
+
+    current_fiscal_year = FiscalYear.objects.filter(
+        organization=organization,
+        start_date__lte=as_of_date,
+        end_date__gte=as_of_date
+    ).first()
+
+    return {
+        'as_of_date': as_of_date,
+        'assets': asset_accounts,
+        'liabilities': liability_accounts,
+        'equity': equity_accounts,
+        'total_assets': total_assets,
+        'total_liabilities': total_liabilities,
+        'total_equity': total_equity,
+        'current_fiscal_year': current_fiscal_year,
+        'comparison': None,
+        'start_date': None,
+        'end_date': as_of_date,
+    }
+
+
+def income_statement(organization, params):
+    """
+    Revenue and expense balances for a period, a fiscal year or the current
+    fiscal year, or side by side for each requested fiscal year or period.
+    """
+    columns = comparison_columns(organization, params, as_of=False)
+    if columns:
+        comparison = comparative_statement(organization, "Comparative Income Statement / Compte de résultat comparatif", columns, [
+            ("Revenue", 'REVENUE'), ("Expenses", 'EXPENSE'),
+        ])
+        revenues, expenses = comparison['sections']
+        comparison['summary'] = [("Net Income", [
+            revenue - expense for revenue, expense in zip(revenues['totals'], expenses['totals'])
+        ])]
+        return {
+            'fiscal_year': None,
+            'period': None,
+            'start_date': min(start_date for _label, start_date, _end in columns),
+            'end_date': max(end_date for _label, _start, end_date in columns),
+            'revenues': [], 'expenses': [],
+            'total_revenue': Decimal("0.00"), 'total_expense': Decimal("0.00"), 'net_income': Decimal("0.00"),
+            'comparison': comparison,
+        }
+
+    fiscal_year_id = params.get('fiscal_year')
+    period_id = params.get('period')
+
+    start_date = None
+    end_date = None
+    fiscal_year = None
+    period = None
+
+    if period_id:
+        period = AccountingPeriod.objects.filter(pk=period_id, fiscal_year__organization=organization).first()
+        if period:
+            start_date = period.start_date
+            end_date = period.end_date
+    elif fiscal_year_id:
+        fiscal_year = FiscalYear.objects.filter(pk=fiscal_year_id, organization=organization).first()
+        if fiscal_year:
+            start_date = fiscal_year.start_date
+            end_date = fiscal_year.end_date
+    else:
+        # Default to current fiscal year
+        fiscal_year = FiscalYear.objects.filter(
+            organization=organization,
+            start_date__lte=timezone.now().date(),
+            end_date__gte=timezone.now().date()
+        ).first()
+        if fiscal_year:
+            start_date = fiscal_year.start_date
+            end_date = fiscal_year.end_date
+
+    revenue_accounts = []
+    expense_accounts = []
+    total_revenue = Decimal("0.00")
+    total_expenses = Decimal("0.00")
+
+    if start_date and end_date:
+        accounts = ledger.without_carry_forward(
+            organization,
+            ledger.account_movements(organization, start_date, end_date, rollup=True).filter(
+                account_type__in=['REVENUE', 'EXPENSE']
+            ),
+            [(start_date, end_date)], [('period_debit', 'period_credit')],
+        )
+        revenue_accounts, total_revenue = statement_section(accounts, 'REVENUE')
+        expense_accounts, total_expenses = statement_section(accounts, 'EXPENSE')
+
+    return {
+        'fiscal_year': fiscal_year,
+        'period': period,
+        'start_date': start_date,
+        'end_date': end_date,
+        'revenues': revenue_accounts,
+        'expenses': expense_accounts,
+        'total_revenue': total_revenue,
+        'total_expense': total_expenses,
+        'net_income': total_revenue - total_expenses,
+        'comparison': None,
+    }
+
+
+def trial_balance(organization, params):
+    """Opening, period and closing balances of every account for a period or fiscal year."""
+    fiscal_year_id = params.get('fiscal_year')
+    period_id = params.get('period')
+
+    fiscal_year = None
+    period = None
+    start_date = None
+    end_date = None
+
+    if period_id:
+        period = AccountingPeriod.objects.filter(pk=period_id, fiscal_year__organization=organization).first()
+        if period:
+            fiscal_year = period.fiscal_year
+            start_date = period.start_date
+            end_date = period.end_date
+    elif fiscal_year_id:
+        fiscal_year = FiscalYear.objects.filter(pk=fiscal_year_id, organization=organization).first()
+        if fiscal_year:
+            start_date = fiscal_year.start_date
+            end_date = fiscal_year.end_date
+
+    report_data = []
+    grand_totals = dict.fromkeys(ledger.TRIAL_BALANCE_COLUMNS, Decimal("0.00"))
+    if start_date and end_date:
+        report_data, grand_totals = ledger.trial_balance(organization, start_date, end_date)
+
+    return {
+        'fiscal_year': fiscal_year,
+        'period': period,
+        'start_date': start_date,
+        'end_date': end_date,
+        'report_data': report_data,
+        'grand_totals': grand_totals,
+    }
+
+
+def cash_flow(organization, params):
+    """Cash flow statement for a period, a fiscal year or the current month."""
+    fiscal_year_id = params.get('fiscal_year')
+    period_id = params.get('period')
+
+    fiscal_year = None
+    period = None
+
+    if fiscal_year_id:
+        fiscal_year = FiscalYear.objects.filter(organization=organization, pk=fiscal_year_id).first()
+    if period_id:
+        period = AccountingPeriod.objects.filter(fiscal_year__organization=organization, pk=period_id).first()
+
+    if period:
+        start_date, end_date = period.start_date, period.end_date
+    elif fiscal_year:
+        start_date, end_date = fiscal_year.start_date, fiscal_year.end_date
+    else:
+        # Default to current month
+        today = timezone.now().date()
+        start_date = today.replace(day=1)
+        end_date = today
+
+    # Cash Flow Logic (Direct Method simplified)
+    # 1. Operating: Receipts from customers, Payments to suppliers/employees
+    # 2. Investing: Purchase/Sale of assets
+    # 3. Financing: Loans, Equity changes
+    return {
+        'fiscal_year': fiscal_year,
+        'period': period,
+        'start_date': start_date,
+        'end_date': end_date,
+        'report_data': ledger.cash_flow(organization, start_date, end_date),
+    }
+
+
+def grand_livre(organization, params):
+    """Every account's lines for a period or fiscal year, streamed from ``ledger.grand_livre``."""
+    fiscal_year_id = params.get('fiscal_year')
+    period_id = params.get('period')
+    fiscal_year = FiscalYear.objects.filter(pk=fiscal_year_id, organization=organization).first() if fiscal_year_id else None
+    period = AccountingPeriod.objects.filter(pk=period_id, fiscal_year__organization=organization).first() if period_id else None
+    date_range = period or fiscal_year
+    start_date = date_range.start_date if date_range else None
+    end_date = date_range.end_date if date_range else None
+    return {
+        'organization': organization,
+        'fiscal_year': fiscal_year,
+        'period': period,
+        'start_date': start_date,
+        'end_date': end_date,
+        # Lazy: nothing is queried until the export iterates it
+        'rows': ledger.grand_livre(organization, start_date, end_date) if date_range else iter(()),
+    }
+
+
+BUILDERS = {
+    GENERAL_LEDGER: general_ledger,
+    BALANCE_SHEET: balance_sheet,
+    INCOME_STATEMENT: income_statement,
+    TRIAL_BALANCE: trial_balance,
+    CASH_FLOW: cash_flow,
+    GRAND_LIVRE: grand_livre,
+}
+
+
+def build(report_type, organization, params):
+    """Compute the data of ``report_type`` for ``organization``."""
+    return BUILDERS[report_type](organization, params)
+
+
+# Reports whose data is small and aggregated enough to cache. The general
+# ledger is a listing of lines and is streamed instead.
+CACHED_REPORTS = (BALANCE_SHEET, INCOME_STATEMENT, TRIAL_BALANCE, CASH_FLOW)
+
+REPORT_PARAMETERS = ('account', 'fiscal_year', 'period', 'date')
+
+CACHE_STATS_KEY = 'report-cache:{outcome}:{report_type}'
+
+
+def _cache_key(report_type, organization, params):
+    # Defaults (current fiscal year, current month, today) depend on the day
+    parameters = [('today', timezone.now().date().isoformat())]
+    parameters += [(key, str(params.get(key) or '')) for key in REPORT_PARAMETERS]
+    parameters += [(key, _param_list(params, key)) for key in COMPARATIVE_PARAMETERS]
+    digest = hashlib.md5(repr(parameters).encode('utf-8')).hexdigest()
+    version = ledger.ledger_version(organization.pk)
+    return f"report:{organization.pk}:{report_type}:{version}:{digest}"
+
+
+def _count(outcome, report_type):
+    key = CACHE_STATS_KEY.format(outcome=outcome, report_type=report_type)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def cached_build(report_type, organization, params):
+    """
+    Same as ``build`` but reuses a result computed for the same organization,
+    report, parameters and ledger version. The export format is not part of
+    the key, so every rendering of a report shares one computation.
+    """
+    if report_type not in CACHED_REPORTS:
+        return build(report_type, organization, params)
+    key = _cache_key(report_type, organization, params)
+    data = cache.get(key)
+    if data is None:
+        _count('misses', report_type)
+        data = build(report_type, organization, params)
+        cache.set(key, data, settings.REPORT_CACHE_TIMEOUT)
+    else:
+        _count('hits', report_type)
+    return data
+
+
+def cache_stats():
+    """Return the report cache hit/miss counters per report type."""
+    keys = {
+        (outcome, report_type): CACHE_STATS_KEY.format(outcome=outcome, report_type=report_type)
+        for report_type in CACHED_REPORTS for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(list(keys.values()))
+    return {
+        report_type: {outcome: values.get(keys[outcome, report_type], 0) for outcome in ('hits', 'misses')}
+        for report_type in CACHED_REPORTS
+    }
+
+
+def is_exportable(report_type, data):
+    """Whether ``data`` holds enough for an export (an account for the GL, a date range for IS/TB)."""
+    if report_type == GENERAL_LEDGER:
+        return data['selected_account'] is not None
+    if report_type in (INCOME_STATEMENT, TRIAL_BALANCE, GRAND_LIVRE):
+        return bool(data['start_date'] and data['end_date'])
+    if report_type == CONSOLIDATED:
+        return data['comparison'] is not None
+    return True
+
+
+def _export_args(report_type, data, generation_date):
+    if report_type == GENERAL_LEDGER:
+        return (data['entry_lines'], data['selected_account'], generation_date, data['fiscal_year'], data['period'])
+    if report_type == BALANCE_SHEET:
+        return (data['assets'], data['liabilities'], data['equity'],
+                data['total_assets'], data['total_liabilities'], data['total_equity'],
+                data['as_of_date'], generation_date)
+    if report_type == INCOME_STATEMENT:
+        return (data['revenues'], data['expenses'],
+                data['total_revenue'], data['total_expense'], data['net_income'],
+                data['start_date'], data['end_date'], generation_date)
+    if report_type == TRIAL_BALANCE:
+        return (data['report_data'], data['grand_totals'],
+                data['fiscal_year'], data['period'], data['start_date'], data['end_date'], generation_date)
+    if report_type == GRAND_LIVRE:
+        return (data['rows'], data['organization'], generation_date, data['fiscal_year'], data['period'])
+    return (data['report_data'], data['start_date'], data['end_date'], generation_date)
+
+
+# Comparative balance sheets and income statements, and the consolidated
+# statements, share one layout
+COMPARATIVE_EXPORTERS = {
+    'pdf': export_pdf_comparative_statement,
+    'xlsx': write_excel_comparative_statement,
+    'csv': csv_rows_comparative_statement,
+}
+
+EXPORTERS = {
+    GENERAL_LEDGER: {'pdf': export_pdf_general_ledger, 'xlsx': write_excel_general_ledger, 'csv': csv_rows_general_ledger},
+    BALANCE_SHEET: {'pdf': export_pdf_balance_sheet, 'xlsx': export_excel_balance_sheet, 'csv': csv_rows_balance_sheet},
+    INCOME_STATEMENT: {'pdf': export_pdf_income_statement, 'xlsx': export_excel_income_statement, 'csv': csv_rows_income_statement},
+    TRIAL_BALANCE: {'pdf': export_pdf_trial_balance, 'xlsx': write_excel_trial_balance, 'csv': csv_rows_trial_balance},
+    CASH_FLOW: {'pdf': export_pdf_cash_flow, 'xlsx': export_excel_cash_flow, 'csv': csv_rows_cash_flow},
+    # The whole ledger is too long to lay out as a PDF
+    GRAND_LIVRE: {'xlsx': write_excel_grand_livre, 'csv': csv_rows_grand_livre},
+    CONSOLIDATED: COMPARATIVE_EXPORTERS,
+}
+
+
+def supports_format(report_type, fmt):
+    """Whether ``report_type`` can be exported as ``fmt``."""
+    return fmt in EXPORTERS.get(report_type, {})
+
+
+def export_content(report_type, fmt, data, generation_date):
+    """
+    Export ``data`` in ``fmt``: PDF as bytes, XLSX as a rewound file object,
+    CSV as an iterator of rows.
+    """
+    if data.get('comparison'):
+        content = COMPARATIVE_EXPORTERS[fmt](data['comparison'], generation_date)
+    else:
+        content = EXPORTERS[report_type][fmt](*_export_args(report_type, data, generation_date))
+    if fmt == 'xlsx' and isinstance(content, bytes):
+        return BytesIO(content)
+    return content
+
+
+def export_file(report_type, fmt, data, generation_date):
+    """Export ``data`` in ``fmt`` as a Django ``File`` ready to be saved to a FileField."""
+    content = export_content(report_type, fmt, data, generation_date)
+    if fmt == 'pdf':
+        return ContentFile(content)
+    if fmt == 'csv':
+        spool = tempfile.TemporaryFile()
+        for line in _encode_csv(content):
+            spool.write(line.encode('utf-8'))
+        spool.seek(0)
+        return File(spool)
+    return File(content)
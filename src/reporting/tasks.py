@@ -0,0 +1,27 @@
+"""
+Celery tasks for the reporting app.
+
+``generate_report`` renders a queued ``GeneratedReport`` in the background so
+that large exports (a full general ledger, a multi-year trial balance) do not
+tie up a web worker.
+"""
+from celery import shared_task
+
+from .models import GeneratedReport
+
+
+@shared_task
+def generate_report(report_id):
+    """Build and store the file of the ``GeneratedReport`` with primary key ``report_id``."""
+    report = GeneratedReport.objects.select_related('template', 'organization').filter(pk=report_id).first()
+    if report is None or report.status == 'COMPLETED':
+        return None
+    report.generate()
+    return report.status
+
+
+@shared_task
+def consolidation_entity_balances(organization_id, start_date, end_date):
+    """Aggregate one organization of a consolidated report (see ``consolidation.entity_balances``)."""
+    from .consolidation import entity_balances
+    return entity_balances(organization_id, start_date, end_date)
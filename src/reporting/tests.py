@@ -1,11 +1,14 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
 from accounting.models import ChartOfAccounts, FiscalYear, AccountingPeriod
 
 class ReportingViewTests(TestCase):
     def setUp(self):
         # create a user and ensure it has a profile with an organization
+        cache.clear()
         self.user = User.objects.create_user(username='reporter', password='pass', is_staff=True)
         self.client = Client()
         self.client.force_login(self.user)
@@ -68,3 +71,277 @@ class ReportingViewTests(TestCase):
         # like income statement, also needs timeframe
         self._assert_export_response('trial_balance', 'fiscal_year=%s' % self.fy.pk, 'application/pdf')
         self._assert_export_response('trial_balance', 'fiscal_year=%s' % self.fy.pk, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    def test_trial_balance_html(self):
+        url = reverse('reporting:trial_balance')
+        response = self.client.get(url + '?fiscal_year=%s' % self.fy.pk)
+        self.assertEqual(response.status_code, 200)
+        codes = [row['code'] for row in response.context['report_data']]
+        self.assertIn(self.account.code, codes)
+        self.assertEqual(response.context['grand_totals']['closing_debit'], 0)
+
+    def test_cash_flow_statement_html(self):
+        url = reverse('reporting:cash_flow_statement')
+        response = self.client.get(url + '?fiscal_year=%s' % self.fy.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['report_data']['summary']['ending'], 0)
+
+    def test_csv_exports_stream(self):
+        url = reverse('reporting:general_ledger')
+        response = self.client.get(url + '?account=%s&format=csv' % self.account.pk)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(body.startswith('General Ledger / Grand Livre'))
+        self.assertIn('Date,Reference,Description,Debit,Credit', body)
+
+    def test_csv_export_gzip(self):
+        import gzip
+        url = reverse('reporting:trial_balance')
+        response = self.client.get(url + '?fiscal_year=%s&format=csv' % self.fy.pk, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertIn(self.account.code, body)
+
+    def test_trial_balance_xlsx_is_write_only_workbook(self):
+        from io import BytesIO
+        from openpyxl import load_workbook
+        url = reverse('reporting:trial_balance')
+        response = self.client.get(url + '?fiscal_year=%s&format=xlsx' % self.fy.pk)
+        self.assertIn('trial_balance.xlsx', response['Content-Disposition'])
+        ws = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(ws['A4'].value, 'Code')
+        self.assertTrue(ws['A4'].font.bold)
+        self.assertEqual(ws['A5'].value, self.account.code)
+
+    def test_generate_report_async(self):
+        import tempfile
+        from django.test import override_settings
+        from .models import GeneratedReport
+        from .tasks import generate_report
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = self.client.post(reverse('reporting:generate_report'), {
+                    'report': 'TRIAL_BALANCE', 'format': 'csv', 'fiscal_year': self.fy.pk,
+                })
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(len(callbacks), 1)
+            report = GeneratedReport.objects.get(uuid=response.json()['id'])
+            self.assertEqual(report.status, 'PENDING')
+
+            # Run the queued task inline instead of through the broker
+            generate_report(report.pk)
+            status = self.client.get(response.json()['status_url']).json()
+            self.assertEqual(status['status'], 'COMPLETED')
+
+            download = self.client.get(status['download_url'])
+            self.assertIn('trial_balance.csv', download['Content-Disposition'])
+            body = b''.join(download.streaming_content).decode('utf-8')
+            self.assertIn(self.account.code, body)
+            download.close()
+
+    def test_generate_report_rejects_unknown_reports(self):
+        from .models import GeneratedReport
+        for report_type in ('CONSOLIDATED', 'BUDGET_VS_ACTUAL', 'NOPE'):
+            response = self.client.post(reverse('reporting:generate_report'), {'report': report_type, 'format': 'csv'})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('reporting:generate_report'), {'report': 'GRAND_LIVRE', 'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(GeneratedReport.objects.exists())
+
+    def test_generate_report_records_failure(self):
+        from .models import GeneratedReport, ReportTemplate
+        report = GeneratedReport.objects.create(
+            organization=self.org, template=ReportTemplate.standard('GENERAL_LEDGER'),
+            parameters_json={}, format='pdf',
+        )
+        self.assertFalse(report.generate())
+        self.assertEqual(report.status, 'FAILED')
+        self.assertTrue(report.error_message)
+        response = self.client.get(reverse('reporting:generated_report_download', kwargs={'uuid': report.uuid}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_report_cache_shared_across_formats(self):
+        from decimal import Decimal
+        from accounting.models import Journal, JournalEntry, EntryLine
+        url = reverse('reporting:income_statement') + '?fiscal_year=%s' % self.fy.pk
+        self.client.get(url)
+        with self.assertNumQueries(7):  # session, user, profile, organization and ledger state only
+            self.client.get(url + '&format=csv')
+        stats = self.client.get(reverse('reporting:report_cache_stats')).json()
+        self.assertEqual(stats['INCOME_STATEMENT'], {'hits': 1, 'misses': 1})
+
+        # Posting an entry bumps the ledger version and invalidates the result
+        bank = ChartOfAccounts.objects.create(organization=self.org, code='5210', name='Bank', account_type='ASSET')
+        journal = Journal.objects.create(organization=self.org, code='VT', name='Sales', type='SALES')
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = JournalEntry.objects.create(
+                organization=self.org, period=self.period, journal=journal, date='2025-02-01', description='Sale',
+            )
+            EntryLine.objects.create(journal_entry=entry, account=bank, debit_amount=Decimal('100.00'))
+            EntryLine.objects.create(journal_entry=entry, account=self.account, credit_amount=Decimal('100.00'))
+            entry.posted = True
+            entry.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_revenue'], Decimal('100.00'))
+        self.assertEqual(self.client.get(reverse('reporting:report_cache_stats')).json()['INCOME_STATEMENT']['misses'], 2)
+
+        # So does renaming an account
+        self.account.name = 'Sales of goods'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.save()
+        self.client.get(url)
+        self.assertEqual(self.client.get(reverse('reporting:report_cache_stats')).json()['INCOME_STATEMENT']['misses'], 3)
+
+    def test_reports_answer_conditional_get(self):
+        url = reverse('reporting:trial_balance') + '?fiscal_year=%s' % self.fy.pk
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # session, user, profile and organization, then the ledger state
+        with self.assertNumQueries(7):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.period.status = 'CLOSED'
+        self.period.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # Only the ETag validates: a date says nothing about closings or deletions
+        self.assertNotIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+        # Renaming an account changes the pages without touching any entry
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.name = 'Renamed account'
+            self.account.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed account')
+
+    def test_general_ledger_html_shows_running_balance(self):
+        response = self.client.get(reverse('reporting:general_ledger') + '?account=%s' % self.account.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['carried_balance'], 0)
+        self.assertIsNone(response.context['next_page_url'])
+
+    def test_grand_livre_export_and_command(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        url = reverse('reporting:general_ledger')
+        response = self.client.get(url + '?account=all&fiscal_year=%s&format=csv' % self.fy.pk)
+        self.assertIn('grand_livre.csv', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(body.startswith('Grand Livre / General Ledger - All Accounts'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'gl.xlsx')
+            call_command('export_grand_livre', organization=self.org.pk, fiscal_year=self.fy.pk,
+                         format='xlsx', output=output, stdout=StringIO())
+            self.assertGreater(os.path.getsize(output), 0)
+
+    def test_comparative_income_statement(self):
+        second = AccountingPeriod.objects.create(
+            fiscal_year=self.fy, name='Q2 2025', start_date='2025-04-01', end_date='2025-06-30'
+        )
+        url = reverse('reporting:income_statement') + '?periods=%s&periods=%s' % (self.period.pk, second.pk)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['comparison']['columns'], ['Q1 2025', 'Q2 2025'])
+        self.assertEqual(response.context['comparison']['summary'][0][1], [0, 0])
+
+        response = self.client.get(url + '&format=csv')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Code,Name,Q1 2025,Q2 2025', body)
+        response = self.client.get(reverse('reporting:balance_sheet') + '?dates=2025-03-31,2025-06-30')
+        self.assertContains(response, '2025-06-30')
+        response = self.client.get(reverse('reporting:balance_sheet') + '?dates=2025-03-31,2025-06-30&format=pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        # Malformed dates are skipped rather than failing the request
+        response = self.client.get(reverse('reporting:balance_sheet') + '?dates=2025-03-31,2025-13-45')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['comparison']['columns'], ['2025-03-31'])
+
+    def _post_entry(self, organization, period, debit_account, credit_account, amount):
+        from accounting.models import Journal, JournalEntry, EntryLine
+        journal, _ = Journal.objects.get_or_create(organization=organization, code='OD%s' % organization.pk, defaults={'name': 'Misc', 'type': 'GENERAL'})
+        entry = JournalEntry.objects.create(
+            organization=organization, period=period, journal=journal, date=period.start_date, description='Entry',
+        )
+        EntryLine.objects.create(journal_entry=entry, account=debit_account, debit_amount=amount)
+        EntryLine.objects.create(journal_entry=entry, account=credit_account, credit_amount=amount)
+        entry.posted = True
+        entry.save()
+
+    def test_consolidated_report(self):
+        import os
+        import tempfile
+        from decimal import Decimal
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from django.test import override_settings
+        from organization.models import Organization
+        from .tasks import consolidation_entity_balances
+
+        self.assertEqual(self.client.get(reverse('reporting:consolidated')).status_code, 403)
+
+        other = Organization.objects.create(name='Second Hospital')
+        other_fy = FiscalYear.objects.create(organization=other, name='FY2025', start_date='2025-01-01', end_date='2025-12-31')
+        other_period = AccountingPeriod.objects.create(
+            fiscal_year=other_fy, name='Q1 2025', start_date='2025-01-01', end_date='2025-03-31'
+        )
+        bank = ChartOfAccounts.objects.create(organization=self.org, code='5211', name='Bank A', account_type='ASSET')
+        other_bank = ChartOfAccounts.objects.create(organization=other, code='521', name='Banks', account_type='ASSET')
+        other_revenue = ChartOfAccounts.objects.create(organization=other, code='4000', name='Sales', account_type='REVENUE')
+        self._post_entry(self.org, self.period, bank, self.account, Decimal('100.00'))
+        self._post_entry(other, other_period, other_bank, other_revenue, Decimal('40.00'))
+
+        admin = User.objects.create_superuser(username='consolidator', password='pass')
+        self.client.force_login(admin)
+        query = '?organizations=%s,%s&start_date=2025-01-01&end_date=2025-12-31&level=3' % (self.org.pk, other.pk)
+        response = self.client.get(reverse('reporting:consolidated') + query)
+        self.assertEqual(response.status_code, 200)
+        comparison = response.context['comparison']
+        self.assertEqual(comparison['columns'], [self.org.name, 'Second Hospital', 'Consolidated'])
+        assets = comparison['sections'][0]['rows']
+        self.assertEqual([(row['code'], row['name']) for row in assets], [('521', 'Banks')])
+        self.assertEqual(assets[0]['balances'], [Decimal('100.00'), Decimal('40.00'), Decimal('140.00')])
+        self.assertEqual(comparison['summary'][0], ('Net Income', [Decimal('100.00'), Decimal('40.00'), Decimal('140.00')]))
+
+        response = self.client.get(reverse('reporting:consolidated') + query + '&format=csv')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Code,Name,%s,Second Hospital,Consolidated' % self.org.name, body)
+
+        # Pages aggregate inline however many organizations they cover
+        cache.clear()
+        with override_settings(CONSOLIDATION_PARALLEL_THRESHOLD=1), \
+                mock.patch.object(consolidation_entity_balances, 's') as signature:
+            response = self.client.get(reverse('reporting:consolidated') + query)
+        self.assertEqual(response.status_code, 200)
+        signature.assert_not_called()
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'consolidated.csv')
+            call_command('export_consolidation', organizations='%s,%s' % (self.org.pk, other.pk),
+                         start_date='2025-01-01', end_date='2025-12-31', level=3, output=output, stdout=StringIO())
+            with open(output, encoding='utf-8') as exported:
+                self.assertIn('Code,Name,%s,Second Hospital,Consolidated' % self.org.name, exported.read())
+
+        # Malformed dates fall back to the default range
+        response = self.client.get(reverse('reporting:consolidated') + '?start_date=2025-02-30&end_date=tomorrow')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['end_date'], timezone.now().date())
+        self.assertEqual(response.context['start_date'], timezone.now().date().replace(month=1, day=1))
+
+        # The Celery path returns the same rows as the inline one
+        self.assertEqual(
+            consolidation_entity_balances.apply(args=(other.pk, '2025-01-01', '2025-12-31')).get(),
+            [['4000', 'Sales', 'REVENUE', '-40.00'], ['521', 'Banks', 'ASSET', '40.00']],
+        )
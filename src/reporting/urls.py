@@ -10,5 +10,10 @@ urlpatterns = [
     path('income-statement/', views.income_statement, name='income_statement'),
     path('trial-balance/', views.trial_balance, name='trial_balance'),
     path('cash-flow-statement/', views.cash_flow_statement, name='cash_flow_statement'),
+    path('consolidated/', views.consolidated_report, name='consolidated'),
+    path('cache-stats/', views.report_cache_stats, name='report_cache_stats'),
+    path('generate/', views.generate_report_async, name='generate_report'),
+    path('generated/<uuid:uuid>/status/', views.generated_report_status, name='generated_report_status'),
+    path('generated/<uuid:uuid>/download/', views.generated_report_download, name='generated_report_download'),
 ]
 
@@ -1,33 +1,22 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse
-from accounting.models import ChartOfAccounts, JournalEntry, EntryLine, FiscalYear, AccountingPeriod
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, FileResponse, Http404
+from django.urls import reverse
+from django.views.decorators.http import condition, require_POST
+from accounting import ledger
+from accounting.models import ChartOfAccounts, FiscalYear, AccountingPeriod
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from decimal import Decimal
+import hashlib
 
 from core.mixins import _get_user_organization
+from organization.models import Organization
 
-from .export_utils import (
-    export_pdf_general_ledger,
-    export_excel_general_ledger,
-    export_csv_general_ledger,
-    export_pdf_balance_sheet,
-    export_excel_balance_sheet,
-    export_csv_balance_sheet,
-    export_pdf_income_statement,
-    export_excel_income_statement,
-    export_csv_income_statement,
-    export_pdf_trial_balance,
-    export_excel_trial_balance,
-    export_csv_trial_balance,
-    export_pdf_cash_flow,
-    export_excel_cash_flow,
-    export_csv_cash_flow,
-)
-
-
-
+from . import consolidation, reports
+from .export_utils import streaming_csv_response, xlsx_response
+from .models import GeneratedReport, ReportTemplate
+from .tasks import generate_report
 
 
 def _require_organization(request):
@@ -62,175 +51,139 @@ def _export_url(request, fmt):
     return f"{request.path}?{query}" if query else request.path
 
 
+def _page_url(request, cursor=None):
+    """URL of the general ledger page that starts after ``cursor`` (the first page when None)."""
+    params = request.GET.copy()
+    params.pop('format', None)
+    params.pop('after', None)
+    if cursor is not None:
+        params['after'] = ledger.format_ledger_cursor(cursor)
+    query = params.urlencode()
+    return f"{request.path}?{query}" if query else request.path
+
+
+def _grand_livre_url(request, fmt):
+    """URL exporting every account for the currently selected fiscal year or period."""
+    params = request.GET.copy()
+    params.pop('after', None)
+    params['account'] = reports.ALL_ACCOUNTS
+    params['format'] = fmt
+    return f"{request.path}?{params.urlencode()}"
+
+
+def _export_response(request, report_type, data):
+    """Return the export requested by ``?format=`` or None to render the HTML page."""
+    export_format = request.GET.get('format')
+    if not reports.supports_format(report_type, export_format) or not reports.is_exportable(report_type, data):
+        return None
+    filename = f"{reports.FILENAMES[report_type]}.{export_format}"
+    content = reports.export_content(report_type, export_format, data, timezone.now().date())
+    if export_format == 'csv':
+        return streaming_csv_response(request, content, filename)
+    if export_format == 'xlsx':
+        return xlsx_response(content, filename)
+    resp = HttpResponse(content, content_type='application/pdf')
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
+
+
+def _ledger_state(request):
+    """Ledger state of the user's organization, computed once per request."""
+    if not hasattr(request, '_ledger_state'):
+        organization = _get_user_organization(request.user)
+        request._ledger_state = ledger.ledger_state(organization) if organization else None
+    return request._ledger_state
+
+
+def _report_etag(request, *args, **kwargs):
+    state = _ledger_state(request)
+    if state is None:
+        return None
+    validator = (
+        request.path,
+        sorted(request.GET.lists()),
+        request.user.pk,
+        # Default date ranges and the generation date follow the calendar
+        timezone.now().date().isoformat(),
+        'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        sorted((key, str(value)) for key, value in state.items()),
+    )
+    return hashlib.md5(repr(validator).encode('utf-8')).hexdigest()
+
+
+# Lets browsers and proxies revalidate a report with a 304 instead of
+# re-running its aggregation when the ledger has not changed. No
+# Last-Modified: no timestamp moves when an entry is unposted or deleted,
+# a period closes or an account changes, so only the ETag is trusted.
+report_conditions = condition(etag_func=_report_etag)
+
+
 @login_required
 def reporting_index(request):
     return render(request, 'reporting/index.html')
 
 @login_required
+@report_conditions
 def general_ledger(request):
     organization = _require_organization(request)
-    accounts = ChartOfAccounts.objects.filter(organization=organization).order_by('code')
-    fiscal_years = FiscalYear.objects.filter(organization=organization).order_by('-start_date')
-    selected_account_id = request.GET.get('account')
-    selected_fiscal_year_id = request.GET.get('fiscal_year')
-    selected_period_id = request.GET.get('period')
-    entry_lines = []
-    selected_account = None
-    periods = []
-    fiscal_year = FiscalYear.objects.filter(pk=selected_fiscal_year_id, organization=organization).first() if selected_fiscal_year_id else None
-    period = AccountingPeriod.objects.filter(pk=selected_period_id, fiscal_year__organization=organization).first() if selected_period_id else None
-    if selected_fiscal_year_id and fiscal_year:
-        periods = AccountingPeriod.objects.filter(fiscal_year=fiscal_year).order_by('start_date')
-    if selected_account_id:
-        selected_account = ChartOfAccounts.objects.filter(pk=selected_account_id, organization=organization).first()
-        if selected_account:
-            qs = EntryLine.objects.filter(account=selected_account, journal_entry__posted=True)
-            if period:
-                qs = qs.filter(journal_entry__date__gte=period.start_date, journal_entry__date__lte=period.end_date)
-            elif fiscal_year:
-                qs = qs.filter(journal_entry__date__gte=fiscal_year.start_date, journal_entry__date__lte=fiscal_year.end_date)
-            entry_lines = qs.select_related('journal_entry').order_by('journal_entry__date', 'id')
-    # Export formats (PDF/Excel)
-    export_format = request.GET.get('format')
-    if export_format == 'pdf' and selected_account:
-        content = export_pdf_general_ledger(
-            entry_lines, selected_account, timezone.now().date(),
-            fiscal_year=fiscal_year if selected_fiscal_year_id else None,
-            period=period if selected_period_id else None
-        )
-        resp = HttpResponse(content, content_type='application/pdf')
-        resp['Content-Disposition'] = 'attachment; filename="general_ledger.pdf"'
-        return resp
-    if export_format == 'xlsx' and selected_account:
-        content = export_excel_general_ledger(
-            entry_lines, selected_account, timezone.now().date(),
-            fiscal_year=fiscal_year if selected_fiscal_year_id else None,
-            period=period if selected_period_id else None
-        )
-        resp = HttpResponse(content, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        resp['Content-Disposition'] = 'attachment; filename="general_ledger.xlsx"'
-        return resp
-    if export_format == 'csv' and selected_account:
-        content = export_csv_general_ledger(
-            entry_lines, selected_account, timezone.now().date(),
-            fiscal_year=fiscal_year if selected_fiscal_year_id else None,
-            period=period if selected_period_id else None
+    if request.GET.get('account') == reports.ALL_ACCOUNTS and request.GET.get('format'):
+        # Whole-ledger export: every account in one streamed pass
+        response = _export_response(request, reports.GRAND_LIVRE, reports.grand_livre(organization, request.GET))
+        if response is not None:
+            return response
+    data = reports.general_ledger(organization, request.GET)
+    response = _export_response(request, reports.GENERAL_LEDGER, data)
+    if response is not None:
+        return response
+
+    page = {'lines': [], 'carried_balance': None, 'closing_balance': None, 'next_cursor': None}
+    if data['selected_account']:
+        page = ledger.general_ledger_page(
+            data['selected_account'], data['start_date'], data['end_date'],
+            after=ledger.parse_ledger_cursor(request.GET.get('after')),
         )
-        resp = HttpResponse(content, content_type='text/csv')
-        resp['Content-Disposition'] = 'attachment; filename="general_ledger.csv"'
-        return resp
-
 
     context = {
-        'accounts': accounts,
-        'fiscal_years': fiscal_years,
-        'periods': periods,
-        'selected_account': selected_account,
-        'entry_lines': entry_lines,
+        'accounts': ChartOfAccounts.objects.filter(organization=organization).order_by('code'),
+        'fiscal_years': FiscalYear.objects.filter(organization=organization).order_by('-start_date'),
+        'periods': data['periods'],
+        'selected_account': data['selected_account'],
+        'entry_lines': page['lines'],
+        'carried_balance': page['carried_balance'],
+        'closing_balance': page['closing_balance'],
+        'is_first_page': not request.GET.get('after'),
+        'first_page_url': _page_url(request),
+        'next_page_url': _page_url(request, page['next_cursor']) if page['next_cursor'] else None,
+        'grand_livre_csv_url': _grand_livre_url(request, 'csv') if data['start_date'] else None,
+        'grand_livre_excel_url': _grand_livre_url(request, 'xlsx') if data['start_date'] else None,
         'generation_date': timezone.now().date(),
         'export_pdf_url': _export_url(request, 'pdf'),
         'export_excel_url': _export_url(request, 'xlsx'),
         'export_csv_url': _export_url(request, 'csv'),
-
     }
     return render(request, 'reporting/general_ledger.html', context)
 
 @login_required
+@report_conditions
 def balance_sheet(request):
     organization = _require_organization(request)
-    as_of_date = request.GET.get('date', timezone.now().date())
-    if isinstance(as_of_date, str):
-        from datetime import datetime
-        as_of_date = datetime.strptime(as_of_date, '%Y-%m-%d').date()
-
-    from django.db.models import Sum, Q
-
-    # Query accounts and aggregate posted entry lines
-    accounts = ChartOfAccounts.objects.filter(
-        organization=organization,
-        account_type__in=['ASSET', 'LIABILITY', 'EQUITY']
-    ).annotate(
-        total_debit=Sum('entry_lines__debit_amount', filter=Q(entry_lines__journal_entry__posted=True, entry_lines__journal_entry__date__lte=as_of_date)),
-        total_credit=Sum('entry_lines__credit_amount', filter=Q(entry_lines__journal_entry__posted=True, entry_lines__journal_entry__date__lte=as_of_date))
-    )
-
-    asset_accounts = []
-    liability_accounts = []
-    equity_accounts = []
-    
-    total_assets = Decimal("0.00")
-    total_liabilities = Decimal("0.00")
-    total_equity = Decimal("0.00")
-
-    for acc in accounts:
-        debit = acc.total_debit or Decimal("0.00")
-        credit = acc.total_credit or Decimal("0.00")
-        
-        if acc.account_type == 'ASSET':
-            balance = debit - credit
-            if balance != 0:
-                asset_accounts.append({'code': acc.code, 'name': acc.name, 'balance': balance})
-                total_assets += balance
-        elif acc.account_type == 'LIABILITY':
-            balance = credit - debit
-            if balance != 0:
-                liability_accounts.append({'code': acc.code, 'name': acc.name, 'balance': balance})
-                total_liabilities += balance
-        elif acc.account_type == 'EQUITY':
-            balance = credit - debit
-            if balance != 0:
-                equity_accounts.append({'code': acc.code, 'name': acc.name, 'balance': balance})
-                total_equity += balance
-
-    fiscal_years = FiscalYear.objects.filter(organization=organization).order_by('-start_date')
-    current_fiscal_year = FiscalYear.objects.filter(
-        organization=organization,
-        start_date__lte=as_of_date,
-        end_date__gte=as_of_date
-    ).first()
-
-    # Export formats (PDF/Excel)
-    export_format = request.GET.get('format')
-    if export_format == 'pdf':
-        content = export_pdf_balance_sheet(
-            asset_accounts, liability_accounts, equity_accounts,
-            total_assets, total_liabilities, total_equity,
-            as_of_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='application/pdf')
-        resp['Content-Disposition'] = 'attachment; filename="balance_sheet.pdf"'
-        return resp
-    if export_format == 'xlsx':
-        content = export_excel_balance_sheet(
-            asset_accounts, liability_accounts, equity_accounts,
-            total_assets, total_liabilities, total_equity,
-            as_of_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        resp['Content-Disposition'] = 'attachment; filename="balance_sheet.xlsx"'
-        return resp
-    if export_format == 'csv':
-        content = export_csv_balance_sheet(
-            asset_accounts, liability_accounts, equity_accounts,
-            total_assets, total_liabilities, total_equity,
-            as_of_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='text/csv')
-        resp['Content-Disposition'] = 'attachment; filename="balance_sheet.csv"'
-        return resp
-
+    data = reports.cached_build(reports.BALANCE_SHEET, organization, request.GET)
+    response = _export_response(request, reports.BALANCE_SHEET, data)
+    if response is not None:
+        return response
 
     context = {
-        'as_of_date': as_of_date,
-        'assets': asset_accounts,
-        'liabilities': liability_accounts,
-        'equity': equity_accounts,
-        'total_assets': total_assets,
-        'total_liabilities': total_liabilities,
-        'total_equity': total_equity,
+        'as_of_date': data['as_of_date'],
+        'assets': data['assets'],
+        'liabilities': data['liabilities'],
+        'equity': data['equity'],
+        'total_assets': data['total_assets'],
+        'total_liabilities': data['total_liabilities'],
+        'total_equity': data['total_equity'],
         'generation_date': timezone.now().date(),
-        'fiscal_years': fiscal_years,
-        'current_fiscal_year': current_fiscal_year,
+        'fiscal_years': FiscalYear.objects.filter(organization=organization).order_by('-start_date'),
+        'current_fiscal_year': data['current_fiscal_year'],
+        'comparison': data['comparison'],
         'export_pdf_url': _export_url(request, 'pdf'),
         'export_excel_url': _export_url(request, 'xlsx'),
         'export_csv_url': _export_url(request, 'csv'),
@@ -239,116 +192,28 @@ def balance_sheet(request):
     return render(request, 'reporting/balance_sheet.html', context)
 
 @login_required
+@report_conditions
 def income_statement(request):
     organization = _require_organization(request)
-    fiscal_year_id = request.GET.get('fiscal_year')
-    period_id = request.GET.get('period')
-    
-    start_date = None
-    end_date = None
-    fiscal_year = None
-    period = None
-
-    if period_id:
-        period = AccountingPeriod.objects.filter(pk=period_id, fiscal_year__organization=organization).first()
-        if period:
-            start_date = period.start_date
-            end_date = period.end_date
-    elif fiscal_year_id:
-        fiscal_year = FiscalYear.objects.filter(pk=fiscal_year_id, organization=organization).first()
-        if fiscal_year:
-            start_date = fiscal_year.start_date
-            end_date = fiscal_year.end_date
-    else:
-        # Default to current fiscal year
-        fiscal_year = FiscalYear.objects.filter(
-            organization=organization,
-            start_date__lte=timezone.now().date(),
-            end_date__gte=timezone.now().date()
-        ).first()
-        if fiscal_year:
-            start_date = fiscal_year.start_date
-            end_date = fiscal_year.end_date
-
-    from django.db.models import Sum, Q
-
-    revenue_accounts = []
-    expense_accounts = []
-    total_revenue = Decimal("0.00")
-    total_expenses = Decimal("0.00")
-
-    if start_date and end_date:
-        accounts = ChartOfAccounts.objects.filter(
-            organization=organization,
-            account_type__in=['REVENUE', 'EXPENSE']
-        ).annotate(
-            total_debit=Sum('entry_lines__debit_amount', filter=Q(entry_lines__journal_entry__posted=True, entry_lines__journal_entry__date__gte=start_date, entry_lines__journal_entry__date__lte=end_date)),
-            total_credit=Sum('entry_lines__credit_amount', filter=Q(entry_lines__journal_entry__posted=True, entry_lines__journal_entry__date__gte=start_date, entry_lines__journal_entry__date__lte=end_date))
-        )
-
-        for acc in accounts:
-            debit = acc.total_debit or Decimal("0.00")
-            credit = acc.total_credit or Decimal("0.00")
-            
-            if acc.account_type == 'REVENUE':
-                balance = credit - debit
-                if balance != 0:
-                    revenue_accounts.append({'code': acc.code, 'name': acc.name, 'balance': balance})
-                    total_revenue += balance
-            elif acc.account_type == 'EXPENSE':
-                balance = debit - credit
-                if balance != 0:
-                    expense_accounts.append({'code': acc.code, 'name': acc.name, 'balance': balance})
-                    total_expenses += balance
-
-    net_income = total_revenue - total_expenses
-
-    fiscal_years = FiscalYear.objects.filter(organization=organization).order_by('-start_date')
-
-    # Export formats (PDF/Excel)
-    export_format = request.GET.get('format')
-    if export_format == 'pdf' and start_date and end_date:
-        content = export_pdf_income_statement(
-            revenue_accounts, expense_accounts,
-            total_revenue, total_expenses, net_income,
-            start_date, end_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='application/pdf')
-        resp['Content-Disposition'] = 'attachment; filename="income_statement.pdf"'
-        return resp
-    if export_format == 'xlsx' and start_date and end_date:
-        content = export_excel_income_statement(
-            revenue_accounts, expense_accounts,
-            total_revenue, total_expenses, net_income,
-            start_date, end_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        resp['Content-Disposition'] = 'attachment; filename="income_statement.xlsx"'
-        return resp
-    if export_format == 'csv' and start_date and end_date:
-        content = export_csv_income_statement(
-            revenue_accounts, expense_accounts,
-            total_revenue, total_expenses, net_income,
-            start_date, end_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='text/csv')
-        resp['Content-Disposition'] = 'attachment; filename="income_statement.csv"'
-        return resp
-
+    data = reports.cached_build(reports.INCOME_STATEMENT, organization, request.GET)
+    response = _export_response(request, reports.INCOME_STATEMENT, data)
+    if response is not None:
+        return response
 
     context = {
-        'fiscal_year': fiscal_year,
-        'period': period,
-        'start_date': start_date,
-        'end_date': end_date,
-        'revenues': revenue_accounts,
-        'expenses': expense_accounts,
-        'total_revenue': total_revenue,
-        'total_expense': total_expenses,
-        'net_income': net_income,
+        'fiscal_year': data['fiscal_year'],
+        'period': data['period'],
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'revenues': data['revenues'],
+        'expenses': data['expenses'],
+        'total_revenue': data['total_revenue'],
+        'total_expense': data['total_expense'],
+        'net_income': data['net_income'],
         'generation_date': timezone.now().date(),
-        'fiscal_years': fiscal_years,
-        'current_fiscal_year': fiscal_year,
+        'fiscal_years': FiscalYear.objects.filter(organization=organization).order_by('-start_date'),
+        'current_fiscal_year': data['fiscal_year'],
+        'comparison': data['comparison'],
         'export_pdf_url': _export_url(request, 'pdf'),
         'export_excel_url': _export_url(request, 'xlsx'),
         'export_csv_url': _export_url(request, 'csv'),
@@ -357,156 +222,24 @@ def income_statement(request):
     return render(request, 'reporting/income_statement.html', context)
 
 @login_required
+@report_conditions
 def trial_balance(request):
     organization = _require_organization(request)
-    fiscal_year_id = request.GET.get('fiscal_year')
-    period_id = request.GET.get('period')
-    
-    fiscal_year = None
-    period = None
-    start_date = None
-    end_date = None
-
-    if period_id:
-        period = AccountingPeriod.objects.filter(pk=period_id, fiscal_year__organization=organization).first()
-        if period:
-            fiscal_year = period.fiscal_year
-            start_date = period.start_date
-            end_date = period.end_date
-    elif fiscal_year_id:
-        fiscal_year = FiscalYear.objects.filter(pk=fiscal_year_id, organization=organization).first()
-        if fiscal_year:
-            start_date = fiscal_year.start_date
-            end_date = fiscal_year.end_date
-
-    # Get all accounts
-    accounts_qs = ChartOfAccounts.objects.filter(organization=organization).order_by('code')
-    
-    report_data = []
-    grand_total_opening_debit = Decimal("0.00")
-    grand_total_opening_credit = Decimal("0.00")
-    grand_total_period_debit = Decimal("0.00")
-    grand_total_period_credit = Decimal("0.00")
-    grand_total_closing_debit = Decimal("0.00")
-    grand_total_closing_credit = Decimal("0.00")
-
-    if start_date and end_date:
-        from django.db.models import Sum, Q
-        
-        for acc in accounts_qs:
-            # Opening Balance (all posted entries before start_date)
-            opening = EntryLine.objects.filter(
-                account=acc,
-                journal_entry__posted=True,
-                journal_entry__date__lt=start_date
-            ).aggregate(
-                debit=Sum('debit_amount'),
-                credit=Sum('credit_amount')
-            )
-            opening_debit = opening['debit'] or Decimal("0.00")
-            opening_credit = opening['credit'] or Decimal("0.00")
-            
-            # Period Movement (all posted entries between start_date and end_date)
-            period_move = EntryLine.objects.filter(
-                account=acc,
-                journal_entry__posted=True,
-                journal_entry__date__gte=start_date,
-                journal_entry__date__lte=end_date
-            ).aggregate(
-                debit=Sum('debit_amount'),
-                credit=Sum('credit_amount')
-            )
-            period_debit = period_move['debit'] or Decimal("0.00")
-            period_credit = period_move['credit'] or Decimal("0.00")
-            
-            # Closing Balance
-            total_debit = opening_debit + period_debit
-            total_credit = opening_credit + period_credit
-            
-            closing_debit = Decimal("0.00")
-            closing_credit = Decimal("0.00")
-            
-            # Balance calculation
-            net_balance = total_debit - total_credit
-            if net_balance > 0:
-                closing_debit = net_balance
-            elif net_balance < 0:
-                closing_credit = -net_balance
-                
-            report_data.append({
-                'id': acc.id,
-                'code': acc.code,
-                'name': acc.name,
-                'opening_debit': opening_debit,
-                'opening_credit': opening_credit,
-                'period_debit': period_debit,
-                'period_credit': period_credit,
-                'closing_debit': closing_debit,
-                'closing_credit': closing_credit,
-            })
-            
-            grand_total_opening_debit += opening_debit
-            grand_total_opening_credit += opening_credit
-            grand_total_period_debit += period_debit
-            grand_total_period_credit += period_credit
-            grand_total_closing_debit += closing_debit
-            grand_total_closing_credit += closing_credit
-
-    fiscal_years = FiscalYear.objects.filter(organization=organization).order_by('-start_date')
-
-    # Export formats (PDF/Excel)
-    export_format = request.GET.get('format')
-    if export_format == 'pdf' and start_date and end_date:
-        content = export_pdf_trial_balance(
-            report_data,
-            {'opening_debit': grand_total_opening_debit, 'opening_credit': grand_total_opening_credit,
-             'period_debit': grand_total_period_debit, 'period_credit': grand_total_period_credit,
-             'closing_debit': grand_total_closing_debit, 'closing_credit': grand_total_closing_credit},
-            fiscal_year, period, start_date, end_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='application/pdf')
-        resp['Content-Disposition'] = 'attachment; filename="trial_balance.pdf"'
-        return resp
-    if export_format == 'xlsx' and start_date and end_date:
-        content = export_excel_trial_balance(
-            report_data,
-            {'opening_debit': grand_total_opening_debit, 'opening_credit': grand_total_opening_credit,
-             'period_debit': grand_total_period_debit, 'period_credit': grand_total_period_credit,
-             'closing_debit': grand_total_closing_debit, 'closing_credit': grand_total_closing_credit},
-            fiscal_year, period, start_date, end_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        resp['Content-Disposition'] = 'attachment; filename="trial_balance.xlsx"'
-        return resp
-    if export_format == 'csv' and start_date and end_date:
-        content = export_csv_trial_balance(
-            report_data,
-            {'opening_debit': grand_total_opening_debit, 'opening_credit': grand_total_opening_credit,
-             'period_debit': grand_total_period_debit, 'period_credit': grand_total_period_credit,
-             'closing_debit': grand_total_closing_debit, 'closing_credit': grand_total_closing_credit},
-            fiscal_year, period, start_date, end_date, timezone.now().date()
-        )
-        resp = HttpResponse(content, content_type='text/csv')
-        resp['Content-Disposition'] = 'attachment; filename="trial_balance.csv"'
-        return resp
-
+    data = reports.cached_build(reports.TRIAL_BALANCE, organization, request.GET)
+    response = _export_response(request, reports.TRIAL_BALANCE, data)
+    if response is not None:
+        return response
 
+    fiscal_year = data['fiscal_year']
     periods = AccountingPeriod.objects.filter(fiscal_year=fiscal_year).order_by('start_date') if fiscal_year else []
 
     context = {
         'fiscal_year': fiscal_year,
-        'period': period,
+        'period': data['period'],
         'periods': periods,
-        'report_data': report_data,
-        'grand_totals': {
-            'opening_debit': grand_total_opening_debit,
-            'opening_credit': grand_total_opening_credit,
-            'period_debit': grand_total_period_debit,
-            'period_credit': grand_total_period_credit,
-            'closing_debit': grand_total_closing_debit,
-            'closing_credit': grand_total_closing_credit,
-        },
-        'fiscal_years': fiscal_years,
+        'report_data': data['report_data'],
+        'grand_totals': data['grand_totals'],
+        'fiscal_years': FiscalYear.objects.filter(organization=organization).order_by('-start_date'),
         'generation_date': timezone.now().date(),
         'export_pdf_url': _export_url(request, 'pdf'),
         'export_excel_url': _export_url(request, 'xlsx'),
@@ -517,127 +250,22 @@ def trial_balance(request):
 
 
 @login_required
+@report_conditions
 def cash_flow_statement(request):
     organization = _require_organization(request)
-    
-    fiscal_year_id = request.GET.get('fiscal_year')
-    period_id = request.GET.get('period')
-    
-    fiscal_year = None
-    period = None
-    
-    if fiscal_year_id:
-        fiscal_year = FiscalYear.objects.filter(organization=organization, pk=fiscal_year_id).first()
-    if period_id:
-        period = AccountingPeriod.objects.filter(fiscal_year__organization=organization, pk=period_id).first()
-        
-    if period:
-        start_date, end_date = period.start_date, period.end_date
-    elif fiscal_year:
-        start_date, end_date = fiscal_year.start_date, fiscal_year.end_date
-    else:
-        # Default to current month
-        today = timezone.now().date()
-        start_date = today.replace(day=1)
-        end_date = today
-        
-    # Query lines for the period
-    lines = EntryLine.objects.filter(
-        journal_entry__organization=organization,
-        journal_entry__posted=True,
-        journal_entry__date__range=[start_date, end_date]
-    ).select_related('account')
-
-    # Cash Flow Logic (Direct Method simplified)
-    # 1. Operating: Receipts from customers, Payments to suppliers/employees
-    # 2. Investing: Purchase/Sale of assets
-    # 3. Financing: Loans, Equity changes
-
-    report_data = {
-        'operating': {'in': Decimal('0'), 'out': Decimal('0'), 'net': Decimal('0')},
-        'investing': {'in': Decimal('0'), 'out': Decimal('0'), 'net': Decimal('0')},
-        'financing': {'in': Decimal('0'), 'out': Decimal('0'), 'net': Decimal('0')},
-        'summary': {'beginning': Decimal('0'), 'net_change': Decimal('0'), 'ending': Decimal('0')}
-    }
+    data = reports.cached_build(reports.CASH_FLOW, organization, request.GET)
+    response = _export_response(request, reports.CASH_FLOW, data)
+    if response is not None:
+        return response
 
-    # Identify Cash Accounts (typically starting with 5 in OHADA)
-    cash_lines = lines.filter(account__code__startswith='5')
-    
-    for line in cash_lines:
-        je = line.journal_entry
-        # If cash is debited, it's an inflow. If credited, an outflow.
-        amount = line.debit_amount - line.credit_amount
-        
-        # Determine activity by looking at the OTHER lines in the same transaction
-        other_lines = je.lines.exclude(account__code__startswith='5')
-        
-        # Simplification: guess activity by the first non-cash account type
-        if other_lines.exists():
-            other_acc = other_lines.first().account
-            if other_acc.account_type in ['REVENUE', 'EXPENSE']:
-                category = 'operating'
-            elif other_acc.account_type == 'ASSET': # Fixed assets usually
-                category = 'investing'
-            else:
-                category = 'financing'
-        else:
-            category = 'operating' # Fallback
-            
-        if amount > 0:
-            report_data[category]['in'] += amount
-        else:
-            report_data[category]['out'] += abs(amount)
-            
-    # Calculate nets
-    for cat in ['operating', 'investing', 'financing']:
-        report_data[cat]['net'] = report_data[cat]['in'] - report_data[cat]['out']
-        
-    report_data['summary']['net_change'] = (
-        report_data['operating']['net'] + 
-        report_data['investing']['net'] + 
-        report_data['financing']['net']
-    )
-    
-    # Beginning cash (Balance of class 5 before start_date)
-    beginning_balance = EntryLine.objects.filter(
-        journal_entry__organization=organization,
-        journal_entry__posted=True,
-        journal_entry__date__lt=start_date,
-        account__code__startswith='5'
-    ).aggregate(
-        total=models.Sum(models.F('debit_amount') - models.F('credit_amount'))
-    )['total'] or Decimal('0')
-    
-    report_data['summary']['beginning'] = beginning_balance
-    report_data['summary']['ending'] = beginning_balance + report_data['summary']['net_change']
-
-    # Export
-    export_format = request.GET.get('format')
-    if export_format == 'pdf':
-        content = export_pdf_cash_flow(report_data, start_date, end_date, timezone.now().date())
-        resp = HttpResponse(content, content_type='application/pdf')
-        resp['Content-Disposition'] = 'attachment; filename="cash_flow.pdf"'
-        return resp
-    elif export_format == 'xlsx':
-        content = export_excel_cash_flow(report_data, start_date, end_date, timezone.now().date())
-        resp = HttpResponse(content, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        resp['Content-Disposition'] = 'attachment; filename="cash_flow.xlsx"'
-        return resp
-    elif export_format == 'csv':
-        content = export_csv_cash_flow(report_data, start_date, end_date, timezone.now().date())
-        resp = HttpResponse(content, content_type='text/csv')
-        resp['Content-Disposition'] = 'attachment; filename="cash_flow.csv"'
-        return resp
-
-
-    fiscal_years = FiscalYear.objects.filter(organization=organization).order_by('-start_date')
+    fiscal_year = data['fiscal_year']
     periods = AccountingPeriod.objects.filter(fiscal_year=fiscal_year).order_by('start_date') if fiscal_year else []
 
     context = {
         'fiscal_year': fiscal_year,
-        'period': period,
-        'report_data': report_data,
-        'fiscal_years': fiscal_years,
+        'period': data['period'],
+        'report_data': data['report_data'],
+        'fiscal_years': FiscalYear.objects.filter(organization=organization).order_by('-start_date'),
         'periods': periods,
         'generation_date': timezone.now().date(),
         'export_pdf_url': _export_url(request, 'pdf'),
@@ -647,3 +275,106 @@ def cash_flow_statement(request):
 
     return render(request, 'reporting/cash_flow.html', context)
 
+
+@login_required
+def consolidated_report(request):
+    """Balance sheet and income statement consolidated across organizations (superusers only)."""
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    data = consolidation.consolidation(request.GET)
+    response = _export_response(request, reports.CONSOLIDATED, data)
+    if response is not None:
+        return response
+
+    selected = {organization.pk for organization in data['organizations']}
+    context = {
+        'comparison': data['comparison'],
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'level': data['level'],
+        'organizations': Organization.objects.filter(is_active=True).order_by('name'),
+        'selected_organizations': selected,
+        'generation_date': timezone.now().date(),
+        'export_pdf_url': _export_url(request, 'pdf'),
+        'export_excel_url': _export_url(request, 'xlsx'),
+        'export_csv_url': _export_url(request, 'csv'),
+    }
+    return render(request, 'reporting/consolidated.html', context)
+
+
+@login_required
+def report_cache_stats(request):
+    """Hit/miss counters of the report cache (staff only)."""
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return JsonResponse(reports.cache_stats())
+
+
+def _report_status(report):
+    payload = {
+        'id': str(report.uuid),
+        'report': report.template.type,
+        'format': report.format,
+        'status': report.status,
+        'status_url': reverse('reporting:generated_report_status', kwargs={'uuid': report.uuid}),
+    }
+    if report.status == 'FAILED':
+        payload['error'] = report.error_message
+    if report.is_ready:
+        payload['download_url'] = reverse('reporting:generated_report_download', kwargs={'uuid': report.uuid})
+    return payload
+
+
+@login_required
+@require_POST
+def generate_report_async(request):
+    """
+    Queue a report export. Accepts ``report`` (GENERAL_LEDGER, GRAND_LIVRE,
+    TRIAL_BALANCE, BALANCE_SHEET, INCOME_STATEMENT or CASH_FLOW), ``format``
+    (pdf, xlsx or csv; no pdf for GRAND_LIVRE) and the same parameters as the
+    matching report page. Responds with 202 and the URL to poll, or 400 for
+    any other report or format.
+    """
+    organization = _require_organization(request)
+    report_type = request.POST.get('report')
+    export_format = request.POST.get('format', 'pdf')
+    # Only the per-organization reports run in the background; consolidated
+    # statements span organizations and stay on the superuser-only page.
+    if report_type not in reports.BUILDERS or not reports.supports_format(report_type, export_format):
+        return JsonResponse({'error': 'Unknown report type or format.'}, status=400)
+
+    parameters = {
+        key: request.POST.get(key)
+        for key in reports.REPORT_PARAMETERS
+        if request.POST.get(key)
+    }
+    for key in reports.COMPARATIVE_PARAMETERS:
+        if request.POST.getlist(key):
+            parameters[key] = request.POST.getlist(key)
+    with transaction.atomic():
+        report = GeneratedReport.objects.create(
+            organization=organization,
+            template=ReportTemplate.standard(report_type),
+            parameters_json=parameters,
+            generated_by=request.user,
+            format=export_format,
+        )
+        transaction.on_commit(lambda: generate_report.delay(report.pk))
+    return JsonResponse(_report_status(report), status=202)
+
+
+@login_required
+def generated_report_status(request, uuid):
+    organization = _require_organization(request)
+    report = get_object_or_404(GeneratedReport.objects.select_related('template'), uuid=uuid, organization=organization)
+    return JsonResponse(_report_status(report))
+
+
+@login_required
+def generated_report_download(request, uuid):
+    organization = _require_organization(request)
+    report = get_object_or_404(GeneratedReport.objects.select_related('template'), uuid=uuid, organization=organization)
+    if not report.is_ready:
+        raise Http404("This report is not ready yet.")
+    filename = f"{reports.FILENAMES[report.template.type]}.{report.format}"
+    return FileResponse(report.file.open('rb'), as_attachment=True, filename=filename)